@@ -3,8 +3,11 @@ import libsbml as sbml
 import pandas as pd 
 import unit_manager as unit_manager
 from datetime import date
+import logging
 import os
 
+_log = logging.getLogger(__name__)
+
 
 class EnzymeMLwriter:
     def __init__(self, parameters, name, filename):
@@ -15,12 +18,8 @@ class EnzymeMLwriter:
 
     def write(self):
         p = self.parameters # Shortcut!
-        print(p)
-        print("jetzt kommen dir Parameter")
-        print(self.parameters)
-        print(p["last_name"])
+        _log.debug("Writing EnzymeML for %s with the parameters %s", p["last_name"], p)
         today = date.today().strftime("%Y %m %d %H,%M,%S")
-        print(today)
         
         
         experiment = enzml.EnzymeML(today + p['Reaction_name']+"_" + p['last_name']) # Erstellt eine Neue XML Datei
@@ -93,7 +92,7 @@ class EnzymeMLwriter:
                 li = cofactors
                 obj["type"]= enzml.ontology.SBO_INTERACTOR
             else:
-                print("%s ist unbekannt" % l)
+                _log.warning("%s ist unbekannt", l)
             
             sid = experiment.add(
                 enzml.key.MAIN_SPECIES,
@@ -131,7 +130,7 @@ class EnzymeMLwriter:
             )
 
         data = pd.read_excel(self.filename)
-        print(data)
+        _log.debug("Read data from %s:\n%s", self.filename, data)
 
         form = enzml.EnzymeMLFormat()
        
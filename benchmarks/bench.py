@@ -0,0 +1,243 @@
+"""
+Benchmarks of the EnzymeML document API.
+
+For every size a synthetic document is generated (see benchmarks.generator) and the following operations are
+timed and memory-profiled:
+    add              building the document with EnzymeML.add (per call time is reported as well)
+    create_files     writing the files of the archive
+    create_archive   writing the .omex archive (per archive backend, see --backends; with --threads also with
+                     parallel compression as create_archive_parallel)
+    load_from_file   loading the archive (per archive backend)
+    csv_write        EnzymeMLCSV.write of all data files
+    csv_read         EnzymeMLCSV.read of all data files
+    get_element      enzymeml.get_element of every sid of the document
+
+Timings are taken without tracemalloc; the peak memory is measured in a separate run. The results are written as
+JSON. With a baseline file, operations slower than the baseline by more than the tolerance are reported and the
+exit code is 1.
+
+    python -m benchmarks.bench --sizes small medium --output results.json --baseline baseline.json
+"""
+import argparse
+import contextlib
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+import libsbml as sbml
+import enzymeml.enzymeml as enzml
+from benchmarks.generator import generate
+
+SIZES = {
+    "small": {"species": 5, "reactions": 2, "replicas": 3, "rows": 100, "models": 1},
+    "medium": {"species": 20, "reactions": 10, "replicas": 6, "rows": 1000, "models": 2},
+    "large": {"species": 50, "reactions": 40, "replicas": 12, "rows": 5000, "models": 4},
+}
+
+
+@contextlib.contextmanager
+def _directory(path):
+    cwd = os.getcwd()
+    os.chdir(path)
+    try:
+        yield
+    finally:
+        os.chdir(cwd)
+
+
+# Runs func repeat times and returns the timings (seconds) and the peak memory (bytes) of one more traced run.
+# setup is called before every run and its result is passed to func.
+def measure(func, repeat=5, setup=None):
+    timings = list()
+    for _ in range(repeat):
+        arg = setup() if setup is not None else None
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+
+    arg = setup() if setup is not None else None
+    tracemalloc.start()
+    try:
+        func(arg)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    return timings, peak
+
+
+def _result(name, size, timings, peak, count=1, backend=None):
+    return {
+        "name": name,
+        "size": size,
+        "backend": backend,
+        "repeat": len(timings),
+        "min": min(timings),
+        "median": statistics.median(timings),
+        "mean": statistics.mean(timings),
+        "per_call": min(timings) / count if count > 0 else None,
+        "calls": count,
+        "peak_memory": peak
+    }
+
+
+def _sids(enzymeml):
+    model = enzymeml.get_model()
+    sids = [el.getId() for el in model.getListOfAllElements() if el.isSetId()]
+    return sids + [u.getId() for u in model.getListOfUnitDefinitions()]
+
+
+# Runs all benchmarks of one size. Returns a list of result dicts.
+# backends: the archive backends of create_archive and load_from_file (see enzymeml.set_archive_backend)
+# threads: also time create_archive with parallel compression on this number of threads
+def run_size(size, params, repeat=5, workdir=None, backends=(enzml.BACKEND_LIBCOMBINE,), threads=None):
+    results = list()
+    name = "bench_%s" % size
+    calls = generate(name, **params)[1]
+
+    timings, peak = measure(lambda _: generate(name, **params), repeat)
+    results.append(_result("add", size, timings, peak, calls))
+
+    with tempfile.TemporaryDirectory(dir=workdir) as tmp, _directory(tmp):
+        enzymeml = generate(name, **params)[0]
+
+        timings, peak = measure(lambda _: enzymeml.create_files(), repeat)
+        results.append(_result("create_files", size, timings, peak))
+
+        for backend in backends:
+            timings, peak = measure(lambda _: enzymeml.create_archive(backend=backend), repeat)
+            location = os.path.abspath("%s.omex" % name)
+            archive_size = os.path.getsize(location)
+            result = _result("create_archive", size, timings, peak, backend=backend)
+            result["bytes"] = archive_size
+            result["mb_per_s"] = archive_size / 1e6 / result["min"]
+            results.append(result)
+
+            def load(_):
+                enzml.EnzymeML(name).load_from_file(location, backend=backend)
+
+            timings, peak = measure(load, repeat)
+            result = _result("load_from_file", size, timings, peak, backend=backend)
+            result["bytes"] = archive_size
+            result["mb_per_s"] = archive_size / 1e6 / result["min"]
+            results.append(result)
+
+        if threads is not None:
+            timings, peak = measure(lambda _: enzymeml.create_archive(threads=threads), repeat)
+            result = _result("create_archive_parallel", size, timings, peak, backend=enzml.BACKEND_ZIPFILE)
+            result["threads"] = threads
+            results.append(result)
+
+        def write(_):
+            for i, csv in enumerate(enzymeml.csvs):
+                csv.write("csv_%i.csv" % i)
+
+        timings, peak = measure(write, repeat)
+        results.append(_result("csv_write", size, timings, peak, len(enzymeml.csvs)))
+
+        texts = list()
+        for i in range(len(enzymeml.csvs)):
+            with open("csv_%i.csv" % i) as f:
+                texts.append(f.read())
+
+        def read(_):
+            for text, csv in zip(texts, enzymeml.csvs):
+                enzml.EnzymeMLCSV(csv.format, name=csv.name).read(text)
+
+        timings, peak = measure(read, repeat)
+        result = _result("csv_read", size, timings, peak, len(texts))
+        result["bytes"] = sum(len(t) for t in texts)
+        results.append(result)
+
+    sids = _sids(enzymeml)
+    model = enzymeml.get_model()
+
+    def get_elements(_):
+        for sid in sids:
+            enzml.get_element(model, sid)
+
+    timings, peak = measure(get_elements, repeat)
+    results.append(_result("get_element", size, timings, peak, len(sids)))
+
+    return results
+
+
+# Returns the results which are slower than in the baseline by more than tolerance (relative, of the min time)
+def compare(results, baseline, tolerance=0.2):
+    base = {(r["name"], r["size"], r.get("backend")): r for r in baseline["results"]}
+    regressions = list()
+    for r in results["results"]:
+        b = base.get((r["name"], r["size"], r.get("backend")))
+        if b is not None and r["min"] > b["min"] * (1 + tolerance):
+            regressions.append({"name": r["name"], "size": r["size"], "backend": r.get("backend"),
+                                "baseline": b["min"], "current": r["min"], "ratio": r["min"] / b["min"]})
+    return regressions
+
+
+def run(sizes, repeat=5, workdir=None, backends=(enzml.BACKEND_LIBCOMBINE,), threads=None):
+    results = list()
+    for size in sizes:
+        params = SIZES[size] if isinstance(size, str) else size
+        results += run_size(size if isinstance(size, str) else json.dumps(size, sort_keys=True), params, repeat,
+                            workdir, backends, threads)
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "libsbml": sbml.getLibSBMLDottedVersion(),
+            "repeat": repeat,
+            "backends": list(backends),
+            "threads": threads,
+            "sizes": {s if isinstance(s, str) else json.dumps(s, sort_keys=True): SIZES[s] if isinstance(s, str)
+                      else s for s in sizes}
+        },
+        "results": results
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks of the EnzymeML document API")
+    parser.add_argument("--sizes", nargs="+", default=["small"],
+                        help="preset sizes (%s) or JSON objects with species, reactions, replicas, rows, models"
+                             % ", ".join(SIZES))
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--backends", nargs="+", default=[enzml.BACKEND_LIBCOMBINE], choices=enzml.ARCHIVE_BACKENDS,
+                        help="archive backends of create_archive and load_from_file")
+    parser.add_argument("--threads", type=int, help="also time create_archive with parallel compression")
+    parser.add_argument("--output", help="JSON file of the results (default: stdout)")
+    parser.add_argument("--baseline", help="JSON results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown")
+    args = parser.parse_args(argv)
+
+    sizes = [s if s in SIZES else json.loads(s) for s in args.sizes]
+    results = run(sizes, args.repeat, backends=args.backends, threads=args.threads)
+
+    regressions = list()
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        results["regressions"] = regressions
+
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    for r in regressions:
+        sys.stderr.write("Regression: %s (%s%s) %.4fs -> %.4fs (x%.2f)\n" % (
+            r["name"], r["size"], ", %s" % r["backend"] if r["backend"] is not None else "", r["baseline"],
+            r["current"], r["ratio"]))
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""
+Synthetic EnzymeML documents for benchmarks.
+
+generate() builds a document with the given number of species, reactions, replicas per reaction, rows per CSV
+file and models. Every reaction has one measurement with its own CSV file (time column and one concentration
+column per replica of the substrate). The data are Michaelis-Menten progress curves with noise. Every model has a
+copy of the reactions with a Michaelis-Menten kinetic law of their substrate.
+"""
+import numpy as np
+import libsbml as sbml
+import enzymeml.enzymeml as enzml
+import enzymeml.enzymemlkey as key
+import enzymeml.ontologymanager as ontology
+
+
+# Counts the calls of EnzymeML.add of a document
+class _Counter:
+    def __init__(self, enzymeml):
+        self.enzymeml = enzymeml
+        self.calls = 0
+
+    def add(self, ekey, obj, ident=None):
+        self.calls += 1
+        return self.enzymeml.add(ekey, obj, ident)
+
+
+# Returns the sid of the species of the main document in the model, the species are matched by name
+def _model_species(enzymeml, model, mdoc, sid):
+    name = enzymeml.get_model().getSpecies(enzml._get_id(sid)).getName()
+    for sp in model.get_model().getListOfSpecies():
+        if sp.getName() == name:
+            return sp.getId()
+    return mdoc.add(key.MODEL_SPECIES, {"name": name})
+
+
+# Returns the document and the number of EnzymeML.add calls
+def generate(name="benchmark", species=10, reactions=2, replicas=3, rows=100, models=1, seed=0):
+    if species < 2:
+        raise ValueError("At least two species (substrate and product) are needed.")
+
+    rng = np.random.default_rng(seed)
+    enzymeml = enzml.EnzymeML(name)
+    doc = _Counter(enzymeml)
+
+    comp = doc.add(key.MAIN_COMPARTMENT, {"name": "vessel", "size": 1.0})
+    unit = doc.add(key.MAIN_UNIT, {"name": "mmol/l", "units": [{"kind": sbml.UNIT_KIND_MOLE, "scale": -3},
+                                                              {"kind": sbml.UNIT_KIND_LITRE, "exponent": -1}]})
+    enzyme = doc.add(key.MAIN_SPECIES, {"name": "enzyme", "compartment": comp, "init_conc": 0.01, "units": unit,
+                                        "type": ontology.SBO_ENZYME})
+    sids = [doc.add(key.MAIN_SPECIES, {"name": "species %i" % i, "compartment": comp,
+                                       "init_conc": float(rng.uniform(0.5, 10)), "units": unit})
+            for i in range(species)]
+
+    time = np.linspace(0, 600, rows)
+    pairs = list()
+    for r in range(reactions):
+        substrate, product = rng.choice(len(sids), 2, replace=False)
+        pairs.append((sids[substrate], sids[product]))
+        reac = doc.add(key.MAIN_REACTION, {"name": "reaction %i" % r,
+                                           "reactants": [{"id": sids[substrate], "stochiometry": 1}],
+                                           "products": [{"id": sids[product], "stochiometry": 1}],
+                                           "modifier": [{"id": enzyme}]})
+        doc.add(key.MAIN_REACTION_CONDITION, {"ph": float(rng.uniform(5, 9)),
+                                              "temperature": (float(rng.uniform(290, 330)), "kelvin")}, reac)
+
+        form = enzml.EnzymeMLFormat()
+        doc.add(key.MAIN_DATA_FORMAT, form)
+        csv = enzml.EnzymeMLCSV(form, name="%s_data_%i" % (name, r))
+        enzymeml.add_csv(csv)
+        file = doc.add(key.MAIN_DATA_FILE, {"file": csv.location, "format": form.sid})
+
+        form.add_column(enzml.create_column(enzml.COLUMN_TYPE_TIME, "second"))
+        csv.add_column([round(float(t), 6) for t in time])
+        measurement = doc.add(key.MAIN_DATA_MEASUREMENTS, {"file": file, "start": 0, "stop": -1,
+                                                           "name": "measurement %i" % r})
+
+        s0 = rng.uniform(0.5, 10)
+        vmax = rng.uniform(0.001, 0.01)
+        km = rng.uniform(0.1, 5)
+        for _ in range(replicas):
+            col = enzml.create_column(enzml.COLUMN_TYPE_CONCENTRATION, sids[substrate], unit)
+            form.add_column(col)
+            values = np.maximum(s0 - vmax * s0 / (km + s0) * time + rng.normal(0, 0.01, rows), 0)
+            csv.add_column([round(float(v), 6) for v in values])
+            doc.add(key.MAIN_REACTION_REPLICAS, enzml.EnzymeMLReplica(measurement, col.replica), reac)
+
+    for m in range(models):
+        model = enzymeml.create_model("%s_model_%i" % (name, m))
+        mdoc = _Counter(model)
+        mdoc.calls = doc.calls
+        for r, (substrate, product) in enumerate(pairs):
+            msub = _model_species(enzymeml, model, mdoc, substrate)
+            reac = mdoc.add(key.MODEL_REACTION, {
+                "name": "reaction %i" % r,
+                "reactants": [{"id": msub, "stochiometry": 1}],
+                "products": [{"id": _model_species(enzymeml, model, mdoc, product), "stochiometry": 1}],
+                "modifier": [{"id": _model_species(enzymeml, model, mdoc, enzyme)}]})
+            mdoc.add(key.MODEL_REACTION_KINETIC_LAW, "vmax * %s / (km + %s)" % (msub, msub), reac)
+            mdoc.add(key.MODEL_REACTION_PARAMETERS, {"name": "vmax", "value": float(rng.uniform(0.001, 0.01)),
+                                                     "units": unit, "stdev": 0.001}, reac)
+            mdoc.add(key.MODEL_REACTION_PARAMETERS, {"name": "km", "value": float(rng.uniform(0.1, 5)),
+                                                     "units": unit}, reac)
+        doc.calls = mdoc.calls
+
+    return enzymeml, doc.calls
@@ -0,0 +1,304 @@
+"""
+Load test of the upload (/transmission) and evaluation (/transmission/Auswertung) endpoints of run.2.py.
+
+Every synthetic user is one worker process which sends its requests one after another; all users start together.
+By default every worker loads run.2.py and sends the requests through the Flask test client, so the memory of
+the worker is the memory of the app. With --url the requests are sent to a running server instead (the memory is
+then only reported for the clients).
+
+The uploads are spreadsheets in the layout of static/Beispiel.xlsx: a column x_parameter (time) and the columns
+rep_1 .. rep_n with the replicas. The workers run in their own temporary directories, since the app writes
+static/Hallo.svg and the archives (C:/enzymeML) relative to the working directory.
+
+    python -m benchmarks.loadtest --users 4 --requests 20 --rows 60 --replicas 3 --output loadtest.json
+"""
+import argparse
+import importlib.util
+import io
+import json
+import multiprocessing
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from queue import Empty
+import urllib.error
+import urllib.request
+from datetime import datetime
+import numpy as np
+from benchmarks.bench import _directory
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP = os.path.join(ROOT, "run.2.py")
+
+UPLOAD = "/transmission"
+EVALUATION = "/transmission/Auswertung"
+
+PARAMETERS = {
+    "given_name": "Load",
+    "last_name": "Test",
+    "email-address": "load.test@example.org",
+    "Instituion": "Benchmark",
+    "Enzyme_Name": "AHAS",
+    "Reaction_name": "Reaction",
+    "Enzyme_concentration": "10",
+    "Sequence_name": "AHAS",
+    "AA_sequence": "MSAKLVQ",
+    "Structure": "",
+    "Enzyme_Formulation": "",
+    "purification": "",
+    "pH": "7.5",
+    "Temperatur": "303.15",
+    "Volume": "1",
+    "volume_unit": "ml",
+    "Reaction_vessel": "Eppi"
+}
+
+
+# Returns the spreadsheet (xlsx bytes) with rows time points and the replicas of a decaying concentration
+def spreadsheet(rows=60, replicas=3, seed=0):
+    import pandas as pd
+
+    rng = np.random.default_rng(seed)
+    time_points = np.arange(rows) * 5.0
+    curve = 0.042 * np.exp(-time_points / (time_points[-1] + 1.0) * 0.3)
+    data = {"x_parameter": time_points}
+    for i in range(1, replicas + 1):
+        data["rep_%i" % i] = curve * (1 + 0.02 * rng.standard_normal(rows))
+
+    buffer = io.BytesIO()
+    pd.DataFrame(data).to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+# Returns the form field "data" of an upload as sent by static/Parameter_grabber.js
+def form_data(user, number):
+    params = dict(PARAMETERS, last_name="user%i_%i" % (user, number))
+    return json.dumps({
+        "Parameters": params,
+        "Reactant_name": ["pyruvate", "acetolactate"],
+        "concentration_value": ["40", "0"],
+        "unit": ["mmol/l", "mmol/l"],
+        "reactant_kind": ["Substrate", "Product"]
+    })
+
+
+def load_app(path=APP):
+    import matplotlib
+    matplotlib.use("Agg")
+
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    spec = importlib.util.spec_from_file_location("run_2", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.app
+
+
+# Returns the resident memory of this process in bytes
+def _rss():
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _TestClient:
+    def __init__(self, path):
+        self.client = load_app(path).test_client()
+
+    def upload(self, data, content):
+        response = self.client.post(UPLOAD, data={"data": data, "filename": (io.BytesIO(content), "upload.xlsx")},
+                                    content_type="multipart/form-data")
+        return response.status_code
+
+    def evaluate(self):
+        return self.client.get(EVALUATION).status_code
+
+
+class _HttpClient:
+    def __init__(self, url):
+        self.url = url.rstrip("/")
+
+    def _send(self, request):
+        try:
+            with urllib.request.urlopen(request) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            return e.code
+
+    def upload(self, data, content):
+        boundary = uuid.uuid4().hex
+        body = ("--%s\r\nContent-Disposition: form-data; name=\"data\"\r\n\r\n%s\r\n" % (boundary, data) +
+                "--%s\r\nContent-Disposition: form-data; name=\"filename\"; filename=\"upload.xlsx\"\r\n"
+                "Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n"
+                % boundary).encode() + content + ("\r\n--%s--\r\n" % boundary).encode()
+        request = urllib.request.Request(self.url + UPLOAD, data=body, method="POST",
+                                         headers={"Content-Type": "multipart/form-data; boundary=%s" % boundary})
+        return self._send(request)
+
+    def evaluate(self):
+        return self._send(urllib.request.Request(self.url + EVALUATION))
+
+
+# Sends one request, returns its latency and whether it failed. Exceptions of the app (propagated by the test
+# client in debug mode) count as failed requests.
+def _timed(func, *args):
+    start = time.perf_counter()
+    try:
+        failed = func(*args) >= 400
+    except Exception:
+        failed = True
+    return time.perf_counter() - start, failed
+
+
+# Runs the requests of a user in a temporary working directory, which is removed afterwards
+def _run_user(user, options, barrier):
+    with tempfile.TemporaryDirectory(prefix="loadtest_%i_" % user) as workdir, _directory(workdir):
+        return _requests(user, options, barrier)
+
+
+def _requests(user, options, barrier):
+    os.makedirs("static", exist_ok=True)
+
+    client = _HttpClient(options["url"]) if options["url"] is not None else _TestClient(options["app"])
+    content = spreadsheet(options["rows"], options["replicas"], user)
+
+    # one request which is not measured (imports and first allocations)
+    _timed(client.upload, form_data(user, -1), content)
+    rss_start = _rss()
+
+    latencies = {UPLOAD: list(), EVALUATION: list()}
+    errors = 0
+    barrier.wait()
+    for i in range(options["requests"]):
+        latency, failed = _timed(client.upload, form_data(user, i), content)
+        latencies[UPLOAD].append(latency)
+        errors += failed
+
+        if options["evaluate"]:
+            latency, failed = _timed(client.evaluate)
+            latencies[EVALUATION].append(latency)
+            errors += failed
+
+    return user, latencies, errors, rss_start, _rss(), time.perf_counter()
+
+
+# One synthetic user. Puts (user, latencies per endpoint, errors, rss at start and end, end time) into the queue.
+def _user(user, options, barrier, queue):
+    try:
+        queue.put(_run_user(user, options, barrier))
+    except Exception:
+        barrier.abort()
+        raise
+
+
+# Collects the results of the workers from the queue. Raises a RuntimeError if a worker exits without its result.
+def _results(workers, queue, poll=1.0):
+    results = list()
+    while len(results) < len(workers):
+        try:
+            results.append(queue.get(timeout=poll))
+            continue
+        except Empty:
+            pass
+
+        failed = [w for w in workers if w.exitcode is not None and w.exitcode != 0]
+        if len(failed) > 0 or not any(w.is_alive() for w in workers):
+            for w in workers:
+                w.terminate()
+            if len(failed) > 0:
+                raise RuntimeError("A worker of the load test failed (exit code %i)." % failed[0].exitcode)
+            raise RuntimeError("The workers of the load test exited without their results.")
+    return results
+
+
+def _latency(values):
+    if len(values) == 0:
+        return None
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {"count": len(values), "mean": float(np.mean(values)), "p50": float(p50), "p95": float(p95),
+            "p99": float(p99), "max": float(np.max(values))}
+
+
+# Runs the load test with users concurrent workers and returns the results (dict)
+def run(users=4, requests=20, rows=60, replicas=3, evaluate=True, url=None, app=APP):
+    options = {"requests": requests, "rows": rows, "replicas": replicas, "evaluate": evaluate, "url": url,
+               "app": app}
+    barrier = multiprocessing.Barrier(users + 1)
+    queue = multiprocessing.Queue()
+    workers = [multiprocessing.Process(target=_user, args=(i, options, barrier, queue)) for i in range(users)]
+    for w in workers:
+        w.start()
+
+    try:
+        barrier.wait()
+    except threading.BrokenBarrierError:
+        for w in workers:
+            w.terminate()
+        raise RuntimeError("A worker of the load test failed during its start.")
+    start = time.perf_counter()
+    results = _results(workers, queue)
+    for w in workers:
+        w.join()
+    wall = max(r[5] for r in results) - start
+
+    endpoints = {UPLOAD: list(), EVALUATION: list()}
+    for r in results:
+        for endpoint, values in r[1].items():
+            endpoints[endpoint] += values
+    total = sum(len(v) for v in endpoints.values())
+
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "target": url if url is not None else "test client",
+            "users": users,
+            "requests": requests,
+            "rows": rows,
+            "replicas": replicas,
+            "upload_bytes": len(spreadsheet(rows, replicas))
+        },
+        "wall_time": wall,
+        "throughput": total / wall,
+        "uploads_per_second": len(endpoints[UPLOAD]) / wall,
+        "errors": sum(r[2] for r in results),
+        "latency": {endpoint: _latency(values) for endpoint, values in endpoints.items() if len(values) > 0},
+        "workers": [{"user": r[0], "rss_start": r[3], "rss_end": r[4], "growth": r[4] - r[3],
+                     "growth_per_request": (r[4] - r[3]) / max(requests, 1)} for r in sorted(results)]
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test of the upload and evaluation endpoints of run.2.py")
+    parser.add_argument("--users", type=int, default=4, help="concurrent synthetic users (worker processes)")
+    parser.add_argument("--requests", type=int, default=20, help="uploads per user")
+    parser.add_argument("--rows", type=int, default=60, help="rows of the spreadsheets")
+    parser.add_argument("--replicas", type=int, default=3, help="replica columns of the spreadsheets")
+    parser.add_argument("--no-evaluate", dest="evaluate", action="store_false",
+                        help="do not request the evaluation page after every upload")
+    parser.add_argument("--url", help="base url of a running server (default: Flask test client in the workers)")
+    parser.add_argument("--app", default=APP, help="the Flask app (default: run.2.py)")
+    parser.add_argument("--output", help="JSON file of the results (default: stdout)")
+    args = parser.parse_args(argv)
+
+    results = run(args.users, args.requests, args.rows, args.replicas, args.evaluate, args.url, args.app)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+    return 1 if results["errors"] > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,264 @@
+"""
+Round trip of a corpus of archives with throughput and fidelity checks.
+
+Every archive of the corpus (default: the .omex files of the repository) is loaded with EnzymeML.load_from_file,
+written again with create_archive and loaded a second time. The two loaded documents are compared semantically:
+    the elements of the experiment model and of every model (SBML without the EnzymeML annotations, compared in
+    canonical XML form), the reaction conditions, the reaction data and the values of every CSV file.
+The load and save throughput (MB/s of the archive sizes) is recorded. Archives which cannot be loaded in the first
+place because they are no valid archives or their master file is missing or no SBML file are reported as
+unsupported, not as failures; other load errors are failures.
+
+    python -m benchmarks.roundtrip [archives or directories] --output roundtrip.json
+"""
+import argparse
+import glob
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from datetime import datetime
+import libsbml as sbml
+import enzymeml.enzymeml as enzml
+from benchmarks.bench import _directory
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STATUS_OK = "ok"
+STATUS_MISMATCH = "mismatch"
+STATUS_ERROR = "error"
+STATUS_UNSUPPORTED = "unsupported"
+
+# The load errors of archives which are no EnzymeML archives: no valid archive, no master file, master is no SBML
+_UNSUPPORTED = ("Could not find a valid omex archive", "The archive has no master file", "Master file (")
+
+
+# Returns the archive locations of the locations (files or directories), default: the archives of the repository
+def corpus(locations=None):
+    if locations is None or len(locations) == 0:
+        locations = [ROOT]
+    result = list()
+    for location in locations:
+        if os.path.isdir(location):
+            result += sorted(glob.glob(os.path.join(location, "*.omex")))
+        else:
+            result.append(location)
+    return result
+
+
+def _canonical(xml):
+    if xml is None or xml == "":
+        return ""
+    return ET.canonicalize(xml, strip_text=True)
+
+
+# The elements of a SBML model by their list and id, as canonical XML without annotations
+def _elements(model):
+    elements = dict()
+    if model is None:
+        return elements
+
+    lists = [model.getListOfFunctionDefinitions(), model.getListOfUnitDefinitions(),
+             model.getListOfCompartments(), model.getListOfSpecies(), model.getListOfParameters(),
+             model.getListOfReactions()]
+    for lo in lists:
+        for i in range(lo.size()):
+            el = lo.get(i).clone()
+            el.unsetAnnotation()
+            elements[(lo.getElementName(), el.getId())] = _canonical(el.toSBML())
+    return elements
+
+
+def _compare_elements(where, a, b, differences):
+    ea = _elements(a)
+    eb = _elements(b)
+    for k in sorted(set(ea) | set(eb)):
+        if k not in eb:
+            differences.append("%s: %s '%s' is missing after the round trip" % (where, k[0], k[1]))
+        elif k not in ea:
+            differences.append("%s: %s '%s' was added by the round trip" % (where, k[0], k[1]))
+        elif ea[k] != eb[k]:
+            differences.append("%s: %s '%s' differs" % (where, k[0], k[1]))
+
+
+def _species_annotations(model):
+    return {sp.getId(): _canonical(sp.getAnnotationString()) for sp in model.getListOfSpecies()} \
+        if model is not None else dict()
+
+
+# Cells are equal if their values are, e.g. a float of a new document and the Decimal read from its archive
+def _same_cell(a, b):
+    if a == b or str(a) == str(b):
+        return True
+    try:
+        return float(a) == float(b)
+    except (TypeError, ValueError):
+        return False
+
+
+def _compare_csvs(a, b, differences):
+    ca = {csv.location: csv for csv in a.csvs}
+    cb = {csv.location: csv for csv in b.csvs}
+    for loc in sorted(set(ca) | set(cb), key=str):
+        if loc not in cb:
+            differences.append("csv '%s' is missing after the round trip" % loc)
+        elif loc not in ca:
+            differences.append("csv '%s' was added by the round trip" % loc)
+        else:
+            ra = ca[loc].get_rows()
+            rb = cb[loc].get_rows()
+            if len(ra) != len(rb):
+                differences.append("csv '%s': %i rows instead of %i" % (loc, len(rb), len(ra)))
+                continue
+            for i, (x, y) in enumerate(zip(ra, rb)):
+                if len(x) != len(y) or not all(_same_cell(u, v) for u, v in zip(x, y)):
+                    differences.append("csv '%s': row %i differs" % (loc, i))
+                    break
+
+
+# Returns the semantic differences (list of str) of two documents
+def compare(a, b):
+    differences = list()
+
+    _compare_elements("experiment", a.get_model(), b.get_model(), differences)
+    sa = _species_annotations(a.get_model())
+    sb = _species_annotations(b.get_model())
+    for sid in sorted(set(sa) & set(sb)):
+        if sa[sid] != sb[sid]:
+            differences.append("experiment: the annotation of the species '%s' differs" % sid)
+
+    conds = set(a.reaction_condition) | set(b.reaction_condition)
+    for sid in sorted(conds):
+        if sid not in a.reaction_condition or sid not in b.reaction_condition:
+            differences.append("the reaction condition of '%s' is only in one document" % sid)
+        elif _canonical(a.reaction_condition[sid].to_xml_string()) != \
+                _canonical(b.reaction_condition[sid].to_xml_string()):
+            differences.append("the reaction condition of '%s' differs" % sid)
+
+    da = _canonical(a.reaction_data.to_xml_string()) if a.reaction_data is not None else ""
+    db = _canonical(b.reaction_data.to_xml_string()) if b.reaction_data is not None else ""
+    if da != db:
+        differences.append("the reaction data differ")
+
+    _compare_csvs(a, b, differences)
+
+    ma = {m.name: m for m in a.models}
+    mb = {m.name: m for m in b.models}
+    for name in sorted(set(ma) | set(mb)):
+        if name not in mb:
+            differences.append("the model '%s' is missing after the round trip" % name)
+        elif name not in ma:
+            differences.append("the model '%s' was added by the round trip" % name)
+        else:
+            _compare_elements("model '%s'" % name, ma[name].get_model(), mb[name].get_model(), differences)
+
+    return differences
+
+
+def _load(name, location):
+    enzymeml = enzml.EnzymeML(name)
+    start = time.perf_counter()
+    enzymeml.load_from_file(location)
+    return enzymeml, time.perf_counter() - start
+
+
+# Whether the error of the first load means that the archive is not supported (e.g. no EnzymeML archive)
+def _unsupported(error):
+    return isinstance(error, RuntimeError) and str(error).startswith(_UNSUPPORTED)
+
+
+def _mb_per_s(size, seconds):
+    return size / 1e6 / seconds if seconds > 0 else None
+
+
+# Round trip of one archive, returns the result dict
+def roundtrip(location, workdir=None):
+    location = os.path.abspath(location)
+    name = "roundtrip"
+    size = os.path.getsize(location)
+    result = {"archive": os.path.basename(location), "bytes": size}
+
+    try:
+        first, load_time = _load(name, location)
+    except Exception as e:
+        status = STATUS_UNSUPPORTED if _unsupported(e) else STATUS_ERROR
+        result.update(status=status, error="%s: %s" % (type(e).__name__, e))
+        return result
+
+    try:
+        with tempfile.TemporaryDirectory(dir=workdir) as tmp, _directory(tmp):
+            start = time.perf_counter()
+            first.create_archive(delete=True)
+            save_time = time.perf_counter() - start
+            written = os.path.abspath("%s.omex" % name)
+            written_size = os.path.getsize(written)
+
+            second, reload_time = _load(name, written)
+    except Exception as e:
+        result.update(status=STATUS_ERROR, error="%s: %s" % (type(e).__name__, e))
+        return result
+
+    differences = compare(first, second)
+
+    result.update({
+        "status": STATUS_OK if len(differences) == 0 else STATUS_MISMATCH,
+        "differences": differences,
+        "written_bytes": written_size,
+        "load_time": load_time,
+        "save_time": save_time,
+        "reload_time": reload_time,
+        "load_mb_per_s": _mb_per_s(size, load_time),
+        "save_mb_per_s": _mb_per_s(written_size, save_time),
+        "reload_mb_per_s": _mb_per_s(written_size, reload_time),
+        "csvs": len(second.csvs),
+        "models": len(second.models),
+        "species": second.get_model().getNumSpecies() if second.get_model() is not None else 0
+    })
+    return result
+
+
+def run(locations=None, workdir=None):
+    results = [roundtrip(location, workdir) for location in corpus(locations)]
+    return {
+        "meta": {
+            "created": datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "libsbml": sbml.getLibSBMLDottedVersion()
+        },
+        "results": results,
+        "failures": sum(r["status"] in (STATUS_MISMATCH, STATUS_ERROR) for r in results)
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Round trip of EnzymeML archives with fidelity checks")
+    parser.add_argument("locations", nargs="*", help="archives or directories (default: the repository)")
+    parser.add_argument("--output", help="JSON file of the results (default: stdout)")
+    parser.add_argument("--strict", action="store_true", help="unsupported archives are failures")
+    args = parser.parse_args(argv)
+
+    results = run(args.locations)
+    if args.output is not None:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        sys.stdout.write("\n")
+
+    for r in results["results"]:
+        if r["status"] != STATUS_OK:
+            sys.stderr.write("%s: %s %s\n" % (r["archive"], r["status"],
+                                              r.get("error", "; ".join(r.get("differences", [])))))
+
+    failed = results["failures"] > 0
+    if args.strict:
+        failed = failed or any(r["status"] == STATUS_UNSUPPORTED for r in results["results"])
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,182 @@
+"""
+Alignment of measurements onto a common time axis.
+
+Replicas recorded in different files or measurements often use slightly different time points. align() merges
+the concentration columns of several measurements onto one grid (the union or intersection of their time points,
+or a resampled grid) by linear or nearest interpolation. The interpolation of all columns of a measurement is one
+set of array operations.
+"""
+import numpy as np
+import enzymeml.enzymeml as enzml
+import enzymeml.data as data
+import enzymeml.units as units
+from enzymeml.tables import ColumnDependentTable
+
+GRID_UNION = "union"
+GRID_INTERSECTION = "intersection"
+GRID_RESAMPLE = "resample"
+
+INTERPOLATION_LINEAR = "linear"
+INTERPOLATION_NEAREST = "nearest"
+
+
+def _merge_close(grid, tolerance):
+    if tolerance <= 0 or len(grid) < 2:
+        return grid
+    keep = np.concatenate([[True], np.diff(grid) > tolerance])
+    return grid[keep]
+
+
+def _has_point(time, grid, tolerance):
+    pos = np.clip(np.searchsorted(time, grid), 1, max(1, len(time) - 1))
+    nearest = np.minimum(np.abs(grid - time[pos - 1]), np.abs(time[np.minimum(pos, len(time) - 1)] - grid))
+    return nearest <= tolerance
+
+
+# Returns the common grid of the time arrays.
+# grid: GRID_UNION, GRID_INTERSECTION, GRID_RESAMPLE (points equidistant points in the overlapping time range)
+#       or an array of time points
+def common_grid(times, grid=GRID_UNION, points=None, tolerance=0.0):
+    times = [np.sort(t[~np.isnan(t)]) for t in times]
+
+    if not isinstance(grid, str):
+        return np.asarray(grid, dtype=float)
+    if len(times) == 0:
+        return np.empty(0)
+
+    if grid == GRID_UNION:
+        return _merge_close(np.unique(np.concatenate(times)), tolerance)
+    elif grid == GRID_INTERSECTION:
+        common = _merge_close(np.unique(times[0]), tolerance)
+        for t in times[1:]:
+            if len(t) == 0:
+                return np.empty(0)
+            common = common[_has_point(t, common, tolerance)]
+        return common
+    elif grid == GRID_RESAMPLE:
+        start = max(t[0] for t in times if len(t) > 0)
+        stop = min(t[-1] for t in times if len(t) > 0)
+        if points is None:
+            points = max(len(t) for t in times)
+        return np.linspace(start, stop, points) if stop >= start else np.empty(0)
+    else:
+        raise ValueError("Unknown grid '%s'." % grid)
+
+
+# Interpolates the columns of values (rows x columns) given at the points 'time' onto 'grid'.
+# Grid points outside of the measured range are NaN. Every column is interpolated over its own finite values only,
+# so a missing cell (NaN) does not affect the neighbouring grid points.
+def interpolate(time, values, grid, method=INTERPOLATION_LINEAR):
+    time = np.asarray(time, dtype=float)
+    values = np.asarray(values, dtype=float)
+    grid = np.asarray(grid, dtype=float)
+
+    valid = ~np.isnan(time)
+    time = time[valid]
+    values = values[valid]
+
+    order = np.argsort(time, kind="stable")
+    time = time[order]
+    values = values[order]
+
+    out = np.full((len(grid), values.shape[1]), np.nan)
+    if len(time) == 0:
+        return out
+
+    finite = np.isfinite(values)
+    if not finite.all():
+        for j in range(values.shape[1]):
+            out[:, j] = interpolate(time[finite[:, j]], values[finite[:, j], j:j + 1], grid, method)[:, 0]
+        return out
+
+    inside = (grid >= time[0]) & (grid <= time[-1])
+    g = grid[inside]
+
+    if len(time) == 1:
+        out[inside] = values[0]
+        return out
+
+    right = np.clip(np.searchsorted(time, g, side="right"), 1, len(time) - 1)
+    left = right - 1
+    span = time[right] - time[left]
+    weight = np.divide(g - time[left], span, out=np.zeros_like(g), where=span > 0)
+
+    if method == INTERPOLATION_LINEAR:
+        out[inside] = values[left] + (values[right] - values[left]) * weight[:, None]
+    elif method == INTERPOLATION_NEAREST:
+        out[inside] = values[np.where(weight > 0.5, right, left)]
+    else:
+        raise ValueError("Unknown interpolation '%s'." % method)
+
+    return out
+
+
+# Concentration columns of several measurements on a common time grid
+class AlignedData:
+    def __init__(self, time, values, columns, measurements, time_unit):
+        self.time = time
+        self.values = values  # (time points x columns)
+        self.columns = columns  # EnzymeMLColumnConcentration of every column
+        self.measurements = measurements  # measurement sid of every column
+        self.time_unit = time_unit
+
+    def labels(self):
+        return ["%s:%s" % (m, enzml._get_id(c.replica)) for m, c in zip(self.measurements, self.columns)]
+
+    def species(self):
+        return [enzml._get_id(c.species) for c in self.columns]
+
+    def select(self, species):
+        idx = [i for i, s in enumerate(self.species()) if s == enzml._get_id(species)]
+        return AlignedData(self.time, self.values[:, idx], [self.columns[i] for i in idx],
+                           [self.measurements[i] for i in idx], self.time_unit)
+
+    def to_table(self):
+        table = ColumnDependentTable("time", capacity=max(16, len(self.time)))
+        for i, label in enumerate(self.labels()):
+            table.init_column(label)
+            table.add_many(self.time, label, self.values[:, i])
+        return table
+
+
+# Aligns the concentration columns of the measurements (sids) of the document onto a common time grid.
+# species: only columns of this species | unit: converts the concentrations into this unit
+# The times are converted into the time unit of the first measurement.
+def align(enzymeml, measurements, grid=GRID_UNION, method=INTERPOLATION_LINEAR, points=None, tolerance=0.0,
+          species=None, unit=None):
+    measured = list()
+    time_unit = None
+
+    for sid in measurements:
+        if unit is not None:
+            m = units.convert_measurement(enzymeml, sid, unit)
+        else:
+            m = data.get_measurement(enzymeml, sid)
+
+        if m.time is None:
+            raise RuntimeError("The measurement '%s' has no time column." % enzml._get_id(sid))
+
+        if time_unit is None:
+            time_unit = m.time_column.unit
+        elif enzml._get_id(m.time_column.unit) != enzml._get_id(time_unit):
+            m.time = m.time * units.conversion_factor(enzymeml, m.time_column.unit, time_unit)
+
+        if species is not None:
+            idx = [i for i, s in enumerate(m.species()) if s == enzml._get_id(species)]
+            m.values = m.values[:, idx]
+            m.columns = [m.columns[i] for i in idx]
+
+        measured.append(m)
+
+    time = common_grid([m.time for m in measured], grid, points, tolerance)
+
+    values = list()
+    columns = list()
+    sids = list()
+    for m in measured:
+        values.append(interpolate(m.time, m.values, time, method))
+        columns += m.columns
+        sids += [m.measurement.sid] * len(m.columns)
+
+    values = np.hstack(values) if len(values) > 0 else np.empty((len(time), 0))
+    return AlignedData(time, values, columns, sids, time_unit)
@@ -0,0 +1,164 @@
+"""
+Bootstrap and jackknife uncertainties of fitted rate-law parameters.
+
+The data of a model reaction are the initial rates of its replicas (see enzymeml.fitting). The bootstrap either
+resamples the replicas with replacement ("replicas") or adds resampled residuals to the fitted curve
+("residuals"); the jackknife leaves out one replica at a time. The refits run in a process pool. The samples are
+split into chunks of fixed size, every chunk gets its own child of a numpy SeedSequence, so the results only depend
+on the seed and not on the number of processes. Standard deviations and confidence intervals are written into the
+uncertainties (distrib) of the parameters of the model reaction.
+"""
+import concurrent.futures
+import numpy as np
+import scipy.stats
+import enzymeml.enzymeml as enzml
+import enzymeml.fitting as fitting
+
+METHOD_REPLICAS = "replicas"
+METHOD_RESIDUALS = "residuals"
+METHOD_JACKKNIFE = "jackknife"
+
+CHUNK_SIZE = 64
+
+
+class BootstrapResult:
+    def __init__(self, law, method, estimate, samples, stdev, lower, upper, confidence):
+        self.law = law
+        self.method = method
+        self.estimate = estimate  # the fit of the original data
+        self.samples = samples  # (samples x parameters), NaN for failed refits
+        self.stdev = stdev
+        self.lower = lower
+        self.upper = upper
+        self.confidence = confidence
+
+    def failed(self):
+        return int(np.isnan(self.samples).any(axis=1).sum())
+
+
+def _refit(law, s, v, p0):
+    try:
+        return fitting.fit(s, v, law, p0).values
+    except (ValueError, np.linalg.LinAlgError):
+        return np.full(len(law.parameters), np.nan)
+
+
+# Refits a chunk of samples. For the jackknife, seed is the first left out index.
+def _run_chunk(law, method, s, v, estimate, seed, count):
+    out = np.empty((count, len(law.parameters)))
+
+    if method == METHOD_JACKKNIFE:
+        keep = np.ones(len(s), dtype=bool)
+        for i in range(count):
+            keep[:] = True
+            keep[seed + i] = False
+            out[i] = _refit(law, s[keep], v[keep], estimate)
+        return out
+
+    rng = np.random.default_rng(seed)
+    n = len(s)
+    idx = rng.integers(0, n, size=(count, n))
+
+    if method == METHOD_REPLICAS:
+        for i in range(count):
+            out[i] = _refit(law, s[idx[i]], v[idx[i]], estimate)
+    elif method == METHOD_RESIDUALS:
+        fitted = law.func(s, estimate)
+        residuals = v - fitted
+        residuals = residuals - residuals.mean()
+        for i in range(count):
+            out[i] = _refit(law, s, fitted + residuals[idx[i]], estimate)
+    else:
+        raise ValueError("Unknown method '%s'." % method)
+
+    return out
+
+
+# Bootstrap (or jackknife) of the rate law fitted to the data points (s, v). processes: number of worker processes
+# (default: in this process)
+def bootstrap(s, v, law=fitting.MICHAELIS_MENTEN, method=METHOD_REPLICAS, samples=1000, seed=None,
+              confidence=0.95, processes=None):
+    law = fitting._law(law)
+    s = np.asarray(s, dtype=float)
+    v = np.asarray(v, dtype=float)
+    valid = ~(np.isnan(s) | np.isnan(v))
+    s = s[valid]
+    v = v[valid]
+
+    estimate = fitting.fit(s, v, law).values
+
+    if method == METHOD_JACKKNIFE:
+        samples = len(s)
+        starts = list(range(0, samples, CHUNK_SIZE))
+        seeds = starts
+    else:
+        starts = list(range(0, samples, CHUNK_SIZE))
+        seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    counts = [min(CHUNK_SIZE, samples - start) for start in starts]
+
+    if processes is not None and processes > 1:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            futures = [executor.submit(_run_chunk, law, method, s, v, estimate, sd, c) for sd, c in zip(seeds, counts)]
+            chunks = [f.result() for f in futures]
+    else:
+        chunks = [_run_chunk(law, method, s, v, estimate, sd, c) for sd, c in zip(seeds, counts)]
+
+    values = np.vstack(chunks) if len(chunks) > 0 else np.empty((0, len(law.parameters)))
+    ok = values[~np.isnan(values).any(axis=1)]
+    alpha = 1 - confidence
+
+    if method == METHOD_JACKKNIFE:
+        n = len(ok)
+        stdev = np.sqrt((n - 1) / n * ((ok - ok.mean(axis=0)) ** 2).sum(axis=0)) if n > 1 \
+            else np.full(len(estimate), np.nan)
+        half = scipy.stats.t.ppf(1 - alpha / 2, max(n - 1, 1)) * stdev
+        lower = estimate - half
+        upper = estimate + half
+    elif len(ok) > 1:
+        stdev = ok.std(axis=0, ddof=1)
+        lower, upper = np.percentile(ok, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+    else:
+        stdev = lower = upper = np.full(len(estimate), np.nan)
+
+    return BootstrapResult(law, method, estimate, values, stdev, lower, upper, confidence)
+
+
+# Sets the standard deviation and the confidence interval as uncertainty of the local parameter
+def _write_uncertainty(lp, stdev, lower, upper):
+    distrib = lp.getPlugin("distrib")
+    while distrib.getNumUncertainties() > 0:
+        distrib.removeUncertainty(0)
+
+    unc = distrib.createUncertainty()
+    if not np.isnan(stdev):
+        param = unc.createUncertParameter()
+        param.setType("standardDeviation")
+        param.setValue(float(stdev))
+    if not (np.isnan(lower) or np.isnan(upper)):
+        span = unc.createUncertSpan()
+        span.setType("confidenceInterval")
+        span.setValueLower(float(lower))
+        span.setValueUpper(float(upper))
+
+
+# Bootstraps the rate law of the model reaction (fitted by enzymeml.fitting) on its used data and writes the
+# uncertainties into its parameters. See bootstrap for the arguments.
+def bootstrap_model_reaction(enzymeml, model, reaction, law=fitting.MICHAELIS_MENTEN, method=METHOD_REPLICAS,
+                             samples=1000, seed=None, confidence=0.95, processes=None, substrate=None, write=True):
+    law = fitting._law(law)
+    s, v, _, _, _ = fitting.used_data_points(enzymeml, model, reaction, substrate)
+    result = bootstrap(s, v, law, method, samples, seed, confidence, processes)
+
+    if write:
+        reac = model.get_model().getReaction(enzml._get_id(reaction))
+        kl = reac.getKineticLaw() if reac is not None and reac.isSetKineticLaw() else None
+        if kl is None:
+            raise RuntimeError("The model reaction '%s' has no kinetic law." % enzml._get_id(reaction))
+
+        for i, name in enumerate(law.parameters):
+            lp = kl.getLocalParameter(name)
+            if lp is None:
+                raise RuntimeError("The kinetic law of '%s' has no parameter '%s'." % (enzml._get_id(reaction), name))
+            _write_uncertainty(lp, result.stdev[i], result.lower[i], result.upper[i])
+
+    return result
@@ -0,0 +1,142 @@
+"""
+Array access to the measured data of an EnzymeML document.
+
+The columns of the CSV files are converted to float arrays once and cached on the EnzymeMLCSV until its data
+changes (EnzymeMLCSV.revision). The cached arrays are read-only, so they can be handed out without copies.
+"""
+import numpy as np
+import enzymeml.enzymeml as enzml
+
+
+# Returns the EnzymeMLFormat of a csv file. The format is given as object or as sid of the data annotation.
+def get_format(enzymeml, csv):
+    form = csv.format
+    if isinstance(form, enzml.EnzymeMLFormat):
+        return form
+
+    data = enzymeml.get_reaction_data()
+    if data is None or enzml._get_id(form) not in data.listOfFormats.formats:
+        raise RuntimeError("The format '%s' of the file '%s' is unknown." % (enzml._get_id(form), csv.location))
+    return data.listOfFormats.formats[enzml._get_id(form)]
+
+
+# Returns the csv file containing the data of a file sid (or location) of the data annotation
+def get_csv(enzymeml, file):
+    location = file
+    data = enzymeml.get_reaction_data()
+    if data is not None and enzml._get_id(file) in data.listOfFiles.files:
+        location = data.listOfFiles.files[enzml._get_id(file)].location
+
+    for csv in enzymeml.csvs:
+        if csv.location == location:
+            return csv
+
+    raise RuntimeError("No data is loaded for the file '%s'." % enzml._get_id(file))
+
+
+# Returns a list of (csv column index, EnzymeMLColumn). Empty columns can span several csv columns.
+def column_indices(form):
+    indices = list()
+    index = 0
+
+    for column in form.columns:
+        indices.append((index, column))
+        if type(column) is enzml.EnzymeMLColumnEmpty:
+            index += column.get_amount()
+        else:
+            index += 1
+
+    return indices
+
+
+def _to_float(value):
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+# Returns a column of the csv as read-only float array. Empty and text cells are NaN.
+def column_array(csv, index):
+    arr = csv._arrays.get(index)
+    if arr is not None:
+        return arr
+
+    col = csv.columns[index]
+    if isinstance(col, np.ndarray) and col.dtype.kind == "f":
+        arr = col.view()
+    else:
+        arr = np.fromiter((_to_float(v) for v in col), dtype=float, count=len(col))
+
+    arr.flags.writeable = False
+    csv._arrays[index] = arr
+    return arr
+
+
+# The data of one measurement: the time series and one column per concentration column of the format
+class MeasurementData:
+    def __init__(self, measurement, csv, time, time_column, values, columns, indices):
+        self.measurement = measurement
+        self.csv = csv
+        self.time = time
+        self.time_column = time_column
+        self.values = values
+        self.columns = columns
+        self.indices = indices
+
+    def species(self):
+        return [enzml._get_id(c.species) for c in self.columns]
+
+    def replicas(self):
+        return [enzml._get_id(c.replica) for c in self.columns]
+
+    def column(self, replica):
+        return self.values[:, self.replicas().index(enzml._get_id(replica))]
+
+
+def _padded(arr, length):
+    if len(arr) >= length:
+        return arr
+    return np.concatenate([arr, np.full(length - len(arr), np.nan)])
+
+
+def _rows(measurement, nrows):
+    start = int(measurement.start)
+    stop = int(measurement.stop)
+    return slice(start, nrows if stop < 0 else min(stop, nrows))
+
+
+# Returns the MeasurementData of a measurement sid. values is a (rows x columns) array of the measured rows.
+def get_measurement(enzymeml, sid):
+    data = enzymeml.get_reaction_data()
+    if data is None or enzml._get_id(sid) not in data.listOfMeasurements.measurements:
+        raise RuntimeError("The measurement '%s' is unknown." % enzml._get_id(sid))
+
+    measurement = data.listOfMeasurements.measurements[enzml._get_id(sid)]
+    csv = get_csv(enzymeml, measurement.file)
+    rows = _rows(measurement, csv.nrows())
+    length = max(0, rows.stop - rows.start)
+
+    time = None
+    time_column = None
+    columns = list()
+    indices = list()
+
+    for index, column in column_indices(get_format(enzymeml, csv)):
+        if index >= len(csv.columns):
+            break
+        if column.type == enzml.COLUMN_TYPE_TIME and time is None:
+            time = _padded(column_array(csv, index)[rows], length)
+            time_column = column
+        elif type(column) is enzml.EnzymeMLColumnConcentration:
+            columns.append(column)
+            indices.append(index)
+
+    if len(indices) > 0:
+        values = np.column_stack([_padded(column_array(csv, i)[rows], length) for i in indices])
+    else:
+        values = np.empty((length, 0))
+
+    return MeasurementData(measurement, csv, time, time_column, values, columns, indices)
@@ -4,11 +4,17 @@ import enzymeml.enzymemlkey as key
 import xml.etree.ElementTree as ET
 from datetime import datetime as time
 import enzymeml.ontologymanager as ontology
-import traceback
+import enzymeml.log as log
+import enzymeml.metrics as metrics
+import enzymeml.omex as omex
+from time import perf_counter
 import decimal
+import codecs
+import io
+import zipfile
 import os, shutil
 
-DEBUG = True
+_log = log.get_logger(__name__)
 
 
 def namespace():
@@ -288,8 +294,7 @@ class EnzymeMLReaction:
             elif node.getName() == "replicas":
                 self._from_replica(node)
             else:
-                if DEBUG:
-                    print("The xmlNode name of reaction enzymeml tag '%s' is not given." % node.getName())
+                _log.debug("The xmlNode name of reaction enzymeml tag '%s' is not given.", node.getName())
 
     def _from_cond(self, xmlnode):
         length = xmlnode.getNumChildren()
@@ -313,8 +318,7 @@ class EnzymeMLReaction:
                 t2 = node.getAttrValue("unit")
                 self.shaking_frequency = (t1, t2)
             else:
-                if DEBUG:
-                    print("The xmlNode name of reaction enzymeml tag '%s' is not given." % node.getName())
+                _log.debug("The xmlNode name of reaction enzymeml tag '%s' is not given.", node.getName())
 
     def _from_replica(self, xmlnode):
         length = xmlnode.getNumChildren()
@@ -424,8 +428,7 @@ class EnzymeMLData:
             elif node.getName() == "listOfMeasurements":
                 self.listOfMeasurements.from_xmlnode(node)
             else:
-                if DEBUG:
-                    print("The xmlNode name of data enzymeml tag '%s' is not given." % node.getName())
+                _log.debug("The xmlNode name of data enzymeml tag '%s' is not given.", node.getName())
 
 
 class EnzymeMLColumnType:
@@ -522,8 +525,7 @@ def create_column(ct, *args):
     elif ct is COLUMN_TYPE_EMPTY:
         return EnzymeMLColumnEmpty(None if len(args) < 1 else args[0],  None if len(args) < 2 else args[1])
     else:
-        if DEBUG:
-            print("Unknown column type %s added as an empty column." % ct)
+        _log.debug("Unknown column type %s added as an empty column.", ct)
         return EnzymeMLColumnEmpty(None, ct)
 
 
@@ -573,8 +575,8 @@ class EnzymeMLFormat:
             text = None
             if node.getName() == "column":
                 t = node.getAttrValue("type")
-                if (t is None or t == "") and DEBUG:
-                    print("No type is given in the column in line %i." % node.getLine())
+                if t is None or t == "":
+                    _log.debug("No type is given in the column in line %i.", node.getLine())
                     continue
 
                 if t == COLUMN_TYPE_TIME:
@@ -601,12 +603,10 @@ class EnzymeMLFormat:
                         text = node.getChild(0).getCharacters()
                     self.add_column(create_column(COLUMN_TYPE_EMPTY, None if a is None else int(a), text))
                 else:
-                    if DEBUG:
-                        print("Unknown type is given in the column in line %i." % node.getLine())
+                    _log.debug("Unknown type is given in the column in line %i.", node.getLine())
                     self.add_column(create_column(COLUMN_TYPE_EMPTY, None, t))
             else:
-                if DEBUG:
-                    print("The xmlNode name of format enzymeml tag '%s' is not given." % node.getName())
+                _log.debug("The xmlNode name of format enzymeml tag '%s' is not given.", node.getName())
 
 
 # This describes the CSV file format
@@ -652,8 +652,7 @@ class EnzymeMLListOfFormats:
                 form = self.add_format(sid)
                 form.from_xmlnode(node)
             else:
-                if DEBUG:
-                    print("The xmlNode name of format enzymeml tag '%s' is not given." % node.getName())
+                _log.debug("The xmlNode name of format enzymeml tag '%s' is not given.", node.getName())
 
 
 # This lists all files with their specific formats
@@ -719,8 +718,7 @@ class EnzymeMLListOfFiles:
                     sid = None
                 self.add_file(node.getAttrValue("file"), node.getAttrValue("format"), sid)
             else:
-                if DEBUG:
-                    print("The xmlNode name of format enzymeml tag '%s' is not given." % node.getName())
+                _log.debug("The xmlNode name of format enzymeml tag '%s' is not given.", node.getName())
 
 
 # This lists all made measurements with the files and the data positions
@@ -788,8 +786,7 @@ class EnzymeMLListOfMeasurements:
                 self.add_measurement(node.getAttrValue("name"), node.getAttrValue("file"),
                                      int(node.getAttrValue("start")), int(node.getAttrValue("stop")), sid)
             else:
-                if DEBUG:
-                    print("The xmlNode name of format enzymeml tag '%s' is not given." % node.getName())
+                _log.debug("The xmlNode name of format enzymeml tag '%s' is not given.", node.getName())
 
 
 # Used data container of the modelling file
@@ -908,6 +905,74 @@ def _get_model_ident(model):
 # The main EnzymeML file. This class is used to create, load and modify EnzymeML Combine Archives. #
 # This class allows the management of the different included files.                                #
 ####################################################################################################
+BACKEND_LIBCOMBINE = "libcombine"
+BACKEND_ZIPFILE = "zipfile"
+ARCHIVE_BACKENDS = (BACKEND_LIBCOMBINE, BACKEND_ZIPFILE)
+
+_archive_backend = os.environ.get("ENZYMEML_ARCHIVE_BACKEND", BACKEND_LIBCOMBINE)
+
+
+# Selects the archive backend of load_from_file and create_archive: libcombine or zipfile (see enzymeml.omex)
+def set_archive_backend(backend):
+    global _archive_backend
+    _archive_backend = _check_backend(backend)
+
+
+def get_archive_backend():
+    return _archive_backend
+
+
+def _check_backend(backend):
+    backend = _archive_backend if backend is None else backend
+    if backend not in ARCHIVE_BACKENDS:
+        raise ValueError("Unknown archive backend '%s', use one of %s." % (backend, ", ".join(ARCHIVE_BACKENDS)))
+    return backend
+
+
+# The entries of an archive read by libcombine, with the interface of omex.Archive used by load_from_file
+class _CombineArchive:
+    def __init__(self, location):
+        self.location = location
+        self._zip = None
+        self.omx = combine.CombineArchive()
+        if self.omx.initializeFromArchive(location) is None:
+            raise RuntimeError("Could not find a valid omex archive at '%s'." % location)
+
+        self.entries = list()
+        for i in range(self.omx.getNumEntries()):
+            entry = self.omx.getEntry(i)
+            self.entries.append(omex.Entry(entry.getLocation(), entry.getFormat(),
+                                           entry.isSetMaster() and entry.getMaster()))
+
+    def master(self):
+        master = self.omx.getMasterFile()
+        if master is None:
+            return None
+        return omex.Entry(master.getLocation(), master.getFormat(), True)
+
+    def read_entry(self, location):
+        return self.omx.extractEntryToString(location)
+
+    # The entry as decompressing text stream. libcombine only extracts whole entries, so the archive is opened with
+    # zipfile as well.
+    def open_text(self, location):
+        if self._zip is None:
+            self._zip = zipfile.ZipFile(self.location)
+        return io.TextIOWrapper(self._zip.open(omex._name(location)), encoding="utf-8", newline="")
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        self.omx.cleanUp()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
 class EnzymeML:
     def __init__(self, name):
         self.name = name
@@ -967,21 +1032,21 @@ class EnzymeML:
     def create_files(self):
         try:
             os.mkdir("./%s" % self.name)
-            print("Created directory %s\\%s." % (os.getcwd(), self.name))
+            _log.debug("Created directory ./%s.", self.name)
         except FileExistsError:
             pass
 
         if len(self.models) > 0:
             try:
                 os.mkdir("./%s/models" % self.name)
-                print("Created directory %s\\%s." % (os.getcwd(), self.name))
+                _log.debug("Created directory ./%s/models.", self.name)
             except FileExistsError:
                 pass
 
         if len(self.csvs) > 0:
             try:
                 os.mkdir("./%s/data" % self.name)
-                print("Created directory %s\\%s." % (os.getcwd(), self.name))
+                _log.debug("Created directory ./%s/data.", self.name)
             except FileExistsError:
                 pass
 
@@ -1012,21 +1077,57 @@ class EnzymeML:
 
         return archive
 
-    # Creates all files and saves them as Zip archive. The deletes the folder.
-    def create_archive(self, delete=False):
-        archive = self.create_files()
+    # Creates the archive in memory without writing files (omex.Archive of the zipfile backend). levels: compression
+    # levels of the entries by location or kind ("sbml", "csv"), 0: stored
+    def create_omex(self, levels=None):
+        levels = dict() if levels is None else levels
+        archive = omex.Archive()
+        archive.metadata = omex.Metadata("EnzymeML Archive - %s" % self.name,
+                                         [omex.Creator.from_vcard(c) for c in self.creator])
+
+        archive.add_string(self.to_sbml_string(), "./experiment.xml", omex.FORMAT_SBML, True,
+                           level=levels.get("./experiment.xml", levels.get("sbml")))
+        for model in self.models:
+            location = "./models/%s.xml" % model.name
+            archive.add_string(model.to_sbml_string(), location, omex.FORMAT_SBML,
+                               level=levels.get(location, levels.get("sbml")))
+        for csv in self.csvs:
+            archive.add_string(csv.to_string(), csv.location, omex.FORMAT_CSV,
+                               level=levels.get(csv.location, levels.get("csv")))
+
+        return archive
+
+    # Creates all files and saves them as Zip archive. The deletes the folder. backend: see set_archive_backend
+    # threads: compress the entries on a thread pool | levels: compression levels, see create_omex. Both are only
+    # supported by the zipfile backend, which is used by default if one of them is given.
+    def create_archive(self, delete=False, backend=None, threads=None, levels=None):
+        if backend is None and (threads is not None or levels is not None):
+            backend = BACKEND_ZIPFILE
+        backend = _check_backend(backend)
+        if backend != BACKEND_ZIPFILE and (threads is not None or levels is not None):
+            raise ValueError("Parallel compression and compression levels need the zipfile backend.")
+
         file = "%s.omex" % self.name
-        if os.path.isfile(file):
-            os.remove(file)
-        archive.writeToFile(file)
 
-        if DEBUG:
-            print("Written file '%s'." % file)
+        if backend == BACKEND_ZIPFILE:
+            # the archive replaces an existing file only once it is written
+            archive = self.create_omex(levels)
+            archive.write(file, threads=threads)
+            if not delete:
+                archive.extract("./%s" % self.name)
+        else:
+            if os.path.isfile(file):
+                os.remove(file)
+            archive = self.create_files()
+            archive.writeToFile(file)
 
-        if delete:
+        _log.info("Written file '%s'.", file)
+
+        if delete and os.path.isdir("./%s" % self.name):
             shutil.rmtree("./%s" % self.name)
 
-    def write_sbml_file(self, location):
+    # Writes the reaction conditions and the reaction data into the annotations
+    def _update_annotations(self):
         model = self.get_model()
         for reac in model.getListOfReactions():
             reac.removeTopLevelAnnotationElement("reaction")
@@ -1041,8 +1142,14 @@ class EnzymeML:
             lor = model.getListOfReactions()
             lor.appendAnnotation(self.get_reaction_data().to_xml_string())
 
+    def write_sbml_file(self, location):
+        self._update_annotations()
         sbml.writeSBMLToFile(self.master, location)
 
+    def to_sbml_string(self):
+        self._update_annotations()
+        return sbml.writeSBMLToString(self.master)
+
     # The following functions are used by the functions
     def get_doc(self):
         return self.master
@@ -1050,20 +1157,26 @@ class EnzymeML:
     def get_model(self):
         return self.master.getModel()
 
-    # Following functions are used to load an EnzymeML from the archieve file
-    def load_from_file(self, location):
-        omx = combine.CombineArchive()
+    # Following functions are used to load an EnzymeML from the archieve file. backend: see set_archive_backend
+    def load_from_file(self, location, backend=None):
+        if _check_backend(backend) == BACKEND_ZIPFILE:
+            archive = omex.Archive.open(location)
+        else:
+            archive = _CombineArchive(location)
 
-        if omx.initializeFromArchive(location) is None:
-            raise RuntimeError("Could not find a valid omex archive at '%s'." % location)
+        with archive:
+            self._load_archive(archive)
 
+    def _load_archive(self, archive):
         # load the master experiment file:
-        master = omx.getMasterFile().getLocation()
-        me = omx.getEntryByLocation(master)
-        if me.getFormat() != combine.KnownFormats.lookupFormat("sbml"):
+        me = archive.master()
+        if me is None:
+            raise RuntimeError("The archive has no master file.")
+        master = me.location
+        if not omex.is_format("sbml", me.format):
             raise RuntimeError("Master file ('%s') is not a sbml file." % master)
 
-        self.master = sbml.readSBMLFromString(omx.extractEntryToString(master))
+        self.master = sbml.readSBMLFromString(archive.read_entry(master))
         _load_experiment_sbml_document(self.master)
         model = self.master.getModel()
 
@@ -1083,36 +1196,36 @@ class EnzymeML:
         csvs = list()
 
         # load other files
-        for i in range(omx.getNumEntries()):
-            entry = omx.getEntry(i)
-
-            if entry.isSetMaster() and entry.getMaster():
+        for entry in archive.entries:
+            if entry.master:
                 continue
 
-            if entry.getFormat() == combine.KnownFormats.lookupFormat("sbml"):
+            if omex.is_format("sbml", entry.format):
                 models.append(entry)
-            elif entry.getFormat() == combine.KnownFormats.lookupFormat("csv"):
+            elif omex.is_format("csv", entry.format):
                 csvs.append(entry)
 
         # load models
         for model in models:
-            modeldoc = sbml.readSBMLFromString(omx.extractEntryToString(model.getLocation()))
+            modeldoc = sbml.readSBMLFromString(archive.read_entry(model.location))
             _load_model_sbml_document(modeldoc)
             ident = _create_model_id(modeldoc)
             enzmod = EnzymeMLModel(modeldoc, self, ident)
-            enzmod.name = os.path.splitext(model.getLocation())[0]
+            enzmod.name = os.path.splitext(os.path.basename(model.location))[0]
             enzmod.load_from_document(modeldoc)
+            self.models.append(enzmod)
 
         # load csv files
         for csv in csvs:
-            csvstr = omx.extractEntryToString(csv.getLocation())
-            csvenz = self.reaction_data.listOfFiles.get_file_by_location(csv.getLocation())
+            csvenz = None
+            if self.reaction_data is not None:
+                csvenz = self.reaction_data.listOfFiles.get_file_by_location(csv.location)
             if csvenz is not None:
-                csvenz.read(csvstr)
+                with archive.open_text(csv.location) as stream:
+                    csvenz.read(stream)
                 self.csvs.append(csvenz)
             else:
-                print("[Warning] The CSV file '%s' is not mentioned in the experiment file." % csv.getLocation())
-                # TODO logging?
+                _log.warning("The CSV file '%s' is not mentioned in the experiment file.", csv.location)
 
 
 #############################################################
@@ -1139,7 +1252,8 @@ class EnzymeMLModel:
         return self.used_data[sid] if sid in self.used_data else None
 
     # The following functions are used by the functions
-    def write_sbml_file(self, location):
+    # Writes the used data into the annotations
+    def _update_annotations(self):
         model = self.get_model()
         for reac in model.getListOfReactions():
             reac.removeTopLevelAnnotationElement("modelReaction")
@@ -1148,8 +1262,14 @@ class EnzymeMLModel:
             el = model.getElementBySId(sid)
             el.appendAnnotation(self.get_used_data(sid).to_xml_string())
 
+    def write_sbml_file(self, location):
+        self._update_annotations()
         sbml.writeSBMLToFile(self.sbmldoc, location)
 
+    def to_sbml_string(self):
+        self._update_annotations()
+        return sbml.writeSBMLToString(self.sbmldoc)
+
     def get_doc(self):
         return self.sbmldoc
 
@@ -1159,6 +1279,35 @@ class EnzymeMLModel:
     def load_from_document(self, doc):
         _load_model_sbml_document(doc)
 
+        for reac in doc.getModel().getListOfReactions():
+            xmlnode = _read_annotation(reac)
+            if xmlnode is None or xmlnode.getName() != "modelReaction":
+                continue
+            for i in range(xmlnode.getNumChildren()):
+                if xmlnode.getChild(i).getName() == "usedData":
+                    self.create_used_data(reac.getId()).from_xmlnode(xmlnode.getChild(i))
+
+
+CSV_CHUNK_SIZE = 1 << 20
+
+
+# Appends the values of the CSV lines to the columns
+def _read_csv_lines(lines, columns):
+    for line in lines:
+        cols = line.split(",")
+        for i in range(len(cols)):
+            if len(columns) <= i:
+                columns.append(list())
+
+            el = cols[i]
+            if el == "":
+                columns[i].append(None)
+            else:
+                try:
+                    columns[i].append(decimal.Decimal(el))
+                except decimal.InvalidOperation:
+                    columns[i].append(str(el))
+
 
 ################################################################
 # This class describes a CSV file and is used to save the data #
@@ -1170,15 +1319,27 @@ class EnzymeMLCSV:
         self.name = name
         self.location = loc
         self.sid = None
+        self.revision = 0  # Incremented on every change of the data, used to invalidate cached arrays
+        self._arrays = dict()
 
         if name is None and loc is None:
             raise ValueError("The parameters name and location are None.")
 
         if name is None:
-            self.name = os.path.splitext(self.location)[0]
+            self.name = os.path.splitext(os.path.basename(self.location))[0]
 
     def add_column(self, col):
         self.columns.append(col)
+        self.changed()
+
+    # Replaces the values of a column, e.g. by a converted numpy array
+    def set_column(self, index, col):
+        self.columns[index] = col
+        self.changed()
+
+    def changed(self):
+        self.revision += 1
+        self._arrays.clear()
 
     def nrows(self):
         rs = 0
@@ -1207,48 +1368,63 @@ class EnzymeMLCSV:
         return rows
 
     def write(self, name):
-        f = open(name, "w+")
+        with open(name, "w+") as f:
+            self._write_to(f)
+
+    def to_string(self):
+        f = io.StringIO()
+        self._write_to(f)
+        return f.getvalue()
 
+    def _write_to(self, f):
         rows = self.get_rows()
         for rn in range(0, len(rows)):
             row = rows[rn]
             line = ""
 
             for cn in range(0, len(row) - 1):
-                if row[cn] is not None:
+                if row[cn] is not None and row[cn] == row[cn]:  # None and NaN are written as empty cells
                     line += str(row[cn])
                 line += ","
 
             if len(row) > 0:
-                if row[len(row) - 1] is not None:
+                if row[len(row) - 1] is not None and row[len(row) - 1] == row[len(row) - 1]:
                     line += str(row[len(row) - 1])
                 line += "\n"
 
             f.write(line)
 
-        f.close()
-
-    def read(self, csv_str):
+    # Reads the values of a CSV string or of a file-like object (text or binary, utf-8), which is read in chunks of
+    # chunk_size, so the whole text never has to be in memory
+    def read(self, csv, chunk_size=CSV_CHUNK_SIZE):
         columns = list()
 
-        lines = csv_str.splitlines()
-        for line in lines:
-            cols = line.split(",")
-            for i in range(len(cols)):
-                if len(columns) <= i:
-                    columns.append(list())
-
-                el = cols[i]
-                if el == "":
-                    columns[i].append(None)
-                else:
-                    try:
-                        columns[i].append(decimal.Decimal(el))
-                    except decimal.InvalidOperation:
-                        columns[i].append(str(el))
+        if isinstance(csv, str):
+            _read_csv_lines(csv.splitlines(), columns)
+        else:
+            decoder = None
+            rest = ""
+            while True:
+                chunk = csv.read(chunk_size)
+                if not chunk:
+                    break
+                if isinstance(chunk, bytes):
+                    if decoder is None:
+                        decoder = codecs.getincrementaldecoder("utf-8")()
+                    chunk = decoder.decode(chunk)
+
+                text = rest + chunk
+                cut = text.rfind("\n") + 1
+                _read_csv_lines(text[:cut].splitlines(), columns)
+                rest = text[cut:]
+
+            if decoder is not None:
+                rest += decoder.decode(b"", final=True)
+            _read_csv_lines(rest.splitlines(), columns)
 
         for col in columns:
             self.columns.append(col)
+        self.changed()
 
     def validate(self):  # TODO validate with the format for consistency
         return self.loc is not None
@@ -1348,7 +1524,15 @@ def add_to_model(enzymeml, ekey, obj, ident=None):
             if type(obj[k]) == decimal.Decimal:
                 obj[k] = float(obj[k])
 
-    return func(enzymeml, ident, obj)
+    if not metrics.is_enabled():
+        return func(enzymeml, ident, obj)
+
+    start = perf_counter()
+    try:
+        return func(enzymeml, ident, obj)
+    finally:
+        metrics.record(enzymeml.parent if isinstance(enzymeml, EnzymeMLModel) else enzymeml, ekey,
+                       perf_counter() - start)
 
 
 def get_species_annotation(species):
@@ -1438,7 +1622,7 @@ def __unspecific_note(enzymeml, ident, obj):
     part = get_element(enzymeml.get_model(), _get_id(ident))
 
     if part is None:
-        print("Element with id '%s' could not be found. Ignoring note step." % _get_id(ident))
+        _log.warning("Element with id '%s' could not be found. Ignoring note step.", _get_id(ident))
         return
 
     if not issubclass(type(part), sbml.SBase):
@@ -1482,9 +1666,7 @@ def __main_meta_name(enzymeml, ident, obj):
     if "email" in obj:
         c.setEmail(obj["email"])
     if "orcid" in obj:
-        if DEBUG:
-            print(NotImplementedError("OrcID not implemented yet"))
-            print(traceback.format_exc())
+        _log.debug("OrcID not implemented yet, the orcid '%s' is ignored.", obj["orcid"])
     if "org" in obj:
         c.setOrganization(obj["org"])
 
@@ -1565,6 +1747,8 @@ def __main_unit(enzymeml, ident, obj):
     unit_def.setName(obj["name"])
 
     mid = _get_model_ident(model)
+    while model.getUnitDefinition("u%s" % __unit_ids[mid]) is not None:  # ids of loaded documents
+        __unit_ids[mid] += 1
     ident = ("u%s" % __unit_ids[mid],
              "META_UNIT_%s" % __unit_ids[mid])
 
@@ -1585,7 +1769,7 @@ def __main_unit(enzymeml, ident, obj):
         if "scale" in unit:
             u.setScale(unit["scale"])
         else:
-            u.setScale(1)
+            u.setScale(0)
 
         if "multiplier" in unit:
             u.setMultiplier(unit["multiplier"])
@@ -2115,9 +2299,11 @@ def __model_reaction_parameters(enzymeml, ident, obj):
     kl = reac.getKineticLaw()
 
     lp = kl.createLocalParameter()
+    lp.setId(obj["id"] if "id" in obj else obj["name"])
     lp.setName(obj["name"])
     lp.setValue(obj["value"])
-    lp.setUnits(_get_id(obj["units"]))
+    if "units" in obj:
+        lp.setUnits(_get_id(obj["units"]))
 
     if "stdev" in obj:
         stdev = obj["stdev"]
@@ -2225,3 +2411,7 @@ _key_func_dict = {
     key.MODEL_REACTION_PARAMETERS: __model_reaction_parameters,
     key.MODEL_REACTION_DATA: __model_reaction_data
 }
+
+if os.environ.get("ENZYMEML_PROFILE"):
+    import enzymeml.profiling as profiling
+    profiling.enable_from_environment()
@@ -0,0 +1,294 @@
+"""
+Fitting of enzyme rate laws to the initial rates of the replicas used by a model reaction.
+
+The replicas referenced by the EnzymeMLUsedData of a model reaction (key.MODEL_REACTION_DATA) are resolved to
+their measurement columns. The initial rate of every column (see enzymeml.rates) and the initial substrate
+concentration of its measurement give one data point (S, v). The rate laws evaluate their values and analytic
+Jacobians for all data points at once. The fitted parameters and their standard deviations are written into the
+kinetic law of the model reaction.
+"""
+import numpy as np
+import scipy.optimize
+import libsbml as sbml
+import enzymeml.enzymeml as enzml
+import enzymeml.enzymemlkey as key
+import enzymeml.rates as rates
+import enzymeml.units as units
+
+
+# A rate law v = f(S, p). formula is a SBML L3 formula with the substrate as {s}.
+# units: per parameter "rate", "concentration" or None (dimensionless)
+class RateLaw:
+    def __init__(self, name, parameters, formula, units, func, jac, guess):
+        self.name = name
+        self.parameters = parameters
+        self.formula = formula
+        self.units = units
+        self.func = func
+        self.jac = jac
+        self.guess = guess
+
+    def __call__(self, s, p):
+        return self.func(np.asarray(s, dtype=float), p)
+
+    def get_formula(self, substrate):
+        return self.formula.format(s=substrate)
+
+
+def _mm(s, p):
+    return p[0] * s / (p[1] + s)
+
+
+def _mm_jac(s, p):
+    d = p[1] + s
+    return np.column_stack([s / d, -p[0] * s / (d * d)])
+
+
+def _mm_guess(s, v):
+    return [np.max(v), np.median(s)]
+
+
+def _si(s, p):
+    return p[0] * s / (p[1] + s + s * s / p[2])
+
+
+def _si_jac(s, p):
+    d = p[1] + s + s * s / p[2]
+    return np.column_stack([s / d, -p[0] * s / (d * d), p[0] * s ** 3 / (d * d * p[2] * p[2])])
+
+
+def _si_guess(s, v):
+    return [2 * np.max(v), np.median(s), 10 * np.max(s)]
+
+
+def _hill(s, p):
+    sh = s ** p[2]
+    return p[0] * sh / (p[1] ** p[2] + sh)
+
+
+def _hill_jac(s, p):
+    kh = p[1] ** p[2]
+    sh = s ** p[2]
+    d = kh + sh
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dh = p[0] * sh * kh * (np.log(np.where(s > 0, s, 1.0)) - np.log(p[1])) / (d * d)
+    return np.column_stack([sh / d, -p[0] * sh * p[2] * kh / p[1] / (d * d), np.where(s > 0, dh, 0.0)])
+
+
+def _hill_guess(s, v):
+    return [np.max(v), np.median(s), 1.0]
+
+
+MICHAELIS_MENTEN = RateLaw("Michaelis-Menten", ["vmax", "km"], "vmax * {s} / (km + {s})",
+                           ["rate", "concentration"], _mm, _mm_jac, _mm_guess)
+
+SUBSTRATE_INHIBITION = RateLaw("substrate inhibition", ["vmax", "km", "ki"],
+                               "vmax * {s} / (km + {s} + {s}^2 / ki)",
+                               ["rate", "concentration", "concentration"], _si, _si_jac, _si_guess)
+
+HILL = RateLaw("Hill", ["vmax", "k", "h"], "vmax * {s}^h / (k^h + {s}^h)",
+               ["rate", "concentration", None], _hill, _hill_jac, _hill_guess)
+
+RATE_LAWS = {
+    "michaelis-menten": MICHAELIS_MENTEN,
+    "substrate-inhibition": SUBSTRATE_INHIBITION,
+    "hill": HILL
+}
+
+
+# The fitted parameters of a rate law
+class FitResult:
+    def __init__(self, law, values, stdev, covariance, residuals, success):
+        self.law = law
+        self.values = values
+        self.stdev = stdev
+        self.covariance = covariance
+        self.residuals = residuals
+        self.success = success
+
+    def parameters(self):
+        return dict(zip(self.law.parameters, self.values))
+
+    def rss(self):
+        return float(self.residuals @ self.residuals)
+
+
+def _law(law):
+    if isinstance(law, RateLaw):
+        return law
+    if law not in RATE_LAWS:
+        raise ValueError("Unknown rate law '%s'." % law)
+    return RATE_LAWS[law]
+
+
+# Fits the rate law (RateLaw or name of RATE_LAWS) to the data points (s, v). The parameters are non-negative.
+def fit(s, v, law=MICHAELIS_MENTEN, p0=None):
+    law = _law(law)
+    s = np.asarray(s, dtype=float)
+    v = np.asarray(v, dtype=float)
+    valid = ~(np.isnan(s) | np.isnan(v))
+    s = s[valid]
+    v = v[valid]
+
+    k = len(law.parameters)
+    if len(s) < k:
+        raise ValueError("%i data points are not enough to fit %i parameters." % (len(s), k))
+
+    p0 = np.maximum(np.asarray(law.guess(s, v) if p0 is None else p0, dtype=float), 1e-12)
+    res = scipy.optimize.least_squares(lambda p: law.func(s, p) - v, p0, jac=lambda p: law.jac(s, p),
+                                       bounds=(0, np.inf), method="trf")
+
+    dof = len(s) - k
+    try:
+        covariance = np.linalg.inv(res.jac.T @ res.jac)
+        covariance *= (res.fun @ res.fun) / dof if dof > 0 else np.nan
+    except np.linalg.LinAlgError:
+        covariance = np.full((k, k), np.nan)
+
+    return FitResult(law, res.x, np.sqrt(np.abs(np.diag(covariance))), covariance, res.fun, res.success)
+
+
+def _strip(ref):
+    ref = enzml._get_id(ref)
+    return ref[1:] if ref.startswith("#") else ref
+
+
+# Returns the data points (s, v) of the replicas used by the model reaction, the substrate sid and the
+# concentration and time unit of the data
+def used_data_points(enzymeml, model, reaction, substrate=None):
+    used = model.get_used_data(enzml._get_id(reaction))
+    if used is None:
+        raise RuntimeError("The model reaction '%s' has no used data." % enzml._get_id(reaction))
+
+    main = enzymeml.get_model()
+    pairs = set()
+    stoichiometry = dict()
+    for reacsid, replicas in used.replicas.items():
+        reac = main.getReaction(_strip(reacsid))
+        cond = enzymeml.get_reaction_cond(_strip(reacsid))
+        if reac is None or cond is None:
+            raise RuntimeError("The reaction '%s' is unknown." % _strip(reacsid))
+
+        if substrate is None:
+            if reac.getNumReactants() == 0:
+                raise RuntimeError("The reaction '%s' has no substrate." % _strip(reacsid))
+            substrate = reac.getReactant(0).getSpecies()
+        for sr in reac.getListOfReactants():
+            stoichiometry[sr.getSpecies()] = -sr.getStoichiometry()
+        for sr in reac.getListOfProducts():
+            stoichiometry[sr.getSpecies()] = sr.getStoichiometry()
+
+        refs = {_strip(r) for r in replicas}
+        pairs |= {(enzml._get_id(r.measurement), enzml._get_id(r.replica))
+                  for r in cond.replicas if len(refs) == 0 or enzml._get_id(r.id) in refs}
+
+    substrate = enzml._get_id(substrate)
+    measured = rates.initial_rates(enzymeml, list(dict.fromkeys(m for m, _ in pairs)))
+    labels = list(zip(measured.measurements, (enzml._get_id(c.replica) for c in measured.columns)))
+    species = measured.species()
+
+    # the initial substrate concentration of a measurement
+    initial = dict()
+    for i, (m, _) in enumerate(labels):
+        if species[i] == substrate:
+            initial.setdefault(m, list()).append(measured.intercepts[i])
+    species_def = main.getSpecies(substrate)
+
+    s = list()
+    v = list()
+    conc_unit = None
+    time_unit = None
+    for i, pair in enumerate(labels):
+        if pair not in pairs or species[i] not in stoichiometry:
+            continue
+
+        if pair[0] in initial:
+            s.append(np.nanmean(initial[pair[0]]))
+        elif species_def is not None and species_def.isSetInitialConcentration():
+            s.append(species_def.getInitialConcentration())
+        else:
+            continue
+
+        v.append(measured.rates[i] / stoichiometry[species[i]])
+        if conc_unit is None:
+            conc_unit = measured.columns[i].unit
+            time_unit = measured.time_units[i]
+        elif units.conversion_factor(enzymeml, measured.columns[i].unit, conc_unit) != 1 \
+                or units.conversion_factor(enzymeml, measured.time_units[i], time_unit) != 1:
+            raise RuntimeError("The used data of the reaction '%s' has different units." % enzml._get_id(reaction))
+
+    return np.array(s), np.array(v), substrate, conc_unit, time_unit
+
+
+# Returns the sid of the species of the main document in the model, the species are matched by name
+def _model_species(enzymeml, model, sid):
+    name = enzymeml.get_model().getSpecies(sid).getName()
+    for sp in model.get_model().getListOfSpecies():
+        if sp.getName() == name:
+            return sp.getId()
+    return model.add(key.MODEL_SPECIES, {"name": name})
+
+
+# Writes the kinetic law of the substrate (document sid) and the parameter values with their standard deviation
+# into the model reaction. conc_unit, time_unit: the units of the data in the document
+def write_parameters(enzymeml, model, reaction, law, substrate, values, stdev, conc_unit, time_unit):
+    reac = model.get_model().getReaction(enzml._get_id(reaction))
+    if reac.isSetKineticLaw():
+        reac.unsetKineticLaw()
+
+    model.add(key.MODEL_REACTION_KINETIC_LAW, law.get_formula(_model_species(enzymeml, model, substrate)),
+              reaction)
+
+    for name, unit, value, sd in zip(law.parameters, law.units, values, stdev):
+        if unit == "rate":
+            unit = units.get_quotient_unit(model, enzymeml, conc_unit, time_unit)
+        elif unit == "concentration":
+            unit = units.get_quotient_unit(model, enzymeml, conc_unit)
+        else:
+            unit = sbml.UNIT_KIND_DIMENSIONLESS
+
+        param = {"name": name, "value": float(value), "units": unit}
+        if not np.isnan(sd):
+            param["stdev"] = float(sd)
+        model.add(key.MODEL_REACTION_PARAMETERS, param, reaction)
+
+
+# Fits the rate law to the used data of the model reaction and writes the kinetic law and the parameters with
+# their standard deviation into the model reaction
+def fit_model_reaction(enzymeml, model, reaction, law=MICHAELIS_MENTEN, substrate=None):
+    law = _law(law)
+    s, v, substrate, conc_unit, time_unit = used_data_points(enzymeml, model, reaction, substrate)
+    result = fit(s, v, law)
+    write_parameters(enzymeml, model, reaction, law, substrate, result.values, result.stdev, conc_unit, time_unit)
+    return result
+
+
+# Creates a model with a copy of the reaction of the document, which uses all replicas of the reaction.
+# Returns the model and the sid of the model reaction.
+def create_model_reaction(enzymeml, reaction, name):
+    reaction = enzml._get_id(reaction)
+    cond = enzymeml.get_reaction_cond(reaction)
+    if cond is None:
+        raise RuntimeError("The reaction '%s' has no reaction conditions." % reaction)
+
+    model = enzymeml.create_model(name)
+    main = enzymeml.get_model().getReaction(reaction)
+    reac = model.add(key.MODEL_REACTION, {
+        "name": main.getName(),
+        "reactants": [{"id": _model_species(enzymeml, model, sr.getSpecies()), "stochiometry": sr.getStoichiometry()}
+                      for sr in main.getListOfReactants()],
+        "products": [{"id": _model_species(enzymeml, model, sr.getSpecies()), "stochiometry": sr.getStoichiometry()}
+                     for sr in main.getListOfProducts()],
+        "modifier": [{"id": _model_species(enzymeml, model, sr.getSpecies())} for sr in main.getListOfModifiers()]
+    })
+    model.add(key.MODEL_REACTION_DATA, {reaction: cond.replicas}, reac)
+
+    return model, reac
+
+
+# Creates a model (default name: the rate law) with a reaction using all replicas of the reaction of the document
+# and fits the rate law to them. Returns the model, the model reaction and the FitResult.
+def fit_reaction(enzymeml, reaction, law=MICHAELIS_MENTEN, substrate=None, name=None):
+    law = _law(law)
+    model, reac = create_model_reaction(enzymeml, reaction, law.name if name is None else name)
+    return model, reac, fit_model_reaction(enzymeml, model, reac, law, substrate)
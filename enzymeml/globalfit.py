@@ -0,0 +1,250 @@
+"""
+Global fitting of a rate law to the reactions of several EnzymeML documents.
+
+Every reaction of every document is one condition (e.g. another pH or temperature). The parameters of the rate law
+are either shared by all conditions or specific to each condition. All conditions are fitted at once: the residuals
+of a condition depend only on the shared and its own parameters, so the Jacobian is a sparse block matrix. The
+residuals and Jacobian blocks can be evaluated in worker processes. The fitted parameters of a condition are
+written into a new model of its document (see enzymeml.fitting).
+"""
+import os
+import concurrent.futures
+import numpy as np
+import scipy.optimize
+import scipy.sparse
+import enzymeml.enzymeml as enzml
+import enzymeml.fitting as fitting
+
+
+# The data of one reaction of a document
+class Condition:
+    def __init__(self, enzymeml, reaction, model, model_reaction, s, v, substrate, conc_unit, time_unit):
+        self.enzymeml = enzymeml
+        self.reaction = reaction
+        self.model = model
+        self.model_reaction = model_reaction
+        self.s = s
+        self.v = v
+        self.substrate = substrate
+        self.conc_unit = conc_unit
+        self.time_unit = time_unit
+
+        cond = enzymeml.get_reaction_cond(reaction)
+        self.ph = cond.ph
+        self.temperature = cond.temperature
+
+
+class GlobalFitResult:
+    def __init__(self, law, conditions, shared, values, stdev, covariance, residuals, success):
+        self.law = law
+        self.conditions = conditions
+        self.shared = shared  # names of the shared parameters
+        self.values = values  # (conditions x parameters)
+        self.stdev = stdev  # (conditions x parameters)
+        self.covariance = covariance  # of the fitted vector: shared parameters, then the specific ones per condition
+        self.residuals = residuals
+        self.success = success
+
+    def parameters(self, index):
+        return dict(zip(self.law.parameters, self.values[index]))
+
+
+# Evaluates the residuals and Jacobian blocks of the conditions. params: (conditions x parameters)
+def _evaluate(law, data, params):
+    return [(law.func(s, p) - v, law.jac(s, p)) for (s, v), p in zip(data, params)]
+
+
+_worker = dict()
+
+
+def _init_worker(law, data):
+    _worker["law"] = law
+    _worker["data"] = data
+
+
+def _evaluate_worker(indices, params):
+    return _evaluate(_worker["law"], [_worker["data"][i] for i in indices], params)
+
+
+# The problem of least_squares. The residuals and the Jacobian are evaluated together and kept for the last x.
+class _Problem:
+    def __init__(self, law, data, shared, executor=None, chunks=1):
+        self.law = law
+        self.data = data
+        self.shared = np.array([name in shared for name in law.parameters])
+        self.nshared = int(self.shared.sum())
+        self.nspecific = len(law.parameters) - self.nshared
+        self.executor = executor
+        self.chunks = [c for c in np.array_split(np.arange(len(data)), chunks) if len(c) > 0]
+
+        # the sparsity structure: rows of a condition depend on the shared and its specific columns
+        rows = list()
+        cols = list()
+        offset = 0
+        for c, (s, _) in enumerate(data):
+            columns = np.concatenate([np.arange(self.nshared),
+                                      self.nshared + c * self.nspecific + np.arange(self.nspecific)])
+            order = np.concatenate([np.flatnonzero(self.shared), np.flatnonzero(~self.shared)])
+            r, k = np.meshgrid(offset + np.arange(len(s)), np.arange(len(order)), indexing="ij")
+            rows.append(r.ravel())
+            cols.append(columns[k].ravel())
+            offset += len(s)
+        self.rows = np.concatenate(rows) if len(rows) > 0 else np.empty(0, dtype=int)
+        self.cols = np.concatenate(cols) if len(cols) > 0 else np.empty(0, dtype=int)
+        self.order = np.concatenate([np.flatnonzero(self.shared), np.flatnonzero(~self.shared)])
+        self.shape = (offset, self.size())
+
+        self._x = None
+        self._result = None
+
+    def size(self):
+        return self.nshared + len(self.data) * self.nspecific
+
+    # The parameters (conditions x parameters) of the vector x
+    def params(self, x):
+        params = np.empty((len(self.data), len(self.law.parameters)))
+        params[:, self.shared] = x[:self.nshared]
+        params[:, ~self.shared] = x[self.nshared:].reshape(len(self.data), self.nspecific)
+        return params
+
+    def vector(self, params):
+        return np.concatenate([params[:, self.shared].mean(axis=0), params[:, ~self.shared].ravel()])
+
+    def _evaluate(self, x):
+        if self._x is not None and np.array_equal(x, self._x):
+            return self._result
+
+        params = self.params(x)
+        if self.executor is None:
+            blocks = _evaluate(self.law, self.data, params)
+        else:
+            futures = [self.executor.submit(_evaluate_worker, c, params[c]) for c in self.chunks]
+            blocks = [b for f in futures for b in f.result()]
+
+        fun = np.concatenate([b[0] for b in blocks])
+        values = np.concatenate([b[1][:, self.order].ravel() for b in blocks])
+        jac = scipy.sparse.csr_matrix((values, (self.rows, self.cols)), shape=self.shape)
+
+        self._x = x.copy()
+        self._result = (fun, jac)
+        return self._result
+
+    def fun(self, x):
+        return self._evaluate(x)[0]
+
+    def jac(self, x):
+        return self._evaluate(x)[1]
+
+
+# Returns the Conditions of the reactions of the documents (default: all reactions with replicas). If create is
+# set, a model with a copy of the reaction is created in the document for every condition, named
+# "<name> (global, <reaction>)" (name: the rate law by default), so the models of one document have distinct names.
+# Otherwise the model is only used to collect the data points and the documents are not changed.
+def conditions(documents, reactions=None, law=fitting.MICHAELIS_MENTEN, substrate=None, name=None, create=True):
+    result = list()
+    for enzymeml in documents:
+        sids = reactions if reactions is not None else \
+            [sid for sid, cond in enzymeml.reaction_condition.items() if len(cond.replicas) > 0]
+
+        for sid in sids:
+            model, reac = fitting.create_model_reaction(enzymeml, sid, "%s (global, %s)" % (
+                law.name if name is None else name, enzml._get_id(sid)))
+            try:
+                s, v, sub, conc_unit, time_unit = fitting.used_data_points(enzymeml, model, reac, substrate)
+            finally:
+                if not create:
+                    enzymeml.models.remove(model)
+            if not create:
+                model = reac = None
+            valid = ~(np.isnan(s) | np.isnan(v))
+            result.append(Condition(enzymeml, enzml._get_id(sid), model, reac, s[valid], v[valid], sub, conc_unit,
+                                    time_unit))
+    return result
+
+
+def _initial(law, conds):
+    params = list()
+    for c in conds:
+        try:
+            params.append(fitting.fit(c.s, c.v, law).values)
+        except ValueError:
+            params.append(np.maximum(np.asarray(law.guess(c.s, c.v), dtype=float), 1e-12))
+    return np.array(params)
+
+
+# Fits the rate law to the reactions of all documents at once. shared: names of the parameters shared by all
+# conditions, the others are fitted per condition. processes: number of worker processes for the residuals
+# (default: evaluated in this process). If write is set, the parameters are written into the model of every
+# condition, otherwise the documents are not changed.
+def global_fit(documents, law=fitting.MICHAELIS_MENTEN, shared=("km",), reactions=None, substrate=None,
+               processes=None, write=True, name=None):
+    law = fitting._law(law)
+    for p in shared:
+        if p not in law.parameters:
+            raise ValueError("The rate law '%s' has no parameter '%s'." % (law.name, p))
+
+    conds = conditions(documents, reactions, law, substrate, name, write)
+    data = [(c.s, c.v) for c in conds]
+
+    executor = None
+    if processes is not None and processes > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(processes, initializer=_init_worker, initargs=(law, data))
+
+    try:
+        problem = _Problem(law, data, shared, executor, processes or 1)
+        if problem.shape[0] < problem.size():
+            raise ValueError("%i data points are not enough to fit %i parameters." % problem.shape[::-1])
+
+        res = scipy.optimize.least_squares(problem.fun, problem.vector(_initial(law, conds)), jac=problem.jac,
+                                           bounds=(0, np.inf), method="trf", tr_solver="lsmr", x_scale="jac")
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    jac = res.jac.toarray() if scipy.sparse.issparse(res.jac) else res.jac
+    dof = problem.shape[0] - problem.size()
+    try:
+        covariance = np.linalg.inv(jac.T @ jac)
+        covariance *= (res.fun @ res.fun) / dof if dof > 0 else np.nan
+    except np.linalg.LinAlgError:
+        covariance = np.full((problem.size(), problem.size()), np.nan)
+
+    values = problem.params(res.x)
+    stdev = problem.params(np.sqrt(np.abs(np.diag(covariance))))
+    result = GlobalFitResult(law, conds, [p for p in law.parameters if p in shared], values, stdev, covariance,
+                             res.fun, res.success)
+
+    if write:
+        for c, v, sd in zip(conds, values, stdev):
+            fitting.write_parameters(c.enzymeml, c.model, c.model_reaction, law, c.substrate, v, sd, c.conc_unit,
+                                     c.time_unit)
+
+    return result
+
+
+# Loads the archives, fits them globally and writes every document with its new models as archive
+# "<name>.omex" into the directory (name: the file name of the archive). An input archive is never overwritten.
+def fit_archives(locations, law=fitting.MICHAELIS_MENTEN, shared=("km",), processes=None, write=True, directory=".",
+                 **kwargs):
+    names = [os.path.splitext(os.path.basename(location))[0] for location in locations]
+    if write:
+        inputs = {os.path.abspath(location) for location in locations}
+        for name in names:
+            output = os.path.abspath(os.path.join(directory, "%s.omex" % name))
+            if output in inputs:
+                raise ValueError("The archive '%s' would overwrite an input archive, use another directory." % output)
+        if len(set(names)) < len(names):
+            raise ValueError("The archives must have distinct file names.")
+
+    documents = list()
+    for name, location in zip(names, locations):
+        enzymeml = enzml.EnzymeML(name)
+        enzymeml.load_from_file(location)
+        documents.append(enzymeml)
+
+    result = global_fit(documents, law, shared, processes=processes, write=write, **kwargs)
+    if write:
+        os.makedirs(directory, exist_ok=True)
+        for enzymeml in documents:
+            enzymeml.create_omex().write(os.path.join(directory, "%s.omex" % enzymeml.name))
+    return result
@@ -0,0 +1,271 @@
+"""
+Compilation of SBML kinetic laws into NumPy functions.
+
+The math of a KineticLaw is translated once per formula into Python source using NumPy functions and compiled.
+The symbols of the formula (species, local and global parameters, compartments, function definitions and the
+time) are bound by SID, so a compiled law evaluates whole arrays of species concentrations in one call. The
+compiled laws are cached per document and are rebuilt if the formula or the parameter values change.
+"""
+import functools
+import weakref
+import numpy as np
+import libsbml as sbml
+import enzymeml.enzymeml as enzml
+
+_BINARY = {
+    sbml.AST_DIVIDE: "/",
+    sbml.AST_POWER: "**",
+    sbml.AST_FUNCTION_POWER: "**",
+}
+
+_NARY = {
+    sbml.AST_PLUS: ("+", "0.0"),
+    sbml.AST_TIMES: ("*", "1.0"),
+}
+
+_FUNCTIONS = {
+    sbml.AST_FUNCTION_EXP: "np.exp",
+    sbml.AST_FUNCTION_LN: "np.log",
+    sbml.AST_FUNCTION_ABS: "np.abs",
+    sbml.AST_FUNCTION_FLOOR: "np.floor",
+    sbml.AST_FUNCTION_CEILING: "np.ceil",
+    sbml.AST_FUNCTION_SIN: "np.sin",
+    sbml.AST_FUNCTION_COS: "np.cos",
+    sbml.AST_FUNCTION_TAN: "np.tan",
+    sbml.AST_FUNCTION_ARCSIN: "np.arcsin",
+    sbml.AST_FUNCTION_ARCCOS: "np.arccos",
+    sbml.AST_FUNCTION_ARCTAN: "np.arctan",
+    sbml.AST_FUNCTION_SINH: "np.sinh",
+    sbml.AST_FUNCTION_COSH: "np.cosh",
+    sbml.AST_FUNCTION_TANH: "np.tanh",
+}
+
+_RELATIONAL = {
+    sbml.AST_RELATIONAL_EQ: "np.equal",
+    sbml.AST_RELATIONAL_NEQ: "np.not_equal",
+    sbml.AST_RELATIONAL_GT: "np.greater",
+    sbml.AST_RELATIONAL_GEQ: "np.greater_equal",
+    sbml.AST_RELATIONAL_LT: "np.less",
+    sbml.AST_RELATIONAL_LEQ: "np.less_equal",
+}
+
+_LOGICAL = {
+    sbml.AST_LOGICAL_AND: "np.logical_and",
+    sbml.AST_LOGICAL_OR: "np.logical_or",
+    sbml.AST_LOGICAL_XOR: "np.logical_xor",
+}
+
+
+# Translates an ASTNode into a Python expression. The symbols become the arguments _a0, _a1, ...
+class _Translator:
+    def __init__(self, formula):
+        self.formula = formula
+        self.symbols = list()
+        self.functions = list()
+
+    def name(self, sid):
+        if sid not in self.symbols:
+            self.symbols.append(sid)
+        return "_a%i" % self.symbols.index(sid)
+
+    def children(self, node):
+        return [self.expr(node.getChild(i)) for i in range(node.getNumChildren())]
+
+    def expr(self, node):
+        t = node.getType()
+        args = self.children(node)
+
+        if t == sbml.AST_INTEGER:
+            return repr(float(node.getInteger()))
+        if t in (sbml.AST_REAL, sbml.AST_REAL_E, sbml.AST_RATIONAL):
+            return repr(node.getReal())
+        if t == sbml.AST_NAME:
+            return self.name(node.getName())
+        if t == sbml.AST_NAME_TIME:
+            return self.name("time")
+        if t == sbml.AST_NAME_AVOGADRO:
+            return repr(6.02214076e23)
+        if t == sbml.AST_CONSTANT_E:
+            return "np.e"
+        if t == sbml.AST_CONSTANT_PI:
+            return "np.pi"
+        if t == sbml.AST_CONSTANT_TRUE:
+            return "True"
+        if t == sbml.AST_CONSTANT_FALSE:
+            return "False"
+
+        if t in _NARY:
+            op, neutral = _NARY[t]
+            return "(%s)" % (" %s " % op).join(args) if len(args) > 0 else neutral
+        if t == sbml.AST_MINUS:
+            return "(-%s)" % args[0] if len(args) == 1 else "(%s - %s)" % (args[0], args[1])
+        if t in _BINARY:
+            return "(%s %s %s)" % (args[0], _BINARY[t], args[1])
+
+        if t in _FUNCTIONS:
+            return "%s(%s)" % (_FUNCTIONS[t], args[0])
+        if t == sbml.AST_FUNCTION_LOG:
+            return "np.log10(%s)" % args[0] if len(args) == 1 else "(np.log(%s) / np.log(%s))" % (args[1], args[0])
+        if t == sbml.AST_FUNCTION_ROOT:
+            return "np.sqrt(%s)" % args[0] if len(args) == 1 else "(%s ** (1.0 / %s))" % (args[1], args[0])
+
+        if t in _RELATIONAL:
+            return "%s(%s, %s)" % (_RELATIONAL[t], args[0], args[1])
+        if t in _LOGICAL:
+            return "functools.reduce(%s, (%s,))" % (_LOGICAL[t], ", ".join(args))
+        if t == sbml.AST_LOGICAL_NOT:
+            return "np.logical_not(%s)" % args[0]
+        if t == sbml.AST_FUNCTION_PIECEWISE:
+            values = args[0::2]
+            conditions = args[1::2]
+            otherwise = values.pop() if len(values) > len(conditions) else "np.nan"
+            return "np.select([%s], [%s], %s)" % (", ".join(conditions), ", ".join(values), otherwise)
+
+        if t == sbml.AST_FUNCTION:
+            if node.getName() not in self.functions:
+                self.functions.append(node.getName())
+            return "_f%i(%s)" % (self.functions.index(node.getName()), ", ".join(args))
+
+        raise RuntimeError("The formula '%s' contains the unsupported element '%s'." % (self.formula, node.getName()))
+
+
+# Compiles a formula into (function, symbols, functions). The function takes the values of the symbols as
+# positional arguments and the function definitions (compiled callables) by the keyword arguments _f0, _f1, ...
+@functools.lru_cache(maxsize=512)
+def compile_formula(formula, arguments=()):
+    math = sbml.parseL3Formula(formula)
+    if math is None:
+        raise RuntimeError("The formula '%s' could not be parsed: %s" % (formula, sbml.getLastParseL3Error()))
+
+    translator = _Translator(formula)
+    for sid in arguments:
+        translator.name(sid)
+    body = translator.expr(math)
+
+    params = ["_a%i" % i for i in range(len(translator.symbols))]
+    params += ["_f%i=None" % i for i in range(len(translator.functions))]
+    source = "def _law(%s):\n    return %s\n" % (", ".join(params), body)
+
+    namespace = {"np": np, "functools": functools}
+    exec(compile(source, "<kinetic law '%s'>" % formula, "exec"), namespace)
+    return namespace["_law"], tuple(translator.symbols), tuple(translator.functions)
+
+
+# Compiles the function definition of the model into a Python function
+def _function_definition(model, sid, stack=()):
+    fd = model.getFunctionDefinition(sid)
+    if fd is None or fd.getMath() is None:
+        raise RuntimeError("The function '%s' is not defined." % sid)
+    if sid in stack:
+        raise RuntimeError("The function '%s' is recursive." % sid)
+
+    bvars = tuple(fd.getArgument(i).getName() for i in range(fd.getNumArguments()))
+    func, symbols, functions = compile_formula(sbml.formulaToL3String(fd.getBody()), bvars)
+    if len(symbols) > len(bvars):
+        raise RuntimeError("The function '%s' uses symbols which are not arguments." % sid)
+
+    inner = {"_f%i" % i: _function_definition(model, f, stack + (sid,)) for i, f in enumerate(functions)}
+    return functools.partial(func, **inner) if len(inner) > 0 else func
+
+
+# The values of the symbols of the model: global parameters, compartment sizes and initial concentrations
+def _model_values(model):
+    values = dict()
+    for c in model.getListOfCompartments():
+        if c.isSetSize():
+            values[c.getId()] = c.getSize()
+    for s in model.getListOfSpecies():
+        if s.isSetInitialConcentration():
+            values[s.getId()] = s.getInitialConcentration()
+    for p in model.getListOfParameters():
+        if p.isSetValue():
+            values[p.getId()] = p.getValue()
+    return values
+
+
+# A compiled kinetic law. The values of the symbols default to the local parameters of the law, the global
+# parameters, the compartment sizes and the initial concentrations of the species.
+class CompiledLaw:
+    def __init__(self, reaction, formula, func, symbols, defaults, species):
+        self.reaction = reaction
+        self.formula = formula
+        self.symbols = symbols
+        self.defaults = defaults
+        self.species = species  # the symbols which are species
+        self._func = func
+
+    # Evaluates the law. values (dict) and kwargs override the values of the symbols by SID; species
+    # concentrations can be arrays of any shape that broadcast.
+    def __call__(self, values=None, **kwargs):
+        merged = dict(self.defaults)
+        if values is not None:
+            merged.update(values)
+        merged.update(kwargs)
+
+        try:
+            args = [merged[sid] for sid in self.symbols]
+        except KeyError as e:
+            raise KeyError("The kinetic law of '%s' needs a value for '%s'." % (self.reaction, e.args[0]))
+        return self._func(*args)
+
+    def parameters(self):
+        return {sid: v for sid, v in self.defaults.items() if sid not in self.species}
+
+
+_caches = weakref.WeakKeyDictionary()
+
+
+# The values the compiled law depends on. Unset values are None, not NaN, so that equal states compare equal.
+def _state(model, kl):
+    local = tuple((p.getId(), p.getValue() if p.isSetValue() else None) for p in kl.getListOfLocalParameters())
+    glob = tuple((p.getId(), p.getValue() if p.isSetValue() else None) for p in model.getListOfParameters())
+    comp = tuple((c.getId(), c.getSize() if c.isSetSize() else None) for c in model.getListOfCompartments())
+    species = tuple((s.getId(), s.getInitialConcentration() if s.isSetInitialConcentration() else None)
+                    for s in model.getListOfSpecies())
+    functions = tuple((fd.getId(), sbml.formulaToL3String(fd.getMath()) if fd.getMath() is not None else None)
+                      for fd in model.getListOfFunctionDefinitions())
+    return local, glob, comp, species, functions
+
+
+# Returns the CompiledLaw of the reaction (sid) of the document (EnzymeML or EnzymeMLModel)
+def compile_reaction(enzymeml, reaction):
+    model = enzymeml.get_model()
+    sid = enzml._get_id(reaction)
+    reac = model.getReaction(sid)
+    if reac is None:
+        raise RuntimeError("No reaction element with SID '%s' was found." % sid)
+    if not reac.isSetKineticLaw() or reac.getKineticLaw().getMath() is None:
+        raise RuntimeError("The reaction '%s' has no kinetic law." % sid)
+
+    kl = reac.getKineticLaw()
+    formula = sbml.formulaToL3String(kl.getMath())
+    state = _state(model, kl)
+
+    cache = _caches.setdefault(enzymeml, dict())
+    entry = cache.get(sid)
+    if entry is not None and entry[0] == formula and entry[1] == state:
+        return entry[2]
+
+    func, symbols, functions = compile_formula(formula)
+    if len(functions) > 0:
+        func = functools.partial(func, **{"_f%i" % i: _function_definition(model, f)
+                                          for i, f in enumerate(functions)})
+
+    defaults = _model_values(model)
+    for p in kl.getListOfLocalParameters():
+        if p.isSetValue():
+            defaults[p.getId()] = p.getValue()
+    species = {s.getId() for s in model.getListOfSpecies()}
+
+    law = CompiledLaw(sid, formula, func, symbols,
+                      {s: v for s, v in defaults.items() if s in symbols},
+                      frozenset(s for s in symbols if s in species))
+    cache[sid] = (formula, state, law)
+    return law
+
+
+# Returns the CompiledLaw of every reaction with a kinetic law by reaction sid
+def compile_model(enzymeml):
+    return {reac.getId(): compile_reaction(enzymeml, reac.getId())
+            for reac in enzymeml.get_model().getListOfReactions()
+            if reac.isSetKineticLaw() and reac.getKineticLaw().getMath() is not None}
@@ -0,0 +1,68 @@
+"""
+Logging of the EnzymeML package. Every module logs to a child of the 'enzymeml' logger, so the output can be
+controlled for the whole package or per module, e.g.
+
+    import enzymeml.log as log
+    log.enable(log.DEBUG)                            # everything to stderr
+    log.set_level(log.WARNING, "enzymeml.enzymeml")  # only warnings of the main module
+
+Messages are given as format string plus arguments and only formatted if the record is emitted. By default a
+NullHandler is installed, so nothing is written and disabled records cost a single level check.
+"""
+import logging
+
+ROOT = "enzymeml"
+
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+DISABLED = logging.CRITICAL + 1
+
+_FORMAT = "%(asctime)s %(levelname)s [%(name)s] %(message)s"
+
+_root = logging.getLogger(ROOT)
+_root.addHandler(logging.NullHandler())
+_handler = None
+
+
+def _logger_name(module):
+    if module is None or module == ROOT:
+        return ROOT
+    if module.startswith(ROOT + "."):
+        return module
+    return "%s.%s" % (ROOT, module)
+
+
+# Returns the logger of a module. Use get_logger(__name__) inside the package.
+def get_logger(module=None):
+    return logging.getLogger(_logger_name(module))
+
+
+# Sets the level of the whole package (None or "enzymeml") or of a single module ("enzymeml.enzymeml",
+# "ontologymanager", ...)
+def set_level(level, module=None):
+    get_logger(module).setLevel(level)
+
+
+# Writes the records of the package to a stream (stderr by default) starting at the given level
+def enable(level=INFO, module=None, stream=None, fmt=_FORMAT):
+    global _handler
+
+    if _handler is None:
+        _handler = logging.StreamHandler(stream)
+        _handler.setFormatter(logging.Formatter(fmt))
+        _root.addHandler(_handler)
+    elif stream is not None:
+        _handler.setStream(stream)
+
+    set_level(level, module)
+
+
+# Disables the output of the package or a single module. Disabled records are dropped before any formatting.
+def disable(module=None):
+    set_level(DISABLED, module)
+
+
+def is_enabled(level, module=None):
+    return get_logger(module).isEnabledFor(level)
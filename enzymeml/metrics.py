@@ -0,0 +1,155 @@
+"""
+Timing counters of the add_to_model dispatch.
+
+Every call of add_to_model (EnzymeML.add and EnzymeMLModel.add) is counted per enzymemlkey: the number of calls,
+the cumulative and the maximal duration. The counters exist globally and per document (calls on a model are
+counted for its EnzymeML document). They can be exported in the Prometheus text format, e.g. for a metrics
+endpoint:
+
+    import enzymeml.metrics as metrics
+    metrics.counters(enzymeml).get(key.MAIN_SPECIES).total
+    metrics.prometheus(labels={"service": "upload"})
+
+Recording costs two clock reads and a dictionary lookup per call; metrics.disable() turns it off.
+"""
+import weakref
+import threading
+
+PREFIX = "enzymeml_add"
+
+
+class Counter:
+    __slots__ = ("count", "total", "max")
+
+    def __init__(self, count=0, total=0.0, maximum=0.0):
+        self.count = count
+        self.total = total  # seconds
+        self.max = maximum  # seconds
+
+    def add(self, seconds):
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    def mean(self):
+        return self.total / self.count if self.count > 0 else 0.0
+
+    def to_dict(self):
+        return {"count": self.count, "total": self.total, "max": self.max}
+
+
+# The counters of the enzymemlkeys
+class Counters:
+    def __init__(self):
+        self.counters = dict()
+        self._lock = threading.Lock()
+
+    def record(self, ekey, seconds):
+        counter = self.counters.get(ekey)
+        if counter is None:
+            with self._lock:
+                counter = self.counters.setdefault(ekey, Counter())
+        counter.add(seconds)
+
+    def get(self, ekey):
+        counter = self.counters.get(ekey)
+        return counter if counter is not None else Counter()
+
+    def keys(self):
+        return sorted(self.counters)
+
+    def items(self):
+        return [(k, self.counters[k]) for k in self.keys()]
+
+    def count(self):
+        return sum(c.count for c in self.counters.values())
+
+    def total(self):
+        return sum(c.total for c in self.counters.values())
+
+    def reset(self):
+        self.counters.clear()
+
+    def to_dict(self):
+        return {k: c.to_dict() for k, c in self.items()}
+
+
+_global = Counters()
+_documents = weakref.WeakKeyDictionary()
+_enabled = True
+
+
+def is_enabled():
+    return _enabled
+
+
+def enable():
+    global _enabled
+    _enabled = True
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+# Records one call of the key for the document (EnzymeML) and globally
+def record(document, ekey, seconds):
+    _global.record(ekey, seconds)
+    try:
+        counters = _documents[document]
+    except KeyError:
+        counters = _documents.setdefault(document, Counters())
+    counters.record(ekey, seconds)
+
+
+# The global counters of all documents
+def global_counters():
+    return _global
+
+
+# The counters of a document (EnzymeML)
+def counters(document):
+    try:
+        return _documents[document]
+    except KeyError:
+        return Counters()
+
+
+# Resets the counters of the document, or all counters
+def reset(document=None):
+    if document is None:
+        _global.reset()
+        _documents.clear()
+    elif document in _documents:
+        del _documents[document]
+
+
+def _labels(labels):
+    return ",".join('%s="%s"' % (k, str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+                    for k, v in labels)
+
+
+# Returns the counters (default: the global ones) in the Prometheus text format. labels: dict of labels added to
+# every sample, e.g. the service or the document name.
+def prometheus(source=None, labels=None, prefix=PREFIX):
+    source = _global if source is None else source if isinstance(source, Counters) else counters(source)
+    extra = list(labels.items()) if labels is not None else list()
+
+    metrics = [
+        ("calls_total", "counter", "Number of add_to_model calls per enzymemlkey.", lambda c: c.count),
+        ("seconds_total", "counter", "Cumulative duration of the add_to_model calls per enzymemlkey.",
+         lambda c: c.total),
+        ("seconds_max", "gauge", "Maximal duration of an add_to_model call per enzymemlkey.", lambda c: c.max),
+    ]
+
+    lines = list()
+    items = source.items()
+    for name, kind, text, value in metrics:
+        metric = "%s_%s" % (prefix, name)
+        lines.append("# HELP %s %s" % (metric, text))
+        lines.append("# TYPE %s %s" % (metric, kind))
+        for ekey, counter in items:
+            lines.append("%s{%s} %r" % (metric, _labels(extra + [("key", ekey)]), float(value(counter))))
+    return "\n".join(lines) + "\n"
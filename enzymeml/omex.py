@@ -0,0 +1,429 @@
+"""
+COMBINE archives (OMEX) on the zipfile module, as alternative to libcombine.
+
+An Archive is either opened from a file (or a binary file-like object), or created empty and written with write().
+Opened archives give streamed access to their entries (open_entry), so an entry does not have to be extracted as a
+whole. Entries of new archives are added from files (add_file, copied in chunks when the archive is written) or from
+memory (add_string), so no files have to be written before the archive is created. The manifest.xml and the
+metadata.rdf (description, creators and dates of the archive) are read and written as libcombine does.
+
+write(threads=n) compresses the entries (raw deflate) on a thread pool and assembles the zip file itself; zlib
+releases the GIL, so archives with many data files and models are compressed on several cores. Every entry can
+have its own compression level, 0 stores it uncompressed (e.g. already compressed binary data).
+
+The backend of EnzymeML.load_from_file and EnzymeML.create_archive is selected with enzymeml.set_archive_backend
+or the environment variable ENZYMEML_ARCHIVE_BACKEND ("libcombine" or "zipfile").
+"""
+import io
+import zipfile
+import zlib
+import struct
+import shutil
+import time
+import os
+import itertools
+import collections
+import concurrent.futures
+import xml.etree.ElementTree as ET
+from datetime import datetime, timezone
+from xml.sax.saxutils import escape, quoteattr
+
+NS_OMEX = "http://identifiers.org/combine.specifications/omex-manifest"
+NS_RDF = "http://www.w3.org/1999/02/22-rdf-syntax-ns#"
+NS_DCTERMS = "http://purl.org/dc/terms/"
+NS_VCARD = "http://www.w3.org/2006/vcard/ns#"
+
+FORMAT_OMEX = "http://identifiers.org/combine.specifications/omex"
+FORMAT_MANIFEST = "http://identifiers.org/combine.specifications/omex-manifest"
+FORMAT_METADATA = "http://identifiers.org/combine.specifications/omex-metadata"
+FORMAT_SBML = "http://identifiers.org/combine.specifications/sbml"
+FORMAT_CSV = "http://purl.org/NET/mediatypes/text/csv"
+
+MANIFEST = "manifest.xml"
+METADATA = "metadata.rdf"
+
+_CHUNK_SIZE = 1 << 20
+
+
+# True if the format is of the kind ("sbml", "csv", ...), like libcombine's KnownFormats.isFormat
+def is_format(kind, form):
+    if form is None:
+        return False
+    if kind == "sbml":
+        return form.startswith(FORMAT_SBML)
+    if kind == "csv":
+        return form == "text/csv" or form.endswith("/text/csv")
+    if kind == "omex":
+        return form == FORMAT_OMEX
+    return form == kind or form.endswith("/" + kind)
+
+
+# The name of a manifest location in the zip file ("./data/a.csv" -> "data/a.csv")
+def _name(location):
+    while location.startswith("./"):
+        location = location[2:]
+    return location.lstrip("/")
+
+
+def _location(name):
+    return name if name.startswith("./") or name in (".", MANIFEST, METADATA) else "./" + name
+
+
+class Entry:
+    def __init__(self, location, form, master=False, level=None):
+        self.location = location
+        self.format = form
+        self.master = master
+        self.level = level  # compression level of the entry when written, 0: stored (default: of the archive)
+        self._file = None  # path of a file to add
+        self._data = None  # bytes to add
+
+    def name(self):
+        return _name(self.location)
+
+
+class Creator:
+    def __init__(self, family=None, given=None, email=None, organization=None):
+        self.family = family
+        self.given = given
+        self.email = email
+        self.organization = organization
+
+    # Creates the creator of a libcombine VCard (EnzymeML.creator)
+    @staticmethod
+    def from_vcard(vcard):
+        return Creator(vcard.getFamilyName() or None, vcard.getGivenName() or None, vcard.getEmail() or None,
+                       vcard.getOrganization() or None)
+
+
+class Metadata:
+    def __init__(self, description=None, creators=None, created=None, modified=None):
+        self.description = description
+        self.creators = list() if creators is None else creators
+        self.created = created  # W3CDTF strings
+        self.modified = list() if modified is None else modified
+
+
+def _now():
+    return datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+class Archive:
+    def __init__(self):
+        self.entries = list()
+        self.metadata = Metadata()
+        self._zip = None
+
+    # Opens the archive at location (path or binary file-like object)
+    @staticmethod
+    def open(location):
+        archive = Archive()
+        try:
+            archive._zip = zipfile.ZipFile(location, "r")
+            manifest = archive._zip.read(MANIFEST)
+        except (zipfile.BadZipFile, KeyError, OSError) as e:
+            if archive._zip is not None:
+                archive._zip.close()
+            raise RuntimeError("Could not find a valid omex archive at '%s': %s" % (location, e))
+
+        root = ET.fromstring(manifest)
+        for content in root.findall("{%s}content" % NS_OMEX):
+            location = content.attrib.get("location")
+            form = content.attrib.get("format")
+            if location is None or location == "." or _name(location) in (MANIFEST, METADATA):
+                continue
+            archive.entries.append(Entry(location, form, content.attrib.get("master", "false") == "true"))
+
+        if METADATA in archive._zip.namelist():
+            archive.metadata = _read_metadata(archive._zip.read(METADATA))
+        return archive
+
+    def close(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def master(self):
+        for entry in self.entries:
+            if entry.master:
+                return entry
+        return None
+
+    def get_entry(self, location):
+        name = _name(location)
+        for entry in self.entries:
+            if entry.name() == name:
+                return entry
+        return None
+
+    # Returns a binary stream of the entry which decompresses while it is read
+    def open_entry(self, location):
+        entry = self.get_entry(location)
+        if entry is not None and entry._data is not None:
+            return io.BytesIO(entry._data)
+        if entry is not None and entry._file is not None:
+            return open(entry._file, "rb")
+        if self._zip is None:
+            raise KeyError("The archive has no entry '%s'." % location)
+        return self._zip.open(_name(location), "r")
+
+    # Returns a text stream of the entry
+    def open_text(self, location, encoding="utf-8"):
+        return io.TextIOWrapper(self.open_entry(location), encoding=encoding, newline="")
+
+    def read_entry(self, location, encoding="utf-8"):
+        with self.open_entry(location) as f:
+            return f.read().decode(encoding)
+
+    def _add(self, entry):
+        old = self.get_entry(entry.location)
+        if old is not None:
+            self.entries.remove(old)
+        if entry.master:
+            for e in self.entries:
+                e.master = False
+        self.entries.append(entry)
+        return entry
+
+    # Adds the file at path as entry; it is read when the archive is written. level: compression level of the
+    # entry (0: stored, default: of the archive)
+    def add_file(self, path, location, form, master=False, level=None):
+        entry = Entry(_location(location), form, master, level)
+        entry._file = path
+        return self._add(entry)
+
+    # Adds an entry from memory (str or bytes)
+    def add_string(self, data, location, form, master=False, encoding="utf-8", level=None):
+        entry = Entry(_location(location), form, master, level)
+        entry._data = data.encode(encoding) if isinstance(data, str) else bytes(data)
+        return self._add(entry)
+
+    def manifest(self):
+        lines = ['<?xml version="1.0" encoding="UTF-8"?>', '<omexManifest xmlns="%s">' % NS_OMEX,
+                 '  <content location="." format="%s"/>' % FORMAT_OMEX,
+                 '  <content location="./%s" format="%s"/>' % (MANIFEST, FORMAT_MANIFEST),
+                 '  <content location="./%s" format="%s"/>' % (METADATA, FORMAT_METADATA)]
+        for entry in self.entries:
+            lines.append('  <content location=%s format=%s master="%s"/>' % (
+                quoteattr(entry.location), quoteattr(entry.format), "true" if entry.master else "false"))
+        lines.append("</omexManifest>")
+        return "\n".join(lines) + "\n"
+
+    # Copies the content of the entry into the stream dst
+    def _copy(self, entry, dst):
+        with self.open_entry(entry.location) as src:
+            shutil.copyfileobj(src, dst, _CHUNK_SIZE)
+
+    # Writes the archive to target (path or binary file-like object). compresslevel: the level of the entries
+    # without own level. threads: compress the entries on a thread pool of this size (see _write_parallel). A path
+    # target is written to a temporary file which replaces the target only on success.
+    def write(self, target, compression=zipfile.ZIP_DEFLATED, compresslevel=None, threads=None):
+        if not isinstance(target, (str, bytes, os.PathLike)):
+            self._write_to(target, compression, compresslevel, threads)
+            return
+
+        target = os.fsdecode(target)
+        tmp = "%s.%i.tmp" % (target, os.getpid())
+        try:
+            with open(tmp, "wb") as f:
+                self._write_to(f, compression, compresslevel, threads)
+            os.replace(tmp, target)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def _write_to(self, f, compression, compresslevel, threads):
+        if threads is not None and threads > 0:
+            self._write_parallel(f, compression, compresslevel, threads)
+            return
+
+        with zipfile.ZipFile(f, "w", compression, compresslevel=compresslevel) as zf:
+            for entry in self.entries:
+                compress_type = zipfile.ZIP_STORED if entry.level == 0 else compression
+                level = entry.level if entry.level else compresslevel
+                if entry._data is not None:
+                    zf.writestr(entry.name(), entry._data, compress_type, level)
+                elif entry._file is not None:
+                    zf.write(entry._file, entry.name(), compress_type, level)
+                else:
+                    info = zipfile.ZipInfo(entry.name(), time.localtime()[:6])
+                    info.compress_type = compress_type
+                    with zf.open(info, "w") as dst:
+                        self._copy(entry, dst)
+            zf.writestr(MANIFEST, self.manifest())
+            zf.writestr(METADATA, _write_metadata(self.metadata))
+
+    # Compresses the entries (raw deflate, zlib releases the GIL) on a thread pool and assembles the zip file in the
+    # binary stream f. The entries are written in their order as soon as they are compressed; at most two entries
+    # per thread are in flight, so the compressed data of the whole archive is not held in memory. Archives which
+    # need zip64 are not supported by this mode.
+    def _write_parallel(self, f, compression, compresslevel, threads):
+        level = zlib.Z_DEFAULT_COMPRESSION if compresslevel is None else compresslevel
+        if compression == zipfile.ZIP_STORED:
+            level = 0
+        elif compression != zipfile.ZIP_DEFLATED:
+            raise ValueError("Only deflated or stored entries can be compressed in parallel.")
+
+        sources = [(entry.name(), entry._data if entry._data is not None else self._opener(entry),
+                    level if entry.level is None or level == 0 else entry.level) for entry in self.entries]
+        sources.append((MANIFEST, self.manifest().encode("utf-8"), level))
+        sources.append((METADATA, _write_metadata(self.metadata).encode("utf-8"), level))
+        if len(sources) > 0xFFFF:
+            raise ValueError("The archive has too many entries to be written in parallel, write it sequentially.")
+
+        _write_zip(f, sources, threads)
+
+    # The binary stream of an entry as callable, to be opened in a worker thread
+    def _opener(self, entry):
+        return lambda: self.open_entry(entry.location)
+
+    # Writes the entries into the directory
+    def extract(self, directory):
+        for entry in self.entries:
+            path = os.path.join(directory, *entry.name().split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as dst:
+                self._copy(entry, dst)
+
+
+_LOCAL_HEADER = struct.Struct("<4sHHHHHLLLHH")
+_CENTRAL_HEADER = struct.Struct("<4sBBBBHHHHLLLHHHHHLL")
+_END_RECORD = struct.Struct("<4sHHHHLLH")
+_ZIP64_LIMIT = 0xFFFFFFFF
+
+
+# Writes the sources (name, bytes or opener, level) as zip file into the binary stream f, compressed on a thread pool
+def _write_zip(f, sources, threads):
+    dostime, dosdate = _dos_time()
+    offset = 0
+    directory = list()
+    with concurrent.futures.ThreadPoolExecutor(threads) as executor:
+        pending = collections.deque()
+        remaining = iter(sources)
+        for name, source, lvl in itertools.islice(remaining, 2 * threads):
+            pending.append((name, lvl, executor.submit(_compress, source, lvl)))
+
+        while len(pending) > 0:
+            name, lvl, future = pending.popleft()
+            data, crc, size = future.result()
+            for next_name, source, next_lvl in itertools.islice(remaining, 1):
+                pending.append((next_name, next_lvl, executor.submit(_compress, source, next_lvl)))
+
+            method = zipfile.ZIP_STORED if lvl == 0 else zipfile.ZIP_DEFLATED
+            encoded = name.encode("utf-8")
+            flags = 0 if name.isascii() else 0x800
+            if max(offset, size, len(data)) > _ZIP64_LIMIT:
+                raise ValueError("The archive needs zip64 and cannot be written in parallel, write it sequentially.")
+
+            f.write(_LOCAL_HEADER.pack(b"PK\x03\x04", 20, flags, method, dostime, dosdate, crc, len(data), size,
+                                       len(encoded), 0))
+            f.write(encoded)
+            f.write(data)
+            directory.append(_CENTRAL_HEADER.pack(b"PK\x01\x02", 20, 3, 20, 0, flags, method, dostime, dosdate,
+                                                  crc, len(data), size, len(encoded), 0, 0, 0, 0,
+                                                  0o100644 << 16, offset) + encoded)
+            offset += _LOCAL_HEADER.size + len(encoded) + len(data)
+
+    start = offset
+    for record in directory:
+        f.write(record)
+        offset += len(record)
+    if max(start, offset - start) > _ZIP64_LIMIT:
+        raise ValueError("The archive needs zip64 and cannot be written in parallel, write it sequentially.")
+    f.write(_END_RECORD.pack(b"PK\x05\x06", 0, 0, len(directory), len(directory), offset - start, start, 0))
+
+
+def _dos_time():
+    t = time.localtime()
+    return (t.tm_hour << 11) | (t.tm_min << 5) | (t.tm_sec // 2), \
+        ((t.tm_year - 1980) << 9) | (t.tm_mon << 5) | t.tm_mday
+
+
+# Compresses the source (bytes or callable returning a binary stream) with raw deflate (level 0: stored). Returns
+# the compressed data, the crc32 and the uncompressed size.
+def _compress(source, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -zlib.MAX_WBITS) if level != 0 else None
+    if isinstance(source, (bytes, bytearray)):
+        data = compressor.compress(source) + compressor.flush() if compressor is not None else bytes(source)
+        return data, zlib.crc32(source), len(source)
+
+    crc = 0
+    size = 0
+    parts = list()
+    with source() as f:
+        while True:
+            chunk = f.read(_CHUNK_SIZE)
+            if not chunk:
+                break
+            crc = zlib.crc32(chunk, crc)
+            size += len(chunk)
+            parts.append(compressor.compress(chunk) if compressor is not None else chunk)
+    if compressor is not None:
+        parts.append(compressor.flush())
+    return b"".join(parts), crc, size
+
+
+def _text(el, path, ns):
+    found = el.find(path, ns)
+    return found.text if found is not None else None
+
+
+def _read_metadata(data):
+    ns = {"rdf": NS_RDF, "dcterms": NS_DCTERMS, "vCard": NS_VCARD}
+    meta = Metadata()
+    try:
+        root = ET.fromstring(data)
+    except ET.ParseError:
+        return meta
+
+    for descr in root.findall("rdf:Description", ns):
+        if descr.attrib.get("{%s}about" % NS_RDF) not in (".", "./", None):
+            continue
+        meta.description = _text(descr, "dcterms:description", ns)
+        meta.created = _text(descr, "dcterms:created/dcterms:W3CDTF", ns)
+        meta.modified = [m.text for m in descr.findall("dcterms:modified/dcterms:W3CDTF", ns)]
+        for creator in descr.findall("dcterms:creator", ns):
+            email = creator.find("vCard:hasEmail", ns)
+            meta.creators.append(Creator(_text(creator, "vCard:hasName/vCard:family-name", ns),
+                                         _text(creator, "vCard:hasName/vCard:given-name", ns),
+                                         email.attrib.get("{%s}resource" % NS_RDF) if email is not None else None,
+                                         _text(creator, "vCard:organization-name", ns)))
+    return meta
+
+
+def _write_metadata(meta):
+    created = meta.created if meta.created is not None else _now()
+    modified = meta.modified if len(meta.modified) > 0 else [created]
+
+    lines = ["<?xml version='1.0' encoding='UTF-8'?>",
+             "<rdf:RDF xmlns:rdf='%s' xmlns:dcterms='%s' xmlns:vCard='%s'>" % (NS_RDF, NS_DCTERMS, NS_VCARD),
+             "  <rdf:Description rdf:about='.'>"]
+    if meta.description is not None:
+        lines.append("    <dcterms:description>%s</dcterms:description>" % escape(meta.description))
+    for m in modified:
+        lines.append("    <dcterms:modified rdf:parseType='Resource'>\n      <dcterms:W3CDTF>%s</dcterms:W3CDTF>\n"
+                     "    </dcterms:modified>" % escape(m))
+    lines.append("    <dcterms:created rdf:parseType='Resource'>\n      <dcterms:W3CDTF>%s</dcterms:W3CDTF>\n"
+                 "    </dcterms:created>" % escape(created))
+    for c in meta.creators:
+        lines.append("    <dcterms:creator rdf:parseType='Resource'>")
+        lines.append("      <vCard:hasName rdf:parseType='Resource'>")
+        if c.family is not None:
+            lines.append("        <vCard:family-name>%s</vCard:family-name>" % escape(c.family))
+        if c.given is not None:
+            lines.append("        <vCard:given-name>%s</vCard:given-name>" % escape(c.given))
+        lines.append("      </vCard:hasName>")
+        if c.email is not None:
+            lines.append("      <vCard:hasEmail rdf:resource=%s />" % quoteattr(c.email))
+        if c.organization is not None:
+            lines.append("      <vCard:organization-name>%s</vCard:organization-name>" % escape(c.organization))
+        lines.append("    </dcterms:creator>")
+    lines += ["  </rdf:Description>", "</rdf:RDF>"]
+    return "\n".join(lines) + "\n"
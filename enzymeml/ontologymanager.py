@@ -1,5 +1,14 @@
 import xlrd
 import libsbml as sbml
+import enzymeml.log as log
+import hashlib
+import os
+import json
+import math
+import sqlite3
+import threading
+
+_log = log.get_logger(__name__)
 
 IDENTIFIERS_ORG = "https://identifiers.org/"
 
@@ -21,6 +30,7 @@ SBO_MODIFIER = 19
 SBO_NEUTRAL_PARTICIPANT = 594
 SBO_INTERACTOR = 336
 SBO_METABOLITE = 299
+SBO_PROTEIN = 252
 
 
 # An identifier class to manage the different ontology identifiers
@@ -36,7 +46,7 @@ class Identifier:
         pass
 
     def is_allowed_tag(self, tag):
-        return tag.lower() in self.tags
+        return tag.lower() in [t.lower() for t in self.tags]
 
 
 class NumberIdentifier(Identifier):
@@ -50,46 +60,92 @@ class StringIdentifier(Identifier):
 
 
 ontology_list = {
-    IDENTIFIER_UNIPROT: StringIdentifier(IDENTIFIER_UNIPROT, [""]),
+    IDENTIFIER_UNIPROT: StringIdentifier(IDENTIFIER_UNIPROT, ["protein"]),
     IDENTIFIER_CHEMICAL_ENTITIES: NumberIdentifier(IDENTIFIER_CHEMICAL_ENTITIES, ["species"]),
     IDENTIFIER_DIGITAL_OBJECT_IDENTIFIER: StringIdentifier(IDENTIFIER_DIGITAL_OBJECT_IDENTIFIER, [""]),
     IDENTIFIER_GENE_ONTOLOGY: NumberIdentifier(IDENTIFIER_GENE_ONTOLOGY, ["compartment"]),
     IDENTIFIER_PROTEIN_DATA_BANK: StringIdentifier(IDENTIFIER_PROTEIN_DATA_BANK, [""]),
     IDENTIFIER_TAXONOMY: NumberIdentifier(IDENTIFIER_TAXONOMY, ["model", "compartment", "species"]),
-    IDENTIFIER_UNIT_ONTOLOGY: NumberIdentifier(IDENTIFIER_UNIT_ONTOLOGY, ["unitDefenition"]),
+    IDENTIFIER_UNIT_ONTOLOGY: NumberIdentifier(IDENTIFIER_UNIT_ONTOLOGY, ["unitDefinition"]),
     IDENTIFIER_SYSTEM_BIOLOGY_ONTOLOGY: NumberIdentifier(IDENTIFIER_SYSTEM_BIOLOGY_ONTOLOGY, ["reaction"])
 }
 
 
+# The tag of an element used to find the ontologies allowed for its 'is' annotation
+def annotation_tag(element):
+    code = element.getTypeCode()
+    if code == sbml.SBML_SPECIES:
+        return "protein" if element.getSBOTerm() in (SBO_ENZYME, SBO_PROTEIN) else "species"
+    elif code == sbml.SBML_COMPARTMENT:
+        return "compartment"
+    elif code == sbml.SBML_UNIT_DEFINITION:
+        return "unitDefinition"
+    return None
+
+
+def annotation_ontologies(tag):
+    return [o for o in ontology_list if o != IDENTIFIER_TAXONOMY and ontology_list[o].is_allowed_tag(tag)]
+
+
+# Filters the named species, compartments and unit definitions, which are not annotated with BQB_IS yet
 class ListFilter(sbml.ElementFilter):
+    TYPES = (sbml.SBML_SPECIES, sbml.SBML_COMPARTMENT, sbml.SBML_UNIT_DEFINITION)
+
     def __init__(self):
         sbml.ElementFilter.__init__(self)
 
     def filter(self, element):
         if element is None:
             return False
+        if element.getTypeCode() not in ListFilter.TYPES or not element.isSetName():
+            return False
+
+        for cvt in element.getCVTerms():
+            if cvt.getQualifierType() == sbml.BIOLOGICAL_QUALIFIER and cvt.getBiologicalQualifierType() == sbml.BQB_IS:
+                return False
+        return True
 
 
 
+# Normalised lookup key for names and synonyms
+def _name_key(name):
+    return " ".join(str(name).split()).lower()
+
+
+def _split_synonyms(synonyms):
+    if synonyms is None:
+        return []
+    if type(synonyms) in (list, tuple):
+        return [s for s in synonyms if s]
+    return [s.strip() for s in str(synonyms).replace("|", ";").split(";") if s.strip()]
+
+
 # This class is used to easily handle the different ontologies to improve working with EnzymeML.
 # As an input file the excel sheet can work, but a database would work as well.
+# Every ontology keeps the codes by their name and an index of the normalised names and synonyms,
+# so get() and get_uri() are dictionary lookups independent of the spelling of the name.
+# Ontologies too large for memory are kept in stores (see SqliteOntologyStore), which are queried on demand.
 class OntologyManager:
     def __init__(self, loader=None, location=None):
         self.ontologies = dict()
+        self.indexes = dict()
+        self.stores = list()
+        self.ontology_loader = None
 
         if loader is not None and issubclass(type(loader), OntologyLoader):
             self.ontology_loader = loader
         elif loader is not None:
-            print("The loader type '%s' is not a subclass of '%s' and cannot be used." % (type(loader), OntologyLoader))
+            _log.warning("The loader type '%s' is not a subclass of '%s' and cannot be used.", type(loader),
+                         OntologyLoader)
 
         if location is not None:
-            self.load_file(location)
+            self.load(location)
 
     def load(self, location):
         if self.ontology_loader is not None:
             self.ontology_loader.load(self, location)
         else:
-            print("No ontology manager has been applied to load '%s' from." % location)
+            _log.warning("No ontology manager has been applied to load '%s' from.", location)
 
     def add(self, ontology, name, code):
         if "identifier" not in code:
@@ -97,29 +153,159 @@ class OntologyManager:
 
         if ontology not in self.ontologies:
             self.ontologies[ontology] = dict()
+            self.indexes[ontology] = dict()
 
         onto = self.ontologies[ontology]
 
         if name not in onto:
             onto[name] = code
+            self._index(ontology, name, code)
 
-    def get(self, ontology, name):
+    def _index(self, ontology, name, code):
+        index = self.indexes[ontology]
+        index.setdefault(_name_key(name), name)
+
+        for synonym in _split_synonyms(code.get("synonyms", code.get("synonym"))):
+            index.setdefault(_name_key(synonym), name)
+
+    # Adds already indexed ontologies (e.g. from a cache) without rebuilding the indexes
+    def add_indexed(self, ontologies, indexes):
+        for ontology in ontologies:
+            if ontology not in self.ontologies:
+                self.ontologies[ontology] = ontologies[ontology]
+                self.indexes[ontology] = indexes[ontology]
+                continue
+
+            onto = self.ontologies[ontology]
+            for name, code in ontologies[ontology].items():
+                if name not in onto:
+                    onto[name] = code
+            index = self.indexes[ontology]
+            for k, name in indexes[ontology].items():
+                index.setdefault(k, name)
+
+    def add_store(self, store):
+        self.stores.append(store)
+
+    def _resolve_memory(self, ontology, name):
         if ontology not in self.ontologies:
             return None
-        onto = self.ontologies[ontology]
-        if name in onto:
-            return onto[name]
-        else:
-            return None
+        if name in self.ontologies[ontology]:
+            return name
+        return self.indexes[ontology].get(_name_key(name))
+
+    # Returns the name of the ontology entry the name or one of its synonyms refers to
+    def resolve(self, ontology, name):
+        resolved = self._resolve_memory(ontology, name)
+        if resolved is not None:
+            return resolved
+
+        for store in self.stores:
+            match = store.exact(ontology, name)
+            if match is not None:
+                return match.name
+        return None
+
+    def get(self, ontology, name):
+        resolved = self._resolve_memory(ontology, name)
+        if resolved is not None:
+            return self.ontologies[ontology][resolved]
+
+        for store in self.stores:
+            match = store.exact(ontology, name)
+            if match is not None:
+                return match.code
+        return None
+
+    # Searches the names and synonyms of the stores. mode: "exact", "prefix" or "fuzzy" (trigram similarity)
+    # Returns a list of OntologyMatch, best matches first
+    def search(self, ontology, text, mode="prefix", limit=10):
+        matches = list()
+        names = set()
+
+        for store in self.stores:
+            for match in store.search(ontology, text, mode, limit):
+                if match.name not in names:
+                    names.add(match.name)
+                    matches.append(match)
+
+        if len(self.stores) > 1:
+            matches.sort(key=lambda m: -m.score)
+        return matches[:limit]
 
     def get_uri(self, ontology, name):
         onto = self.get(ontology, name)
+        if onto is None:
+            return None
         ident = ontology_list[ontology]
 
         return ident.to_uri(onto["identifier"])
 
+    # Resolves a list of names at once. Returns a dict name -> (entry name, code) of the names found.
+    def resolve_many(self, ontology, names):
+        found = dict()
+        missing = list()
+
+        for name in names:
+            resolved = self._resolve_memory(ontology, name)
+            if resolved is not None:
+                found[name] = (resolved, self.ontologies[ontology][resolved])
+            else:
+                missing.append(name)
+
+        for store in self.stores:
+            if len(missing) == 0:
+                break
+            matches = store.exact_many(ontology, missing)
+            for name in matches:
+                found[name] = (matches[name].name, matches[name].code)
+            missing = [name for name in missing if name not in matches]
+
+        return found
+
+    # Adds BQB_IS annotations to all named species, compartments and unit definitions of the model (an EnzymeML
+    # document, EnzymeMLModel or libsbml Model), which are not annotated yet. The names are collected in one pass,
+    # resolved per ontology in one batch and the CV terms are added afterwards. Proteins (SBO_ENZYME) use the
+    # protein ontologies. Returns a dict sid -> uri of the annotated elements.
+    # Call it after MAIN_SPECIES_SPECIES/MAIN_SPECIES_PROTEIN, as libsbml drops CV terms on appendAnnotation().
     def annotate(self, model):
-        pass
+        if hasattr(model, "get_model"):
+            model = model.get_model()
+
+        elements = model.getListOfAllElements(ListFilter())
+        by_tag = dict()
+        for i in range(elements.getSize()):
+            element = elements.get(i)
+            tag = annotation_tag(element)
+            by_tag.setdefault(tag, dict()).setdefault(element.getName(), []).append(element)
+
+        annotated = dict()
+        for tag in by_tag:
+            names = by_tag[tag]
+            for ontology in annotation_ontologies(tag):
+                if len(names) == 0:
+                    break
+
+                ident = ontology_list[ontology]
+                found = self.resolve_many(ontology, list(names.keys()))
+                for name in found:
+                    uri = ident.to_uri(found[name][1]["identifier"])
+                    for element in names.pop(name):
+                        self._add_is(element, uri)
+                        annotated[element.getId()] = uri
+
+        return annotated
+
+    @staticmethod
+    def _add_is(element, uri):
+        if not element.isSetMetaId():
+            element.setMetaId("META_%s" % element.getId())
+
+        cvt = sbml.CVTerm()
+        cvt.setQualifierType(sbml.BIOLOGICAL_QUALIFIER)
+        cvt.setBiologicalQualifierType(sbml.BQB_IS)
+        cvt.addResource(uri)
+        element.addCVTerm(cvt)
 
 
 # The loader class for the Ontology Manger
@@ -129,21 +315,48 @@ class OntologyLoader:
         pass
 
 
-# This class is used to load the Excel ontology template
+# This class is used to load the Excel ontology template.
+# The parsed and indexed sheets are stored as JSON next to the workbook ('<location>.cache') or, if cache_location
+# (a directory) is given, there in a file named by the hash of the workbook path. The cache is used as long as it
+# belongs to the workbook path and the modification time and size of the workbook match, or its content hash if
+# only the time has changed.
 class ExcelOntologyLoader(OntologyLoader):
-    def __init__(self):
-        pass
+    CACHE_VERSION = 2
+
+    def __init__(self, cache=True, cache_location=None):
+        self.cache = cache
+        self.cache_location = cache_location
+
+    def _cache_file(self, location):
+        if self.cache_location is not None:
+            key = hashlib.sha1(os.path.abspath(location).encode("utf-8")).hexdigest()
+            return os.path.join(self.cache_location, "%s.cache" % key)
+        return "%s.cache" % location
 
     def load(self, manager, location):
-        wb = xlrd.open_workbook(location)
+        if self.cache:
+            cached = self._read_cache(location)
+            if cached is not None:
+                manager.add_indexed(cached["ontologies"], cached["indexes"])
+                return
+
+        parsed = OntologyManager()
+        self._read_workbook(parsed, location)
+        manager.add_indexed(parsed.ontologies, parsed.indexes)
+
+        if self.cache:
+            self._write_cache(location, parsed)
+
+    def _read_workbook(self, manager, location):
+        wb = xlrd.open_workbook(location, on_demand=True)
 
         for sheet in wb.sheets():
             format = list()
             for cell in sheet.row_values(0):
-                format.append(cell.lower())
+                format.append(str(cell).lower())
 
             if "name" not in format or "identifier" not in format:
-                print("Could not find 'name' or 'identifier' in the excel file sheet '%s'" % sheet.name)
+                _log.warning("Could not find 'name' or 'identifier' in the excel file sheet '%s'", sheet.name)
                 continue
 
             namepos = format.index("name")
@@ -157,3 +370,294 @@ class ExcelOntologyLoader(OntologyLoader):
                         obj[format[j]] = row[j]
 
                 manager.add(sheet.name, name, obj)
+
+        wb.release_resources()
+
+    @staticmethod
+    def _stat(location):
+        st = os.stat(location)
+        return st.st_mtime_ns, st.st_size
+
+    @staticmethod
+    def _hash(location):
+        h = hashlib.sha1()
+        with open(location, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                h.update(chunk)
+        return h.hexdigest()
+
+    def _read_cache(self, location):
+        cache_file = self._cache_file(location)
+        if not os.path.isfile(cache_file):
+            return None
+
+        try:
+            with open(cache_file, encoding="utf-8") as f:
+                cached = json.load(f)
+        except (OSError, ValueError):
+            _log.info("The ontology cache '%s' could not be read and is rebuilt.", cache_file)
+            return None
+
+        if type(cached) is not dict or cached.get("version") != ExcelOntologyLoader.CACHE_VERSION or \
+                cached.get("location") != os.path.abspath(location):
+            return None
+
+        if cached["stat"] != list(self._stat(location)):
+            if cached["hash"] != self._hash(location):
+                return None
+            cached["stat"] = self._stat(location)
+            self._dump(cache_file, cached)
+
+        # names and index keys are stored as pairs, since names are not necessarily strings
+        return {
+            "ontologies": {o: {name: code for name, code in entries} for o, entries in cached["ontologies"].items()},
+            "indexes": {o: {k: name for k, name in entries} for o, entries in cached["indexes"].items()}
+        }
+
+    def _write_cache(self, location, manager):
+        cached = {
+            "version": ExcelOntologyLoader.CACHE_VERSION,
+            "location": os.path.abspath(location),
+            "stat": self._stat(location),
+            "hash": self._hash(location),
+            "ontologies": {o: list(entries.items()) for o, entries in manager.ontologies.items()},
+            "indexes": {o: list(index.items()) for o, index in manager.indexes.items()}
+        }
+        self._dump(self._cache_file(location), cached)
+
+    @staticmethod
+    def _dump(cache_file, cached):
+        tmp = "%s.%i.tmp" % (cache_file, os.getpid())
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(cache_file)), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cached, f)
+            os.replace(tmp, cache_file)
+        except OSError as e:
+            _log.info("The ontology cache '%s' could not be written: %s", cache_file, e)
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+
+class OntologyMatch:
+    def __init__(self, name, code, label, score=1.0):
+        self.name = name
+        self.code = code
+        self.label = label
+        self.score = score
+
+    def __repr__(self):
+        return "OntologyMatch(%r, %r, %.3f)" % (self.name, self.label, self.score)
+
+
+def _trigrams(key):
+    padded = "  %s " % key
+    return set(padded[i:i + 3] for i in range(len(padded) - 2))
+
+
+# An ontology stored in a SQLite database. Nothing is loaded into memory: every lookup is an indexed query on
+# the normalised names and synonyms, which allows exact, prefix and trigram (fuzzy) searches over millions
+# of terms. Every thread uses its own connection.
+class SqliteOntologyStore:
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS term (
+            id INTEGER PRIMARY KEY, ontology TEXT NOT NULL, name TEXT NOT NULL, code TEXT NOT NULL,
+            UNIQUE (ontology, name));
+        CREATE TABLE IF NOT EXISTS label (
+            id INTEGER PRIMARY KEY, term INTEGER NOT NULL, ontology TEXT NOT NULL, key TEXT NOT NULL);
+        CREATE INDEX IF NOT EXISTS label_key ON label (ontology, key);
+        CREATE TABLE IF NOT EXISTS trigram (
+            ontology TEXT NOT NULL, gram TEXT NOT NULL, label INTEGER NOT NULL,
+            PRIMARY KEY (ontology, gram, label)) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS gram_count (
+            ontology TEXT NOT NULL, gram TEXT NOT NULL, n INTEGER NOT NULL,
+            PRIMARY KEY (ontology, gram)) WITHOUT ROWID;
+    """
+
+    def __init__(self, location):
+        self.location = location
+        self._local = threading.local()
+        self._connection().executescript(SqliteOntologyStore.SCHEMA)
+
+    def _connection(self):
+        con = getattr(self._local, "connection", None)
+        if con is None:
+            con = sqlite3.connect(self.location)
+            con.execute("PRAGMA cache_size = -65536")
+            con.execute("PRAGMA mmap_size = 268435456")
+            self._local.connection = con
+        return con
+
+    def close(self):
+        con = getattr(self._local, "connection", None)
+        if con is not None:
+            con.close()
+            self._local.connection = None
+
+    # Adds entries in one transaction. entries: iterable of (name, code)
+    def add_many(self, ontology, entries):
+        con = self._connection()
+        gram_counts = dict()
+        with con:
+            for name, code in entries:
+                if "identifier" not in code:
+                    raise RuntimeError("At least the 'identifier' has to be given as the 'code' attribute.")
+
+                cur = con.execute("INSERT OR IGNORE INTO term (ontology, name, code) VALUES (?, ?, ?)",
+                                  (ontology, str(name), json.dumps(code)))
+                if cur.rowcount == 0:
+                    continue
+                term = cur.lastrowid
+
+                keys = set([_name_key(name)])
+                keys.update(_name_key(syn) for syn in _split_synonyms(code.get("synonyms", code.get("synonym"))))
+
+                for key in keys:
+                    grams = _trigrams(key)
+                    label = con.execute("INSERT INTO label (term, ontology, key) VALUES (?, ?, ?)",
+                                        (term, ontology, key)).lastrowid
+                    con.executemany("INSERT OR IGNORE INTO trigram (ontology, gram, label) VALUES (?, ?, ?)",
+                                    [(ontology, g, label) for g in grams])
+                    for g in grams:
+                        gram_counts[g] = gram_counts.get(g, 0) + 1
+
+            con.executemany("INSERT INTO gram_count (ontology, gram, n) VALUES (?, ?, ?) "
+                            "ON CONFLICT (ontology, gram) DO UPDATE SET n = n + excluded.n",
+                            [(ontology, g, n) for g, n in gram_counts.items()])
+
+    def add(self, ontology, name, code):
+        self.add_many(ontology, [(name, code)])
+
+    # Copies all in-memory ontologies of an OntologyManager into the store
+    def import_manager(self, manager):
+        for ontology in manager.ontologies:
+            self.add_many(ontology, manager.ontologies[ontology].items())
+        self._connection().execute("ANALYZE")
+
+    def ontologies(self):
+        return [r[0] for r in self._connection().execute("SELECT DISTINCT ontology FROM term")]
+
+    def exact(self, ontology, name):
+        matches = self._matches(
+            "SELECT t.name, t.code, l.key FROM label l JOIN term t ON t.id = l.term "
+            "WHERE l.ontology = ? AND l.key = ? LIMIT 1", (ontology, _name_key(name)))
+        return matches[0] if len(matches) > 0 else None
+
+    # Exact lookup of many names with one query per chunk of names. Returns a dict name -> OntologyMatch
+    def exact_many(self, ontology, names, chunk=500):
+        keys = dict()
+        for name in names:
+            keys.setdefault(_name_key(name), []).append(name)
+
+        found = dict()
+        key_list = list(keys.keys())
+        con = self._connection()
+        for i in range(0, len(key_list), chunk):
+            part = key_list[i:i + chunk]
+            query = ("SELECT l.key, t.name, t.code FROM label l JOIN term t ON t.id = l.term "
+                     "WHERE l.ontology = ? AND l.key IN (%s)" % ",".join("?" * len(part)))
+            for key, name, code in con.execute(query, [ontology] + part):
+                for requested in keys[key]:
+                    if requested not in found:
+                        found[requested] = OntologyMatch(name, json.loads(code), key)
+
+        return found
+
+    def prefix(self, ontology, text, limit=10):
+        key = _name_key(text)
+        return self._matches(
+            "SELECT t.name, t.code, l.key FROM label l JOIN term t ON t.id = l.term "
+            "WHERE l.ontology = ? AND l.key >= ? AND l.key < ? ORDER BY l.key",
+            (ontology, key, key + "\U0010ffff"), limit)
+
+    # Trigram similarity (shared / (query + label - shared)) of at least 'threshold'.
+    # A label reaching the threshold shares at least 'minimum' trigrams with the query, so it contains one of the
+    # (present - minimum + 1) rarest query trigrams. Candidates are read from these trigrams, rarest first, until
+    # 'max_candidates' rows are reached; frequent trigrams beyond that are skipped, which keeps common words like
+    # 'acid' from turning a lookup into a scan. The candidates are scored on their normalised key.
+    def fuzzy(self, ontology, text, limit=10, threshold=0.3, max_candidates=2000):
+        grams = _trigrams(_name_key(text))
+        if len(grams) == 0:
+            return []
+
+        con = self._connection()
+        query = "SELECT gram, n FROM gram_count WHERE ontology = ? AND gram IN (%s) ORDER BY n" \
+            % ",".join("?" * len(grams))
+        counts = con.execute(query, [ontology] + list(grams)).fetchall()
+
+        minimum = max(1, int(math.ceil(threshold * len(grams))))
+        if len(counts) < minimum:
+            return []
+
+        rare = [counts[0][0]]
+        total = counts[0][1]
+        for gram, n in counts[1:len(counts) - minimum + 1]:
+            if total + n > max_candidates:
+                break
+            rare.append(gram)
+            total += n
+
+        scored = dict()
+        for label, key, term in con.execute(
+                "SELECT l.id, l.key, l.term FROM trigram g JOIN label l ON l.id = g.label "
+                "WHERE g.ontology = ? AND g.gram IN (%s)" % ",".join("?" * len(rare)), [ontology] + rare):
+            if label in scored:
+                continue
+            label_grams = _trigrams(key)
+            shared = len(grams & label_grams)
+            scored[label] = (shared / float(len(grams) + len(label_grams) - shared), len(key), key, term)
+
+        best = sorted((v for v in scored.values() if v[0] >= threshold), key=lambda v: (-v[0], v[1]))
+
+        matches = list()
+        terms = set()
+        for score, _, key, term in best:
+            if term in terms:
+                continue
+            terms.add(term)
+            name, code = con.execute("SELECT name, code FROM term WHERE id = ?", (term,)).fetchone()
+            matches.append(OntologyMatch(name, json.loads(code), key, score))
+            if len(matches) >= limit:
+                break
+
+        return matches
+
+    def search(self, ontology, text, mode="prefix", limit=10):
+        if mode == "exact":
+            match = self.exact(ontology, text)
+            return [] if match is None else [match]
+        elif mode == "prefix":
+            return self.prefix(ontology, text, limit)
+        elif mode == "fuzzy":
+            return self.fuzzy(ontology, text, limit)
+        else:
+            raise ValueError("Unknown search mode '%s'." % mode)
+
+    # Reads the matches of the cursor until 'limit' different terms are found
+    def _matches(self, query, args, limit=None):
+        matches = list()
+        names = set()
+
+        for row in self._connection().execute(query, args):
+            if row[0] in names:
+                continue
+            names.add(row[0])
+            matches.append(OntologyMatch(row[0], json.loads(row[1]), row[2]))
+            if limit is not None and len(matches) >= limit:
+                break
+
+        return matches
+
+
+# This class attaches an SQLite ontology database to the manager. The database is queried lazily.
+# Use SqliteOntologyLoader.build() to create a database from an Excel template.
+class SqliteOntologyLoader(OntologyLoader):
+    def load(self, manager, location):
+        manager.add_store(SqliteOntologyStore(location))
+
+    @staticmethod
+    def build(location, excel_location):
+        parsed = OntologyManager(ExcelOntologyLoader(cache=False), excel_location)
+        store = SqliteOntologyStore(location)
+        store.import_manager(parsed)
+        return store
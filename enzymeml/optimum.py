@@ -0,0 +1,241 @@
+"""
+pH and temperature optima over collections of EnzymeML archives.
+
+collect() loads the archives in worker processes and keeps only one ActivitySummary per reaction: its pH, its
+temperature in kelvin and the mean initial rate of its replicas (see enzymeml.rates). The documents themselves
+are released in the workers. The optimum models are fitted to the summaries with analytic Jacobians evaluated for
+all conditions at once:
+    gaussian:    a = A * exp(-(x - x0)^2 / (2 * w^2))                            (pH)
+    arrhenius:   a = k * exp(-Ea / R * (1/T - 1/Tref)) / (1 + exp(Hd / R * (1/Tm - 1/T)))    (temperature)
+The second is the Arrhenius equation with reversible denaturation at the melting temperature Tm.
+"""
+import os
+import glob
+import concurrent.futures
+import numpy as np
+import scipy.optimize
+import enzymeml.enzymeml as enzml
+import enzymeml.rates as rates
+import enzymeml.log as log
+
+_log = log.get_logger(__name__)
+
+R = 8.314462618
+
+VARIABLE_PH = "ph"
+VARIABLE_TEMPERATURE = "temperature"
+
+_CELSIUS = ("c", "celsius", "°c", "degc", "deg c")
+
+
+# The activity of one reaction of an archive
+class ActivitySummary:
+    def __init__(self, location, reaction, ph, temperature, activity, stderr, replicas):
+        self.location = location
+        self.reaction = reaction
+        self.ph = ph
+        self.temperature = temperature  # kelvin
+        self.activity = activity  # mean initial rate of the replicas, positive for the turnover of the reaction
+        self.stderr = stderr
+        self.replicas = replicas
+
+
+def _kelvin(temperature):
+    if temperature is None:
+        return np.nan
+    value, unit = temperature if type(temperature) is tuple else (temperature, "kelvin")
+    if value is None:
+        return np.nan
+    if str(enzml._get_id(unit)).strip().lower() in _CELSIUS:
+        return float(value) + 273.15
+    return float(value)
+
+
+# Returns the ActivitySummary of every reaction with replicas of the document
+def summarize(enzymeml, location=None):
+    main = enzymeml.get_model()
+    summaries = list()
+
+    for sid, cond in enzymeml.reaction_condition.items():
+        if len(cond.replicas) == 0:
+            continue
+
+        reac = main.getReaction(sid)
+        stoichiometry = dict()
+        for sr in reac.getListOfReactants():
+            stoichiometry[sr.getSpecies()] = -sr.getStoichiometry()
+        for sr in reac.getListOfProducts():
+            stoichiometry[sr.getSpecies()] = sr.getStoichiometry()
+
+        pairs = {(enzml._get_id(r.measurement), enzml._get_id(r.replica)) for r in cond.replicas}
+        measured = rates.initial_rates(enzymeml, list(dict.fromkeys(m for m, _ in pairs)))
+
+        values = np.array([rate / stoichiometry[sp]
+                           for m, c, sp, rate in zip(measured.measurements, measured.columns, measured.species(),
+                                                     measured.rates)
+                           if (m, enzml._get_id(c.replica)) in pairs and sp in stoichiometry and not np.isnan(rate)])
+
+        activity = values.mean() if len(values) > 0 else np.nan
+        stderr = values.std(ddof=1) / np.sqrt(len(values)) if len(values) > 1 else np.nan
+        summaries.append(ActivitySummary(location, sid, np.nan if cond.ph is None else float(cond.ph),
+                                         _kelvin(cond.temperature), activity, stderr, len(values)))
+
+    return summaries
+
+
+def _summarize_archive(location):
+    try:
+        enzymeml = enzml.EnzymeML(os.path.splitext(os.path.basename(location))[0])
+        enzymeml.load_from_file(location)
+        return location, summarize(enzymeml, location), None
+    except Exception as e:
+        return location, list(), str(e)
+
+
+# Returns the archive locations of the locations: files or directories (all .omex files)
+def archives(locations):
+    if isinstance(locations, str):
+        locations = [locations]
+    for location in locations:
+        if os.path.isdir(location):
+            yield from sorted(glob.glob(os.path.join(location, "*.omex")))
+        else:
+            yield location
+
+
+# Yields the ActivitySummary of every reaction of the archives (files or directories). processes: number of worker
+# processes (default: in this process). Archives which cannot be loaded are skipped with a warning.
+def collect(locations, processes=None, chunksize=4):
+    if processes is not None and processes > 1:
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            results = executor.map(_summarize_archive, archives(locations), chunksize=chunksize)
+            for location, summaries, error in results:
+                if error is not None:
+                    _log.warning("The archive '%s' was skipped: %s", location, error)
+                yield from summaries
+    else:
+        for location in archives(locations):
+            location, summaries, error = _summarize_archive(location)
+            if error is not None:
+                _log.warning("The archive '%s' was skipped: %s", location, error)
+            yield from summaries
+
+
+# An optimum model a = f(x, p)
+class OptimumModel:
+    def __init__(self, name, parameters, func, jac, guess, lower, upper):
+        self.name = name
+        self.parameters = parameters
+        self.func = func
+        self.jac = jac
+        self.guess = guess
+        self.lower = lower
+        self.upper = upper
+
+
+def _gauss(x, p):
+    return p[0] * np.exp(-(x - p[1]) ** 2 / (2 * p[2] ** 2))
+
+
+def _gauss_jac(x, p):
+    e = np.exp(-(x - p[1]) ** 2 / (2 * p[2] ** 2))
+    a = p[0] * e
+    return np.column_stack([e, a * (x - p[1]) / p[2] ** 2, a * (x - p[1]) ** 2 / p[2] ** 3])
+
+
+def _gauss_guess(x, y):
+    return [np.max(y), x[np.argmax(y)], max((np.max(x) - np.min(x)) / 4, 1e-3)]
+
+
+# p: k (activity at Tref), Ea, Hd, Tm, Tref (fixed)
+def _arrhenius(t, p):
+    u = np.exp(-p[1] / R * (1 / t - 1 / p[4]))
+    g = np.exp(p[2] / R * (1 / p[3] - 1 / t))
+    return p[0] * u / (1 + g)
+
+
+def _arrhenius_jac(t, p):
+    u = np.exp(-p[1] / R * (1 / t - 1 / p[4]))
+    g = np.exp(p[2] / R * (1 / p[3] - 1 / t))
+    a = p[0] * u / (1 + g)
+    d = g / (1 + g)
+    return np.column_stack([u / (1 + g), -a * (1 / t - 1 / p[4]) / R, -a * d * (1 / p[3] - 1 / t) / R,
+                            a * d * p[2] / (R * p[3] ** 2)])
+
+
+def _arrhenius_guess(t, y):
+    return [np.median(y), 50e3, 200e3, t[np.argmax(y)] + 5]
+
+
+GAUSSIAN = OptimumModel("gaussian", ["amplitude", "optimum", "width"], _gauss, _gauss_jac, _gauss_guess,
+                        [0, -np.inf, 1e-6], [np.inf, np.inf, np.inf])
+
+ARRHENIUS = OptimumModel("arrhenius", ["k", "ea", "hd", "tm"], _arrhenius, _arrhenius_jac, _arrhenius_guess,
+                         [0, 0, 0, 1], [np.inf, np.inf, np.inf, np.inf])
+
+MODELS = {
+    "gaussian": GAUSSIAN,
+    "arrhenius": ARRHENIUS
+}
+
+
+class OptimumResult:
+    def __init__(self, model, values, stdev, optimum, x, y, success):
+        self.model = model
+        self.values = values
+        self.stdev = stdev
+        self.optimum = optimum  # pH or temperature of the maximal activity
+        self.x = x
+        self.y = y
+        self.success = success
+
+    def parameters(self):
+        return dict(zip(self.model.parameters, self.values))
+
+
+# Fits the optimum model (OptimumModel or name of MODELS) to the activities y at the conditions x
+def fit_optimum(x, y, model=GAUSSIAN):
+    model = model if isinstance(model, OptimumModel) else MODELS[model]
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    x = x[valid]
+    y = y[valid]
+
+    k = len(model.parameters)
+    if len(x) < k:
+        raise ValueError("%i conditions are not enough to fit %i parameters." % (len(x), k))
+
+    # the reference temperature of the Arrhenius model is fixed
+    extra = [np.mean(x)] if model is ARRHENIUS else []
+    p0 = np.clip(model.guess(x, y), np.add(model.lower, 1e-9), model.upper)
+    res = scipy.optimize.least_squares(lambda p: model.func(x, np.concatenate([p, extra])) - y, p0,
+                                       jac=lambda p: model.jac(x, np.concatenate([p, extra])),
+                                       bounds=(model.lower, model.upper), x_scale="jac", method="trf")
+
+    dof = len(x) - k
+    try:
+        covariance = np.linalg.inv(res.jac.T @ res.jac) * ((res.fun @ res.fun) / dof if dof > 0 else np.nan)
+    except np.linalg.LinAlgError:
+        covariance = np.full((k, k), np.nan)
+
+    if model is GAUSSIAN:
+        optimum = res.x[1]
+    else:
+        grid = np.linspace(x.min(), x.max(), 2001)
+        optimum = grid[np.argmax(model.func(grid, np.concatenate([res.x, extra])))]
+
+    values = np.concatenate([res.x, extra])
+    return OptimumResult(model, values, np.sqrt(np.abs(np.diag(covariance))), optimum, x, y, res.success)
+
+
+# Collects the activities of the archives and fits the optimum of the variable (VARIABLE_PH with the gaussian
+# model, VARIABLE_TEMPERATURE with the arrhenius model unless given). Returns the OptimumResult and the summaries.
+def analyze(locations, variable=VARIABLE_PH, model=None, processes=None):
+    if model is None:
+        model = GAUSSIAN if variable == VARIABLE_PH else ARRHENIUS
+
+    summaries = list(collect(locations, processes))
+    x = np.array([getattr(s, variable) for s in summaries])
+    y = np.array([s.activity for s in summaries])
+    return fit_optimum(x, y, model), summaries
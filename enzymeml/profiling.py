@@ -0,0 +1,191 @@
+"""
+Opt-in profiling of the public API of the EnzymeML package.
+
+While profiling is enabled, the calls of
+    EnzymeML.load_from_file, EnzymeML.create_archive, add_to_model (every EnzymeML.add), EnzymeMLCSV.read/write
+are profiled with cProfile and tracemalloc. For every call a <n>_<target>.prof file (pstats) and, if snapshots are
+enabled, a <n>_<target>.snapshot file (tracemalloc.Snapshot.load) is written into the directory, and a line with
+the duration and the peak memory is appended to calls.jsonl. Calls inside a profiled call (e.g. EnzymeMLCSV.read
+inside load_from_file) are part of the profile of the outer call.
+
+    import enzymeml.profiling as profiling
+    with profiling.profile("profiles"):
+        enzymeml.load_from_file("slow.omex")
+
+    python -m pstats profiles/0_load_from_file.prof
+
+Setting the environment variable ENZYMEML_PROFILE to a directory enables profiling when the package is imported.
+The functions are only wrapped while profiling is enabled, so there is no overhead otherwise.
+"""
+import os
+import json
+import time
+import cProfile
+import threading
+import tracemalloc
+import contextlib
+import enzymeml.enzymeml as enzml
+import enzymeml.log as log
+
+_log = log.get_logger(__name__)
+
+ENVIRONMENT = "ENZYMEML_PROFILE"
+
+LOAD_FROM_FILE = "load_from_file"
+CREATE_ARCHIVE = "create_archive"
+ADD_TO_MODEL = "add_to_model"
+CSV_READ = "csv_read"
+CSV_WRITE = "csv_write"
+
+# target: (owner, attribute)
+_targets = {
+    LOAD_FROM_FILE: (enzml.EnzymeML, "load_from_file"),
+    CREATE_ARCHIVE: (enzml.EnzymeML, "create_archive"),
+    ADD_TO_MODEL: (enzml, "add_to_model"),
+    CSV_READ: (enzml.EnzymeMLCSV, "read"),
+    CSV_WRITE: (enzml.EnzymeMLCSV, "write"),
+}
+
+TARGETS = tuple(_targets)
+
+
+class _Profiler:
+    def __init__(self, directory, snapshots, min_duration):
+        self.directory = directory
+        self.snapshots = snapshots
+        self.min_duration = min_duration
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.count = 0
+        self.originals = dict()
+        self.started_tracemalloc = False
+
+    def _next(self):
+        with self.lock:
+            n = self.count
+            self.count += 1
+            return n
+
+    def _record(self, label, duration, peak, profile):
+        n = self._next()
+        base = os.path.join(self.directory, "%i_%s" % (n, label))
+        entry = {"call": n, "target": label, "duration": duration, "peak_memory": peak,
+                 "profile": base + ".prof"}
+        profile.dump_stats(base + ".prof")
+        if self.snapshots:
+            tracemalloc.take_snapshot().dump(base + ".snapshot")
+            entry["snapshot"] = base + ".snapshot"
+
+        with self.lock, open(os.path.join(self.directory, "calls.jsonl"), "a") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def wrap(self, target, func):
+        def wrapper(*args, **kwargs):
+            # calls inside a profiled call are part of its profile
+            if getattr(self.local, "active", False):
+                return func(*args, **kwargs)
+
+            label = target
+            if target == ADD_TO_MODEL and len(args) > 1:
+                label = "%s_%s" % (target, args[1])
+
+            self.local.active = True
+            profile = cProfile.Profile()
+            tracemalloc.reset_peak()
+            start = time.perf_counter()
+            try:
+                profile.enable()
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    profile.disable()
+            finally:
+                duration = time.perf_counter() - start
+                peak = tracemalloc.get_traced_memory()[1]
+                self.local.active = False
+                if duration >= self.min_duration:
+                    self._record(label, duration, peak, profile)
+
+        wrapper.__wrapped__ = func
+        wrapper.__name__ = getattr(func, "__name__", target)
+        wrapper.__doc__ = getattr(func, "__doc__", None)
+        return wrapper
+
+    def install(self, targets):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self.started_tracemalloc = True
+
+        for target in targets:
+            owner, attribute = _targets[target]
+            func = getattr(owner, attribute)
+            self.originals[target] = func
+            setattr(owner, attribute, self.wrap(target, func))
+
+    def uninstall(self):
+        for target, func in self.originals.items():
+            owner, attribute = _targets[target]
+            setattr(owner, attribute, func)
+        self.originals.clear()
+
+        if self.started_tracemalloc:
+            tracemalloc.stop()
+            self.started_tracemalloc = False
+
+
+_profiler = None
+
+
+def is_enabled():
+    return _profiler is not None
+
+
+# Enables profiling of the targets (default: all of TARGETS) into the directory. Calls shorter than min_duration
+# (seconds) are not written. snapshots: write a tracemalloc snapshot per call.
+def enable(directory, targets=None, snapshots=True, min_duration=0.0):
+    global _profiler
+
+    if _profiler is not None:
+        raise RuntimeError("Profiling is already enabled (directory '%s')." % _profiler.directory)
+
+    targets = TARGETS if targets is None else targets
+    for target in targets:
+        if target not in _targets:
+            raise ValueError("Unknown profiling target '%s'." % target)
+
+    os.makedirs(directory, exist_ok=True)
+    _profiler = _Profiler(directory, snapshots, min_duration)
+    _profiler.install(targets)
+    _log.info("Profiling %s into '%s'.", ", ".join(targets), directory)
+
+
+# Disables profiling and restores the original functions
+def disable():
+    global _profiler
+
+    if _profiler is not None:
+        _profiler.uninstall()
+        _log.info("Profiled %i calls into '%s'.", _profiler.count, _profiler.directory)
+        _profiler = None
+
+
+@contextlib.contextmanager
+def profile(directory, targets=None, snapshots=True, min_duration=0.0):
+    enable(directory, targets, snapshots, min_duration)
+    try:
+        yield
+    finally:
+        disable()
+
+
+# Returns the entries of calls.jsonl of a profiling directory
+def read_calls(directory):
+    with open(os.path.join(directory, "calls.jsonl")) as f:
+        return [json.loads(line) for line in f if line.strip() != ""]
+
+
+# Enables profiling if the environment variable is set
+def enable_from_environment():
+    directory = os.environ.get(ENVIRONMENT)
+    if directory and not is_enabled():
+        enable(directory)
@@ -0,0 +1,184 @@
+"""
+Initial rates of all concentration columns of a document.
+
+The concentration columns of the measurements are stacked into one (rows x columns) array. For every window of
+the first k measured points, slope, intercept, standard error and R^2 of the linear regression are computed for
+all columns at once from cumulative sums. The linear window of a column is the longest one with R^2 >= min_r2
+whose slope deviates at most max_deviation (relative) from the slope of the shortest window.
+"""
+import numpy as np
+import enzymeml.enzymeml as enzml
+import enzymeml.enzymemlkey as key
+import enzymeml.data as data
+import enzymeml.units as units
+
+
+# The initial rates of the stacked columns. All arrays have one value per column.
+class InitialRates:
+    def __init__(self, measurements, columns, time_units, rates, stderr, intercepts, r2, points):
+        self.measurements = measurements  # measurement sid of every column
+        self.columns = columns  # EnzymeMLColumnConcentration of every column
+        self.time_units = time_units  # time unit of every column
+        self.rates = rates
+        self.stderr = stderr
+        self.intercepts = intercepts  # concentration at the first time point (of the regression line)
+        self.r2 = r2
+        self.points = points  # length of the linear window
+
+    def labels(self):
+        return ["%s:%s" % (m, enzml._get_id(c.replica)) for m, c in zip(self.measurements, self.columns)]
+
+    def species(self):
+        return [enzml._get_id(c.species) for c in self.columns]
+
+
+# Stacks the columns of the measurements. Returns (time, values) of shape (rows x columns), rows are sorted by time
+# and padded with NaN, and the MeasurementData of every column.
+def _stack(enzymeml, measurements, species):
+    times = list()
+    values = list()
+    owners = list()
+
+    for sid in measurements:
+        m = data.get_measurement(enzymeml, sid)
+        if m.time is None:
+            continue
+
+        idx = [i for i, s in enumerate(m.species()) if species is None or s == enzml._get_id(species)]
+        if len(idx) == 0:
+            continue
+
+        order = np.argsort(m.time, kind="stable")  # NaN last
+        times.append(np.repeat(m.time[order][:, None], len(idx), axis=1))
+        values.append(m.values[order][:, idx])
+        owners += [(m, m.columns[i]) for i in idx]
+
+    if len(owners) == 0:
+        return np.empty((0, 0)), np.empty((0, 0)), owners
+
+    rows = max(t.shape[0] for t in times)
+    time = np.full((rows, len(owners)), np.nan)
+    value = np.full((rows, len(owners)), np.nan)
+    col = 0
+    for t, v in zip(times, values):
+        time[:t.shape[0], col:col + t.shape[1]] = t
+        value[:v.shape[0], col:col + v.shape[1]] = v
+        col += t.shape[1]
+
+    return time, value, owners
+
+
+# Linear regressions of the windows of the first k rows (k = 1..rows) of all columns.
+# Returns n, slope, intercept, stderr, r2, each of shape (rows x columns). The intercept is the value of the
+# regression line at the first time point of the column.
+def window_regressions(time, values):
+    valid = ~(np.isnan(time) | np.isnan(values))
+    n = np.cumsum(valid, axis=0).astype(float)
+
+    # shift to the first valid point of each column to reduce cancellation
+    first = np.argmax(valid, axis=0)
+    cols = np.arange(time.shape[1])
+    t = np.where(valid, time - time[first, cols], 0.0)
+    y = np.where(valid, values - values[first, cols], 0.0)
+
+    st = np.cumsum(t, axis=0)
+    sy = np.cumsum(y, axis=0)
+    stt = np.cumsum(t * t, axis=0)
+    sty = np.cumsum(t * y, axis=0)
+    syy = np.cumsum(y * y, axis=0)
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        sxx = stt - st * st / n
+        sxy = sty - st * sy / n
+        sst = syy - sy * sy / n
+
+        slope = sxy / sxx
+        intercept = (sy - slope * st) / n + values[first, cols]
+        sse = np.maximum(sst - slope * sxy, 0.0)
+        stderr = np.sqrt(sse / (n - 2) / sxx)
+        r2 = np.where(sst > 0, 1.0 - sse / sst, 1.0)
+
+    return n, slope, intercept, stderr, r2
+
+
+# Returns the InitialRates of all concentration columns of the measurements (default: all measurements).
+# species: only columns of this species | min_points, max_points: bounds of the window length
+def initial_rates(enzymeml, measurements=None, species=None, min_points=3, max_points=None, min_r2=0.98,
+                  max_deviation=0.1):
+    if min_points < 2:
+        raise ValueError("The linear window needs at least 2 points.")
+
+    if measurements is None:
+        reaction_data = enzymeml.get_reaction_data()
+        measurements = list() if reaction_data is None else list(reaction_data.listOfMeasurements.measurements)
+
+    time, values, owners = _stack(enzymeml, measurements, species)
+    columns = [c for _, c in owners]
+    sids = [m.measurement.sid for m, _ in owners]
+    time_units = [m.time_column.unit for m, _ in owners]
+
+    if len(owners) == 0:
+        empty = np.empty(0)
+        return InitialRates(sids, columns, time_units, empty, empty, empty, empty, np.empty(0, dtype=int))
+
+    n, slope, intercept, stderr, r2 = window_regressions(time, values)
+    cols = np.arange(len(owners))
+
+    # the shortest window with min_points points of every column
+    candidate = n >= min_points
+    shortest = np.argmax(candidate, axis=0)
+    reference = slope[shortest, cols]
+
+    if max_points is not None:
+        candidate &= n <= max_points
+    with np.errstate(invalid="ignore"):
+        linear = candidate & (r2 >= min_r2) & (np.abs(slope - reference) <= max_deviation * np.abs(reference))
+
+    # the last row of a linear window, a window ends at a valid point
+    valid = ~(np.isnan(time) | np.isnan(values))
+    linear &= valid
+    last = linear.shape[0] - 1 - np.argmax(linear[::-1], axis=0)
+    row = np.where(linear.any(axis=0), last, shortest)
+
+    enough = candidate.any(axis=0) | (n[-1] >= min_points)
+    result = [np.where(enough, a[row, cols], np.nan) for a in (slope, stderr, intercept, r2)]
+    points = np.where(enough, n[row, cols], 0).astype(int)
+
+    return InitialRates(sids, columns, time_units, result[0], result[1], result[2], result[3], points)
+
+
+# Writes the initial rates as parameters "v0_<measurement>_<replica>" (value and standard error) of a reaction of
+# the model (default: a new model). The reaction uses the replicas of the document the rates were measured in.
+def write_rates(enzymeml, rates, model=None, name="initial rates"):
+    if model is None:
+        model = enzymeml.create_model(name)
+
+    params = list()
+    for sid, column, time_unit, rate, err in zip(rates.measurements, rates.columns, rates.time_units, rates.rates,
+                                                 rates.stderr):
+        if np.isnan(rate):
+            continue
+
+        param = {
+            "name": "v0_%s_%s" % (enzml._get_id(sid), enzml._get_id(column.replica)),
+            "value": float(rate),
+            "units": units.get_quotient_unit(model, enzymeml, column.unit, time_unit)
+        }
+        if not np.isnan(err):
+            param["stdev"] = float(err)
+        params.append(param)
+
+    reac = model.add(key.MODEL_REACTION, {"name": name, "parameters": params})
+
+    used = dict()
+    measured = set(zip((enzml._get_id(m) for m in rates.measurements),
+                       (enzml._get_id(c.replica) for c in rates.columns)))
+    for reacsid, cond in enzymeml.reaction_condition.items():
+        replicas = [r for r in cond.replicas
+                    if (enzml._get_id(r.measurement), enzml._get_id(r.replica)) in measured]
+        if len(replicas) > 0:
+            used[reacsid] = replicas
+    if len(used) > 0:
+        model.add(key.MODEL_REACTION_DATA, used, reac)
+
+    return model, reac
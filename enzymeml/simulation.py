@@ -0,0 +1,197 @@
+"""
+Simulation of EnzymeML models.
+
+The ODE system of a model is built from the stoichiometries of its reactions and their compiled kinetic laws
+(see enzymeml.kineticlaw). The kinetic laws are taken as rates of concentration change, as written by
+enzymeml.fitting. Several sets of initial conditions are integrated together as one block-diagonal system, so
+the right-hand side evaluates all sets with one call of every kinetic law and stiff solvers (BDF, Radau) use a
+sparse Jacobian.
+"""
+import numpy as np
+import scipy.integrate
+import scipy.sparse
+import enzymeml.enzymeml as enzml
+import enzymeml.data as data
+import enzymeml.kineticlaw as kineticlaw
+
+
+# The ODE system of a model (EnzymeML or EnzymeMLModel). The state are the species changed by reactions, all other
+# species of the kinetic laws (e.g. the enzyme) are constant.
+class OdeSystem:
+    def __init__(self, model):
+        self.model = model
+        sbmlmodel = model.get_model()
+        self.laws = kineticlaw.compile_model(model)
+        self.reactions = list(self.laws)
+
+        self.species = list()
+        entries = list()
+        for j, sid in enumerate(self.reactions):
+            reac = sbmlmodel.getReaction(sid)
+            for sign, refs in ((-1.0, reac.getListOfReactants()), (1.0, reac.getListOfProducts())):
+                for sr in refs:
+                    sp = sbmlmodel.getSpecies(sr.getSpecies())
+                    if sp is not None and (sp.getBoundaryCondition() or (sp.isSetConstant() and sp.getConstant())):
+                        continue
+                    if sr.getSpecies() not in self.species:
+                        self.species.append(sr.getSpecies())
+                    stoich = sr.getStoichiometry() if sr.isSetStoichiometry() else 1.0
+                    entries.append((self.species.index(sr.getSpecies()), j, sign * stoich))
+
+        self.stoichiometry = np.zeros((len(self.species), len(self.reactions)))
+        for i, j, v in entries:
+            self.stoichiometry[i, j] += v
+
+        self.constants = sorted({s for law in self.laws.values() for s in law.species} - set(self.species))
+
+    def nspecies(self):
+        return len(self.species)
+
+    # The initial concentrations of the model species, 0 if not set
+    def default_initial(self):
+        sbmlmodel = self.model.get_model()
+        values = dict()
+        for sid in self.species + self.constants:
+            sp = sbmlmodel.getSpecies(sid)
+            values[sid] = sp.getInitialConcentration() if sp is not None and sp.isSetInitialConcentration() else 0.0
+        return values
+
+    # Returns reaction sid -> parameter values. parameters: sid -> value for all kinetic laws or
+    # reaction sid -> {sid: value}
+    def reaction_parameters(self, parameters):
+        parameters = dict() if parameters is None else parameters
+        common = {k: v for k, v in parameters.items() if not isinstance(v, dict)}
+        return {sid: dict(common, **parameters.get(sid, dict())) for sid in self.reactions}
+
+    # The right-hand side for batch sets of initial conditions. y is (batch * species) or (batch * species, k),
+    # ordered by batch. constants: sid -> array (batch, 1) | parameters: see reaction_parameters
+    # scale: None or factor (batch, 1) of all rates
+    def rhs(self, t, y, batch, constants, parameters, scale=None):
+        state = y.reshape(batch, len(self.species), -1)
+        values = dict(constants)
+        for i, sid in enumerate(self.species):
+            values[sid] = state[:, i]
+        values["time"] = t
+
+        rates = np.empty((len(self.reactions), batch, state.shape[2]))
+        for j, sid in enumerate(self.reactions):
+            rates[j] = self.laws[sid](values, **parameters[sid])
+        if scale is not None:
+            rates *= scale
+
+        return np.einsum("ij,jbk->bik", self.stoichiometry, rates).reshape(y.shape)
+
+    def sparsity(self, batch):
+        n = len(self.species)
+        return scipy.sparse.kron(scipy.sparse.identity(batch, format="csr"), np.ones((n, n)), format="csr")
+
+
+# The result of a simulation: values is (batch x species x time points)
+class Simulation:
+    def __init__(self, time, species, values, success, message):
+        self.time = time
+        self.species = species
+        self.values = values
+        self.success = success
+        self.message = message
+
+    # Returns the (batch x time points) series of a species
+    def get(self, sid):
+        return self.values[:, self.species.index(enzml._get_id(sid))]
+
+
+def _batched(values, batch):
+    arr = np.asarray(values, dtype=float)
+    return np.broadcast_to(arr.reshape(-1, 1) if arr.ndim > 0 else arr, (batch, 1))
+
+
+# Simulates the model for the initial conditions, a dict sid -> value or array of values (one per set). Species
+# without initial condition start with their initial concentration. parameters: sid -> value for all kinetic laws
+# or reaction sid -> {sid: value}. scale: factor (or array of factors, one per set) of all reaction rates, e.g. the
+# relative enzyme loading if the kinetic laws do not contain the enzyme. Returns a Simulation at the time points
+# t_eval, the initial conditions are at t0 (default: the first time point).
+def simulate(model, initial, t_eval, parameters=None, method="BDF", system=None, rtol=1e-6, atol=1e-9, t0=None,
+             scale=None):
+    system = OdeSystem(model) if system is None else system
+    parameters = system.reaction_parameters(parameters)
+    initial = {enzml._get_id(k): v for k, v in initial.items()}
+    t_eval = np.asarray(t_eval, dtype=float)
+
+    batch = max([np.size(v) for v in initial.values()] + [np.size(scale), 1])
+    defaults = system.default_initial()
+    values = {sid: _batched(initial.get(sid, defaults[sid]), batch) for sid in defaults}
+
+    y0 = np.hstack([values[sid] for sid in system.species]).ravel()
+    constants = {sid: values[sid] for sid in system.constants}
+
+    if len(system.species) == 0:
+        return Simulation(t_eval, list(), np.empty((batch, 0, len(t_eval))), True, "Nothing to integrate.")
+
+    options = dict()
+    if method in ("BDF", "Radau"):
+        options["jac_sparsity"] = system.sparsity(batch)
+
+    scale = None if scale is None else _batched(scale, batch)
+    res = scipy.integrate.solve_ivp(system.rhs, (t_eval.min() if t0 is None else t0, t_eval.max()), y0, method=method,
+                                    t_eval=t_eval, args=(batch, constants, parameters, scale), vectorized=True,
+                                    rtol=rtol, atol=atol, **options)
+
+    out = np.full((batch, len(system.species), len(t_eval)), np.nan)
+    out.reshape(batch * len(system.species), -1)[:, :res.y.shape[1]] = res.y
+    return Simulation(t_eval, list(system.species), out, res.success, res.message)
+
+
+# Returns the sids of the main document species by the sid of the species of the model, matched by name
+def species_map(enzymeml, model):
+    names = dict()
+    for sp in enzymeml.get_model().getListOfSpecies():
+        names.setdefault(sp.getName(), sp.getId())
+    return {sp.getId(): names[sp.getName()] for sp in model.get_model().getListOfSpecies() if sp.getName() in names}
+
+
+# Simulates the model for the measurements of the document at their time points. The initial condition of a
+# species is the mean of its columns at the first time point, else its initial concentration in the document.
+# Returns measurement sid -> (time, {document species sid: series})
+def simulate_measurements(enzymeml, model, measurements=None, parameters=None, method="BDF"):
+    if measurements is None:
+        reaction_data = enzymeml.get_reaction_data()
+        measurements = list() if reaction_data is None else list(reaction_data.listOfMeasurements.measurements)
+
+    system = OdeSystem(model)
+    mapping = species_map(enzymeml, model)
+    main = enzymeml.get_model()
+
+    times = list()
+    starts = list()
+    initial = {sid: list() for sid in system.species + system.constants}
+    for sid in measurements:
+        m = data.get_measurement(enzymeml, sid)
+        if m.time is None:
+            raise RuntimeError("The measurement '%s' has no time column." % enzml._get_id(sid))
+        times.append(m.time[~np.isnan(m.time)])
+        starts.append(np.nanmin(m.time))
+
+        first = np.nanargmin(m.time)
+        measured_species = m.species()
+        for msid in initial:
+            dsid = mapping.get(msid)
+            idx = [i for i, s in enumerate(measured_species) if s == dsid]
+            value = np.nanmean(m.values[first, idx]) if len(idx) > 0 else np.nan
+            if np.isnan(value):
+                sp = main.getSpecies(dsid) if dsid is not None else None
+                value = sp.getInitialConcentration() if sp is not None and sp.isSetInitialConcentration() \
+                    else system.default_initial()[msid]
+            initial[msid].append(value)
+
+    if len(times) == 0:
+        return dict()
+
+    # every measurement starts at its first time point
+    grid = np.unique(np.concatenate([t - start for t, start in zip(times, starts)]))
+    sim = simulate(model, initial, grid, parameters, method, system, t0=0.0)
+
+    result = dict()
+    for b, (sid, t, start) in enumerate(zip(measurements, times, starts)):
+        idx = np.searchsorted(grid, t - start)
+        result[enzml._get_id(sid)] = (t, {mapping.get(s, s): sim.values[b, i, idx] for i, s in enumerate(sim.species)})
+    return result
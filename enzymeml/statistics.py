@@ -0,0 +1,133 @@
+"""
+Statistics across the replicas of a species.
+
+The replica columns of a species (optionally only those linked to a reaction by EnzymeMLReaction.replicas) are
+gathered into one (time points x replicas) array, measurements with different time points are aligned first.
+Mean, standard deviation, standard error, confidence interval and coefficient of variation are computed per time
+point, missing values are ignored. The results are cached on the document until its data changes.
+"""
+import weakref
+import numpy as np
+import scipy.stats
+import enzymeml.enzymeml as enzml
+import enzymeml.alignment as alignment
+
+
+# Aggregated series of the replicas of a species. All arrays are read-only and have one value per time point.
+class ReplicaStatistics:
+    def __init__(self, species, data, confidence):
+        self.species = species
+        self.confidence = confidence
+        self.time = np.array(data.time)  # a copy, the grid may be an array of the caller
+        self.time_unit = data.time_unit
+        self.values = data.values  # (time points x replicas)
+        self.labels = data.labels()
+
+        values = self.values
+        valid = ~np.isnan(values)
+        self.count = valid.sum(axis=1)
+        n = self.count.astype(float)
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self.mean = np.where(valid, values, 0.0).sum(axis=1) / n
+            dev = np.where(valid, values - self.mean[:, None], 0.0)
+            self.std = np.sqrt((dev * dev).sum(axis=1) / (n - 1))
+            self.std[self.count < 2] = np.nan
+            self.sem = self.std / np.sqrt(n)
+            self.cv = self.std / np.abs(self.mean)
+
+            half = scipy.stats.t.ppf((1 + confidence) / 2, np.maximum(self.count - 1, 1)) * self.sem
+        self.ci_lower = self.mean - half
+        self.ci_upper = self.mean + half
+
+        for arr in (self.time, self.values, self.count, self.mean, self.std, self.sem, self.cv, self.ci_lower,
+                    self.ci_upper):
+            arr.flags.writeable = False
+
+    def nreplicas(self):
+        return self.values.shape[1]
+
+
+_caches = weakref.WeakKeyDictionary()
+
+
+# The state of the data of a document: the csv revisions, the measurements and the replicas of the reactions
+def _data_state(enzymeml):
+    state = [(id(csv), csv.location, csv.revision) for csv in enzymeml.csvs]
+
+    data = enzymeml.get_reaction_data()
+    if data is not None:
+        for sid, m in data.listOfMeasurements.measurements.items():
+            state.append((sid, enzml._get_id(m.file), m.start, m.stop))
+        for sid, f in data.listOfFiles.files.items():
+            state.append((sid, f.location, enzml._get_id(f.format)))
+
+    for sid, cond in enzymeml.reaction_condition.items():
+        state.append((sid, tuple((enzml._get_id(r.measurement), enzml._get_id(r.replica)) for r in cond.replicas)))
+
+    return tuple(state)
+
+
+def _cache(enzymeml):
+    state = _data_state(enzymeml)
+    cache = _caches.get(enzymeml)
+    if cache is None or cache[0] != state:
+        cache = (state, dict())
+        _caches[enzymeml] = cache
+    return cache[1]
+
+
+# Returns the measurement sids with columns of the species. If a reaction is given, only the measurements of its
+# replicas, together with the (measurement, replica) pairs to keep.
+def _replica_columns(enzymeml, species, reaction):
+    if reaction is not None:
+        cond = enzymeml.get_reaction_cond(enzml._get_id(reaction))
+        if cond is None:
+            raise RuntimeError("The reaction '%s' has no reaction conditions." % enzml._get_id(reaction))
+        pairs = {(enzml._get_id(r.measurement), enzml._get_id(r.replica)) for r in cond.replicas}
+        measurements = list(dict.fromkeys(m for m, _ in pairs))
+        return measurements, pairs
+
+    data = enzymeml.get_reaction_data()
+    if data is None:
+        return list(), None
+
+    measurements = list()
+    for sid, m in data.listOfMeasurements.measurements.items():
+        form = data.listOfFormats.formats.get(enzml._get_id(data.listOfFiles.files[enzml._get_id(m.file)].format))
+        if form is None or any(type(c) is enzml.EnzymeMLColumnConcentration and enzml._get_id(c.species) == species
+                               for c in form.columns):
+            measurements.append(sid)
+    return measurements, None
+
+
+# Gathers the replica columns of a species into an AlignedData (time points x replicas)
+# reaction: only the replicas linked to the reaction | grid, tolerance: see alignment.align
+# unit: converts the concentrations into this unit
+def gather(enzymeml, species, reaction=None, grid=alignment.GRID_UNION, tolerance=0.0, unit=None):
+    species = enzml._get_id(species)
+    measurements, pairs = _replica_columns(enzymeml, species, reaction)
+
+    aligned = alignment.align(enzymeml, measurements, grid=grid, tolerance=tolerance, species=species, unit=unit)
+    if pairs is None:
+        return aligned
+
+    keep = [i for i, (m, c) in enumerate(zip(aligned.measurements, aligned.columns))
+            if (enzml._get_id(m), enzml._get_id(c.replica)) in pairs]
+    return alignment.AlignedData(aligned.time, aligned.values[:, keep], [aligned.columns[i] for i in keep],
+                                 [aligned.measurements[i] for i in keep], aligned.time_unit)
+
+
+# Returns the ReplicaStatistics of a species. See gather for the arguments.
+def replica_statistics(enzymeml, species, reaction=None, confidence=0.95, grid=alignment.GRID_UNION,
+                       tolerance=0.0, unit=None):
+    key = (enzml._get_id(species), enzml._get_id(reaction), confidence,
+           grid if isinstance(grid, str) else tuple(np.asarray(grid, dtype=float)), tolerance, unit)
+    cache = _cache(enzymeml)
+
+    stats = cache.get(key)
+    if stats is None:
+        data = gather(enzymeml, species, reaction, grid, tolerance, unit)
+        stats = ReplicaStatistics(enzml._get_id(species), data, confidence)
+        cache[key] = stats
+    return stats
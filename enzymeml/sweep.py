@@ -0,0 +1,188 @@
+"""
+Parameter sweeps of kinetic models over condition grids.
+
+A grid is the cartesian product of axes: initial concentrations of species (e.g. the substrate or the enzyme, an
+SBO_ENZYME species), or parameters of the kinetic laws. All grid points are either evaluated (the reaction rates
+at the initial conditions) or simulated at the given times (see enzymeml.simulation). The grid is processed in
+chunks of points, every chunk is one vectorized evaluation or one batched simulation, optionally in worker
+processes. The results are written chunk by chunk into a .npy file opened as memory map, so large grids do not
+have to fit into memory.
+
+If an enzyme axis is not a symbol of the kinetic laws, the rates are scaled by the enzyme loading relative to the
+initial enzyme concentration of the model.
+"""
+import json
+import concurrent.futures
+import numpy as np
+import libsbml as sbml
+import enzymeml.enzymeml as enzml
+import enzymeml.ontologymanager as ontology
+import enzymeml.simulation as simulation
+
+MODE_EVALUATE = "evaluate"
+MODE_SIMULATE = "simulate"
+
+
+# A model read from a SBML string, used to send models to worker processes
+class _SbmlModel:
+    def __init__(self, sbmlstring):
+        self.sbmldoc = sbml.readSBMLFromString(sbmlstring)
+
+    def get_model(self):
+        return self.sbmldoc.getModel()
+
+
+# Returns the sids of the enzymes (SBO_ENZYME) of the model
+def enzymes(model):
+    return [sp.getId() for sp in model.get_model().getListOfSpecies() if sp.getSBOTerm() == ontology.SBO_ENZYME]
+
+
+class SweepResult:
+    def __init__(self, axes, times, outputs, values, location=None):
+        self.axes = axes  # list of (sid, values)
+        self.times = times  # None for MODE_EVALUATE
+        self.outputs = outputs  # species (simulate) or reaction (evaluate) sids
+        self.values = values  # grid shape + (outputs,) [+ (times,)]
+        self.location = location
+
+    def shape(self):
+        return tuple(len(v) for _, v in self.axes)
+
+    # Returns the values of an output (species or reaction sid), shape: grid shape [+ (times,)]
+    def get(self, sid):
+        return self.values[(Ellipsis, self.outputs.index(enzml._get_id(sid))) + ((slice(None),)
+                                                                                 if self.times is not None else ())]
+
+
+# Returns the axis values of the grid points start..stop
+def _points(axes, start, stop):
+    shape = tuple(len(v) for _, v in axes)
+    index = np.unravel_index(np.arange(start, stop), shape)
+    return {sid: np.asarray(values, dtype=float)[i] for (sid, values), i in zip(axes, index)}
+
+
+def _run_chunk(model, axes, times, mode, parameters, start, stop, location=None, dtype=None, method="BDF"):
+    if isinstance(model, str):
+        model = _SbmlModel(model)
+
+    system = simulation.OdeSystem(model)
+    points = _points(axes, start, stop)
+    symbols = {s for law in system.laws.values() for s in law.symbols}
+
+    # enzyme loadings which are not part of the kinetic laws scale the rates
+    scale = None
+    defaults = system.default_initial()
+    sbmlmodel = model.get_model()
+    for sid in enzymes(model):
+        if sid in points and sid not in symbols:
+            sp = sbmlmodel.getSpecies(sid)
+            reference = sp.getInitialConcentration() if sp.isSetInitialConcentration() and \
+                sp.getInitialConcentration() > 0 else 1.0
+            factor = points.pop(sid) / reference
+            scale = factor if scale is None else scale * factor
+
+    initial = {sid: np.broadcast_to(points.get(sid, v), (stop - start,)) for sid, v in defaults.items()}
+    params = dict(parameters)
+    params.update({sid: v for sid, v in points.items() if sid not in defaults})
+
+    if mode == MODE_EVALUATE:
+        values = dict(initial, time=0.0)
+        per_reaction = system.reaction_parameters(params)
+        out = np.empty((stop - start, len(system.reactions)))
+        for j, sid in enumerate(system.reactions):
+            out[:, j] = system.laws[sid](values, **per_reaction[sid])
+        if scale is not None:
+            out *= scale[:, None]
+    else:
+        batch_params = {k: (v[:, None] if np.ndim(v) > 0 else v) for k, v in params.items()}
+        sim = simulation.simulate(model, initial, times, batch_params, method, system, scale=scale)
+        if not sim.success:
+            raise RuntimeError("The simulation of the grid points %i to %i failed: %s" % (start, stop, sim.message))
+        out = sim.values
+
+    if location is not None:
+        store = np.load(location, mmap_mode="r+")
+        store[start:stop] = out
+        store.flush()
+        del store
+        return None
+    return out.astype(dtype) if dtype is not None else out
+
+
+def _outputs(model, mode):
+    system = simulation.OdeSystem(model)
+    return list(system.reactions) if mode == MODE_EVALUATE else list(system.species)
+
+
+# Evaluates (MODE_EVALUATE) or simulates (MODE_SIMULATE at the times) the model (EnzymeML or EnzymeMLModel) at all
+# points of the grid. axes: list of (sid, values) of species or parameters | parameters: fixed parameter values
+# location: .npy file for the results (default: in memory) | processes: number of worker processes
+def sweep(model, axes, times=None, mode=MODE_SIMULATE, parameters=None, location=None, chunk_size=4096,
+          processes=None, dtype=np.float32, method="BDF"):
+    axes = [(enzml._get_id(sid), np.asarray(values, dtype=float)) for sid, values in
+            (axes.items() if isinstance(axes, dict) else axes)]
+    parameters = dict() if parameters is None else parameters
+    if mode == MODE_SIMULATE:
+        if times is None:
+            raise ValueError("A simulation needs the time points.")
+        times = np.asarray(times, dtype=float)
+    else:
+        times = None
+
+    outputs = _outputs(model, mode)
+    npoints = int(np.prod([len(v) for _, v in axes]))
+    shape = (npoints, len(outputs)) + ((len(times),) if times is not None else ())
+
+    if location is not None:
+        store = np.lib.format.open_memmap(location, mode="w+", dtype=dtype, shape=shape)
+        del store
+        values = None
+    else:
+        values = np.empty(shape, dtype=dtype)
+
+    chunks = [(start, min(start + chunk_size, npoints)) for start in range(0, npoints, chunk_size)]
+
+    if processes is not None and processes > 1:
+        sbmlstring = sbml.writeSBMLToString(model.get_model().getSBMLDocument())
+        with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+            futures = {executor.submit(_run_chunk, sbmlstring, axes, times, mode, parameters, start, stop, location,
+                                       dtype, method): (start, stop) for start, stop in chunks}
+            for future in concurrent.futures.as_completed(futures):
+                out = future.result()
+                if values is not None:
+                    start, stop = futures[future]
+                    values[start:stop] = out
+    else:
+        for start, stop in chunks:
+            out = _run_chunk(model, axes, times, mode, parameters, start, stop, location, dtype, method)
+            if values is not None:
+                values[start:stop] = out
+
+    if location is not None:
+        _write_meta(location, axes, times, outputs)
+        values = np.load(location, mmap_mode="r")
+
+    grid = tuple(len(v) for _, v in axes)
+    return SweepResult(axes, times, outputs, values.reshape(grid + shape[1:]), location)
+
+
+def _write_meta(location, axes, times, outputs):
+    meta = {
+        "axes": [[sid, values.tolist()] for sid, values in axes],
+        "times": None if times is None else times.tolist(),
+        "outputs": outputs
+    }
+    with open("%s.json" % location, "w") as f:
+        json.dump(meta, f)
+
+
+# Opens the results of a sweep written to location as read-only memory map
+def load(location):
+    with open("%s.json" % location) as f:
+        meta = json.load(f)
+
+    axes = [(sid, np.array(values)) for sid, values in meta["axes"]]
+    times = None if meta["times"] is None else np.array(meta["times"])
+    values = np.load(location, mmap_mode="r")
+    grid = tuple(len(v) for _, v in axes)
+    return SweepResult(axes, times, meta["outputs"], values.reshape(grid + values.shape[1:]), location)
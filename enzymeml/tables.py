@@ -1,73 +1,181 @@
+import numpy as np
+
 
 class Table:
     def __init__(self):
         pass
 
 
+# A table whose rows are identified by the value of the dependent column (e.g. the time). Every column is stored
+# as a contiguous float array in insertion order, missing values are NaN. The sorted order of the dependent values
+# is kept as an index array, which is extended on appends in ascending order and only rebuilt otherwise.
 class ColumnDependentTable:
-    class Entry:
-        def __init__(self, dependent):
-            self.dependent = dependent
-            self.values = dict()
-
-        def set(self, col, value):
-            self.values[col] = value
-
-        def __getitem__(self, item):
-            if item in self.values:
-                return self.values[item]
-            else:
-                return None
-
-    def __init__(self, dependent):
-        self.dependent = dict()
+    def __init__(self, dependent, capacity=16):
         self.columns = list()
         self.columns.append(dependent)
 
-    def add(self, dependentvalue, col, value):
+        self._n = 0
+        self._keys = np.empty(capacity)
+        self._values = list()
+        self._order = np.empty(capacity, dtype=np.intp)
+        self._sorted = None  # The sorted dependent values, if the insertion order is not sorted
+        self._identity = True  # The insertion order is sorted
+        self._cache = None
+
+    def _reserve(self, n):
+        capacity = len(self._keys)
+        if n <= capacity:
+            return
+
+        capacity = max(capacity, 1)
+        while capacity < n:
+            capacity *= 2
+
+        self._keys = np.resize(self._keys, capacity)
+        self._order = np.resize(self._order, capacity)
+        if self._sorted is not None:
+            self._sorted = np.resize(self._sorted, capacity)
+        for i in range(len(self._values)):
+            values = np.full(capacity, np.nan)
+            values[:self._n] = self._values[i][:self._n]
+            self._values[i] = values
+
+    def _column(self, col):
         if col not in self.columns:
             raise RuntimeError("Unknown Column (%s) is not initialized." % col)
-        if dependentvalue not in self.dependent:
-            self.dependent[dependentvalue] = ColumnDependentTable.Entry(dependentvalue)
-            self.dependent[dependentvalue].set(self.columns[0], dependentvalue)
-        dependent = self.dependent[dependentvalue]
-        dependent.set(col, value)
+        return self.columns.index(col)
+
+    def _sorted_keys(self):
+        return self._keys[:self._n] if self._identity else self._sorted[:self._n]
+
+    def _unsorted(self):
+        if self._identity:
+            self._sorted = self._keys.copy()
+            self._identity = False
+
+    # Returns the row of the dependent value or -1
+    def _find(self, dependentvalue):
+        keys = self._sorted_keys()
+        i = np.searchsorted(keys, dependentvalue)
+        if i < self._n and keys[i] == dependentvalue:
+            return i if self._identity else self._order[i]
+        return -1
+
+    def _insert_key(self, dependentvalue):
+        row = self._n
+        self._reserve(row + 1)
+        self._keys[row] = dependentvalue
+        for values in self._values:
+            values[row] = np.nan
+
+        if self._identity and (row == 0 or self._keys[row - 1] < dependentvalue):
+            self._order[row] = row
+        else:
+            self._unsorted()
+            pos = np.searchsorted(self._sorted[:row], dependentvalue)
+            self._order[pos + 1:row + 1] = self._order[pos:row]
+            self._order[pos] = row
+            self._sorted[pos + 1:row + 1] = self._sorted[pos:row]
+            self._sorted[pos] = dependentvalue
+
+        self._n += 1
+        return row
+
+    def add(self, dependentvalue, col, value):
+        c = self._column(col)
+        row = self._find(dependentvalue)
+        if row < 0:
+            row = self._insert_key(dependentvalue)
+
+        if c > 0:
+            self._values[c - 1][row] = value
+        self._cache = None
+
+    # Adds the values of a column at once. Existing dependent values are overwritten, new ones are appended.
+    def add_many(self, dependentvalues, col, values):
+        c = self._column(col)
+        dependentvalues = np.asarray(dependentvalues, dtype=float)
+        values = np.asarray(values, dtype=float)
+        if dependentvalues.shape != values.shape:
+            raise ValueError("The dependent values and the values differ in length.")
+
+        # the last value of duplicates wins
+        dependentvalues, last = np.unique(dependentvalues[::-1], return_index=True)
+        values = values[::-1][last]
+
+        rows = np.empty(len(dependentvalues), dtype=np.intp)
+        keys = self._sorted_keys()
+        pos = np.searchsorted(keys, dependentvalues)
+        found = pos < self._n
+        found[found] = keys[pos[found]] == dependentvalues[found]
+        existing = pos[found]
+        rows[found] = existing if self._identity else self._order[existing]
+
+        new = ~found
+        count = int(new.sum())
+        if count > 0:
+            start = self._n
+            self._reserve(start + count)
+            self._keys[start:start + count] = dependentvalues[new]
+            for v in self._values:
+                v[start:start + count] = np.nan
+            rows[new] = np.arange(start, start + count)
+
+            appended = self._identity and (start == 0 or self._keys[start - 1] < dependentvalues[new][0])
+            self._n += count
+            if appended:
+                self._order[start:self._n] = np.arange(start, self._n)
+            else:
+                self._unsorted()
+                self._order[:self._n] = np.argsort(self._keys[:self._n], kind="stable")
+                self._sorted[:self._n] = self._keys[self._order[:self._n]]
+
+        if c > 0:
+            self._values[c - 1][rows] = values
+        self._cache = None
 
     def init_column(self, name):
         self.columns.append(name)
+        self._values.append(np.full(len(self._keys), np.nan))
+        self._cache = None
 
     def ncolumns(self):
         return len(self.columns)
 
     def nrows(self):
-        return len(self.dependent.keys())
+        return self._n
 
+    # The sorted dependent values
     def keys(self):
-        return sorted(self.dependent.keys())
+        return self.as_columns()[0]
 
+    # Returns one read-only array per column in the order of the dependent values. If the values were added in
+    # ascending order, the arrays are views of the table without copies, valid until the table is changed.
     def as_columns(self):
-        cols = list()
-
-        for scol in self.columns:
-            col = list()
-            for k in self.keys():
-                col.append(self.dependent[k][scol])
-
-            cols.append(col)
+        if self._cache is None:
+            n = self._n
+            if self._identity:
+                cols = [self._keys[:n]] + [v[:n] for v in self._values]
+            else:
+                order = self._order[:n]
+                cols = [self._sorted[:n].copy()] + [v[order] for v in self._values]
+            for c in cols:
+                c.flags.writeable = False
+            self._cache = cols
 
-        return cols
+        return self._cache
 
     # Return a row of the items
     def __getitem__(self, item):
-        li = list()
-
-        dep = self.dependent[item]
-
-        for col in self.columns:
-            li.append(dep[col])
+        row = self._find(item)
+        if row < 0:
+            raise KeyError(item)
 
+        li = list()
+        li.append(self._keys[row])
+        for values in self._values:
+            li.append(values[row])
         return li
 
     def __len__(self):
-        return len(self.dependent) * self.columns
-
+        return self._n * len(self.columns)
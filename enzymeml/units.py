@@ -0,0 +1,409 @@
+"""
+Unit handling of EnzymeML documents.
+
+Unit strings like "mmol/l", "umol/(l*s)", "mM" or "1/min" are parsed into SBML unit components
+(kind, exponent, scale, multiplier). Units are identified by their canonical key, the exponents of the base kinds
+plus the overall factor, so "mM" and "mmol/l" share one UnitDefinition per document. The registry of a document is
+released together with the document.
+"""
+import libsbml as sbml
+import enzymeml.enzymemlkey as key
+import functools
+import re
+import weakref
+import numpy as np
+import enzymeml.data as data
+
+
+class UnitParseError(ValueError):
+    """
+    This error occurs, if a unit string cannot be parsed
+    unit - the unit string
+    """
+    def __init__(self, unit, reason):
+        super(UnitParseError, self).__init__("The unit '%s' could not be parsed: %s" % (unit, reason))
+        self.unit = unit
+
+
+# symbol: list[(kind, exponent, scale, multiplier)]
+BASE_UNITS = {
+    "mol": [(sbml.UNIT_KIND_MOLE, 1, 0, 1.0)],
+    "l": [(sbml.UNIT_KIND_LITRE, 1, 0, 1.0)],
+    "L": [(sbml.UNIT_KIND_LITRE, 1, 0, 1.0)],
+    "M": [(sbml.UNIT_KIND_MOLE, 1, 0, 1.0), (sbml.UNIT_KIND_LITRE, -1, 0, 1.0)],
+    "g": [(sbml.UNIT_KIND_GRAM, 1, 0, 1.0)],
+    "m": [(sbml.UNIT_KIND_METRE, 1, 0, 1.0)],
+    "s": [(sbml.UNIT_KIND_SECOND, 1, 0, 1.0)],
+    "min": [(sbml.UNIT_KIND_SECOND, 1, 0, 60.0)],
+    "h": [(sbml.UNIT_KIND_SECOND, 1, 0, 3600.0)],
+    "K": [(sbml.UNIT_KIND_KELVIN, 1, 0, 1.0)],
+    "Pa": [(sbml.UNIT_KIND_PASCAL, 1, 0, 1.0)],
+    "bar": [(sbml.UNIT_KIND_PASCAL, 1, 5, 1.0)],
+    "Hz": [(sbml.UNIT_KIND_HERTZ, 1, 0, 1.0)],
+    "rpm": [(sbml.UNIT_KIND_SECOND, -1, 0, 60.0)],
+    "%": [(sbml.UNIT_KIND_DIMENSIONLESS, 1, -2, 1.0)],
+    "1": [],
+}
+
+UNIT_ALIASES = {
+    "mole": "mol", "litre": "l", "liter": "l", "gram": "g", "metre": "m", "meter": "m",
+    "second": "s", "seconds": "s", "sec": "s", "minute": "min", "minutes": "min", "hour": "h", "hours": "h",
+    "kelvin": "K", "pascal": "Pa", "hertz": "Hz", "percent": "%", "dimensionless": "1",
+}
+
+PREFIXES = {"p": -12, "n": -9, "u": -6, "µ": -6, "μ": -6, "m": -3, "c": -2, "d": -1, "k": 3}
+
+PREFIXABLE = ("mol", "l", "L", "M", "g", "m", "s", "Pa", "Hz")
+
+# symbol, name, ontology uri of the units annotated when they are created
+KNOWN_UNITS = [
+    ("%", "percent", "https://identifiers.org/UO:0000187"),
+    ("ms", "millisecond", "https://identifiers.org/UO:0000028"),
+    ("min", "minute", "https://identifiers.org/UO:0000031"),
+    ("h", "hour", "https://identifiers.org/UO:0000032"),
+    ("mol/l", "mol/l", "https://identifiers.org/UO:0000062"),
+    ("mmol/l", "mmol/l", "https://identifiers.org/UO:0000063"),
+    ("umol/l", "umol/l", "https://identifiers.org/UO:0000064"),
+    ("nmol/l", "nmol/l", "https://identifiers.org/UO:0000065"),
+    ("mol", "mol", "https://identifiers.org/UO:0000013"),
+    ("mmol", "mmol", "https://identifiers.org/UO:0000040"),
+    ("umol", "umol", "https://identifiers.org/UO:0000039"),
+    ("nmol", "nmol", "https://identifiers.org/UO:0000041"),
+    ("ml", "millilitre", "https://identifiers.org/UO:0000098"),
+    ("ul", "microlitre", "https://identifiers.org/UO:0000101"),
+    ("rpm", "revolution/min", "https://identifiers.org/NCIT:C70469"),
+]
+
+_TOKEN = re.compile(r"\s*(\*\*|\^|\(|\)|\*|/|·|-?\d+(?=\s*$|\s*[)*/·^])|[^\s()*/^·]+)")
+
+
+def _symbol(unit, sym):
+    sym = UNIT_ALIASES.get(sym, sym)
+    if sym in BASE_UNITS:
+        return BASE_UNITS[sym]
+
+    if len(sym) > 1 and sym[0] in PREFIXES and sym[1:] in PREFIXABLE:
+        base = BASE_UNITS[sym[1:]]
+        kind, exponent, scale, multiplier = base[0]
+        return [(kind, exponent, scale + PREFIXES[sym[0]], multiplier)] + base[1:]
+
+    raise UnitParseError(unit, "unknown symbol '%s'" % sym)
+
+
+class _Parser:
+    def __init__(self, unit):
+        self.unit = unit
+        self.tokens = [t for t in _TOKEN.findall(unit)]
+        if "".join(self.tokens) != re.sub(r"\s", "", unit):
+            raise UnitParseError(unit, "invalid characters")
+        self.pos = 0
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self):
+        t = self.peek()
+        self.pos += 1
+        return t
+
+    # expr := term (('*' | '/' | '·') term)*
+    def expr(self):
+        comps = self.term()
+        while self.peek() in ("*", "/", "·"):
+            op = self.next()
+            right = self.term()
+            if op == "/":
+                right = [(k, -e, s, m) for k, e, s, m in right]
+            comps = comps + right
+        return comps
+
+    # term := factor (('^' | '**') int)?
+    def term(self):
+        comps = self.factor()
+        if self.peek() in ("^", "**"):
+            self.next()
+            exp = self.next()
+            try:
+                exp = int(exp)
+            except (TypeError, ValueError):
+                raise UnitParseError(self.unit, "invalid exponent '%s'" % exp)
+            comps = [(k, e * exp, s, m) for k, e, s, m in comps]
+        return comps
+
+    # factor := '(' expr ')' | symbol
+    def factor(self):
+        t = self.next()
+        if t is None:
+            raise UnitParseError(self.unit, "unexpected end")
+        if t == "(":
+            comps = self.expr()
+            if self.next() != ")":
+                raise UnitParseError(self.unit, "missing ')'")
+            return comps
+        if t in (")", "*", "/", "^", "**", "·"):
+            raise UnitParseError(self.unit, "unexpected '%s'" % t)
+        return _symbol(self.unit, t)
+
+    def parse(self):
+        comps = self.expr()
+        if self.peek() is not None:
+            raise UnitParseError(self.unit, "unexpected '%s'" % self.peek())
+        return comps
+
+
+# Parses a unit string into a tuple of (kind, exponent, scale, multiplier). Components of the same kind with the
+# same scale and multiplier are merged.
+@functools.lru_cache(maxsize=1024)
+def parse_unit(unit):
+    if unit is None or str(unit).strip() == "":
+        raise UnitParseError(unit, "empty unit")
+
+    merged = list()
+    for kind, exponent, scale, multiplier in _Parser(str(unit)).parse():
+        for i in range(len(merged)):
+            k, e, s, m = merged[i]
+            if k == kind and s == scale and m == multiplier:
+                merged[i] = (k, e + exponent, s, m)
+                break
+        else:
+            merged.append((kind, exponent, scale, multiplier))
+
+    return tuple(c for c in merged if c[1] != 0)
+
+
+def _round(value):
+    return float("%.12g" % value)
+
+
+# The overall factor of unit components relative to the base kinds, not rounded
+def _factor(components):
+    factor = 1.0
+    for kind, exponent, scale, multiplier in components:
+        factor *= (multiplier * 10.0 ** scale) ** exponent
+    return factor
+
+
+# The canonical key of unit components: ((kind, exponent), ...) of the base kinds and the overall factor
+def unit_key(components):
+    exponents = dict()
+    for kind, exponent, scale, multiplier in components:
+        if kind != sbml.UNIT_KIND_DIMENSIONLESS:
+            exponents[kind] = exponents.get(kind, 0) + exponent
+
+    return tuple(sorted((k, e) for k, e in exponents.items() if e != 0)), _round(_factor(components))
+
+
+def definition_components(unit_def):
+    return tuple((u.getKind(), u.getExponentAsDouble(), u.getScale(), u.getMultiplier())
+                 for u in unit_def.getListOfUnits())
+
+
+def definition_key(unit_def):
+    return unit_key(definition_components(unit_def))
+
+
+@functools.lru_cache(maxsize=None)
+def _known_units():
+    known = dict()
+    for sym, name, uri in KNOWN_UNITS:
+        known[unit_key(parse_unit(sym))] = (name, uri)
+    return known
+
+
+# The unit definitions of one document by their canonical key. Existing unit definitions are reused.
+class UnitRegistry:
+    def __init__(self, enzymeml):
+        self.by_key = dict()
+        self.by_name = dict()
+
+        for unit_def in enzymeml.get_model().getListOfUnitDefinitions():
+            meta = unit_def.getMetaId() if unit_def.isSetMetaId() else None
+            self.by_key.setdefault(definition_key(unit_def), (unit_def.getId(), meta))
+
+    def get(self, enzymeml, name):
+        if name in self.by_name:
+            return self.by_name[name]
+
+        self.by_name[name] = self.get_components(enzymeml, name, parse_unit(name))
+        return self.by_name[name]
+
+    def get_components(self, enzymeml, name, components):
+        ukey = unit_key(components)
+
+        if ukey not in self.by_key:
+            self.by_key[ukey] = self._create(enzymeml, name, components, ukey)
+
+        return self.by_key[ukey]
+
+    @staticmethod
+    def _create(enzymeml, name, components, ukey):
+        # Plain base units are referenced by their kind
+        if len(components) == 1 and components[0][1:] == (1, 0, 1.0):
+            return components[0][0]
+
+        known = _known_units().get(ukey)
+        un = enzymeml.add(key.MAIN_UNIT, {
+            "name": name if known is None else known[0],
+            "units": [{"kind": k, "exponent": e, "scale": s, "multiplier": m} for k, e, s, m in components]
+        })
+
+        if known is not None:
+            enzymeml.add(key.MAIN_UNIT_IS, known[1], un)
+
+        return un
+
+
+_registries = weakref.WeakKeyDictionary()
+
+
+def get_registry(enzymeml):
+    registry = _registries.get(enzymeml)
+    if registry is None:
+        registry = UnitRegistry(enzymeml)
+        _registries[enzymeml] = registry
+    return registry
+
+
+# Returns the unit id (sid, metaid) or the unit kind of the unit string in the document (EnzymeML or EnzymeMLModel).
+# Equal units are created once per document. Raises UnitParseError for unknown units.
+def get_unit(enzymeml, name):
+    return get_registry(enzymeml).get(enzymeml, name)
+
+
+def _unit_name(model, unit):
+    if type(unit) is tuple:
+        unit = unit[0]
+    if type(unit) is int:
+        return sbml.UnitKind_toString(unit)
+
+    unit_def = model.getUnitDefinition(str(unit))
+    if unit_def is not None and unit_def.isSetName():
+        return unit_def.getName()
+    return str(unit)
+
+
+# Returns the unit id of numerator/denominator (units of the document 'source') in the document enzymeml,
+# e.g. the unit of a rate from the concentration and the time unit. Without denominator the unit is copied.
+def get_quotient_unit(enzymeml, source, numerator, denominator=None):
+    model = source.get_model()
+    components = resolve_components(model, numerator)
+    name = _unit_name(model, numerator)
+    if denominator is not None:
+        components += tuple((k, -e, s, m) for k, e, s, m in resolve_components(model, denominator))
+        name = "%s/%s" % (name, _unit_name(model, denominator))
+    return get_registry(enzymeml).get_components(enzymeml, name, components)
+
+
+######################
+# Unit Conversion    #
+######################
+
+# Returns the unit components of a unit reference of the model: a unit definition id, a unit kind or a unit string
+def resolve_components(model, unit):
+    if hasattr(model, "get_model"):
+        model = model.get_model()
+
+    if type(unit) is tuple:
+        unit = unit[0]
+    if type(unit) is int:
+        return ((unit, 1, 0, 1.0),)
+
+    unit_def = model.getUnitDefinition(str(unit))
+    if unit_def is not None:
+        return definition_components(unit_def)
+
+    kind = sbml.UnitKind_forName(str(unit))
+    if kind != sbml.UNIT_KIND_INVALID:
+        return ((kind, 1, 0, 1.0),)
+
+    return parse_unit(str(unit))
+
+
+# Returns the factor converting values of unit 'source' into unit 'target'. Raises a ValueError if the dimensions
+# of the units differ.
+def conversion_factor(model, source, target):
+    source_components = resolve_components(model, source)
+    target_components = resolve_components(model, target)
+
+    if unit_key(source_components)[0] != unit_key(target_components)[0]:
+        raise ValueError("The unit '%s' cannot be converted into '%s'." % (source, target))
+
+    return _round(_factor(source_components) / _factor(target_components))
+
+
+# Converts the values (array-like) with one NumPy operation. 'out' may be the input array to convert in place.
+def convert(values, factor, out=None):
+    if out is None and np.isscalar(factor) and factor == 1.0:
+        return values
+    return np.multiply(values, factor, out=out)
+
+
+def _target_unit(enzymeml, unit):
+    if type(unit) is str and enzymeml.get_model().getUnitDefinition(unit) is None \
+            and sbml.UnitKind_forName(unit) == sbml.UNIT_KIND_INVALID:
+        return get_unit(enzymeml, unit)
+    return unit
+
+
+# The number of files of the document which use the format
+def _format_files(enzymeml, form):
+    reaction_data = enzymeml.get_reaction_data()
+    if reaction_data is None:
+        return 1
+
+    count = 0
+    for f in reaction_data.listOfFiles.get_files():
+        try:
+            count += data.get_format(enzymeml, f) is form
+        except RuntimeError:
+            continue
+    return count
+
+
+# Converts a column of a csv file of the document into 'unit' (unit id, kind or unit string; unknown unit strings
+# are added to the document). Returns the converted read-only array; if the unit does not change, it is the cached
+# column array itself. With inplace=True the column of the csv and the unit of the format column are replaced; a
+# format used by several files cannot be changed in place (ValueError).
+def convert_column(enzymeml, csv, index, unit, inplace=False):
+    form = data.get_format(enzymeml, csv)
+    column = None
+    for i, c in data.column_indices(form):
+        if i == index:
+            column = c
+            break
+
+    if column is None or not column.has_unit():
+        raise ValueError("The column %i of '%s' has no unit." % (index, csv.location))
+
+    unit = _target_unit(enzymeml, unit)
+    factor = conversion_factor(enzymeml, column.unit, unit)
+    if inplace and _format_files(enzymeml, form) > 1:
+        raise ValueError("The format '%s' of '%s' is used by other files and cannot be converted in place."
+                         % (form.sid, csv.location))
+
+    values = convert(data.column_array(csv, index), factor)
+
+    if inplace:
+        if factor != 1.0:
+            csv.set_column(index, values)
+        column.unit = unit
+        values = data.column_array(csv, index)
+
+    return values
+
+
+# Converts all concentration columns of a measurement into 'unit' and returns the MeasurementData. With
+# inplace=True the whole csv columns of the measurement are converted and the format is updated.
+def convert_measurement(enzymeml, sid, unit, inplace=False):
+    measured = data.get_measurement(enzymeml, sid)
+    unit = _target_unit(enzymeml, unit)
+    factors = np.array([conversion_factor(enzymeml, c.unit, unit) for c in measured.columns])
+
+    if inplace:
+        for index in measured.indices:
+            convert_column(enzymeml, measured.csv, index, unit, True)
+        return data.get_measurement(enzymeml, sid)
+
+    measured.values = convert(measured.values, factors, out=measured.values)
+    return measured
+
@@ -6,9 +6,12 @@ import pandas as pd
 import numpy as np
 import os
 from EnzymeML import EnzymeMLwriter
+import enzymeml.ontologymanager as ontology
 import numpy as np
 import json
+import logging
 
+_log = logging.getLogger(__name__)
 
 app = Flask(__name__)
 app.config["DEBUG"] = True
@@ -50,7 +53,7 @@ def transmission():
         
         
         df = pd.read_excel(request.files["filename"])
-        print(data)
+        _log.debug("Received form data %s", data)
         
       
 
@@ -85,12 +88,44 @@ def transmission():
      
     return render_template("TEEDtransmissionindex.html")
 
+_ontologies = None
+ONTOLOGY_SEARCH_LIMIT = 100
+
+
+# Autocompletion of the species names against the ontology database given by ENZYMEML_ONTOLOGY_DB
+@app.route("/ontology/<name>/search")
+def ontology_search(name):
+    global _ontologies
+
+    if _ontologies is None:
+        location = os.environ.get("ENZYMEML_ONTOLOGY_DB")
+        if not location:
+            return jsonify({"error": "No ontology database is configured (ENZYMEML_ONTOLOGY_DB)."}), 503
+        _ontologies = ontology.OntologyManager(ontology.SqliteOntologyLoader(), location)
+
+    try:
+        limit = int(request.args.get("limit", 10))
+    except ValueError:
+        return jsonify({"error": "The limit must be an integer."}), 400
+    if limit < 1:
+        return jsonify({"error": "The limit must be positive."}), 400
+
+    try:
+        matches = _ontologies.search(name, request.args.get("q", ""), request.args.get("mode", "prefix"),
+                                     min(limit, ONTOLOGY_SEARCH_LIMIT))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    return jsonify([{"name": m.name, "label": m.label, "score": m.score,
+                     "uri": ontology.ontology_list[name].to_uri(m.code["identifier"])
+                     if name in ontology.ontology_list else None} for m in matches])
+
 @app.route("/transmission/Auswertung", methods = ['GET','POST'])
 def Auswertung():
         
   
     values = input_values["data"]
-    print(values)
+    _log.debug("Evaluating %s", values)
 
     return render_template("Auswertung.html", values = values)
         
@@ -0,0 +1,48 @@
+import numpy as np
+import libsbml as sbml
+import pytest
+import enzymeml.enzymeml as enzml
+
+
+# Builds a document with the reaction substrate -> product of Michaelis-Menten progress curves, one csv (with its
+# own format) per initial substrate concentration. Returns the document, the reaction and the substrate sid.
+def build_document(rate=None, initial=(0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0), replicas=2, noise=0.0, seed=0,
+                   time=np.linspace(0, 0.1, 8), name="mm"):
+    rate = (lambda s: 2.0 * s / (0.5 + s)) if rate is None else rate
+    rng = np.random.default_rng(seed)
+
+    enzymeml = enzml.EnzymeML(name)
+    c = enzymeml.add(enzml.key.MAIN_COMPARTMENT, {"name": "vessel", "size": 1.0})
+    u = enzymeml.add(enzml.key.MAIN_UNIT, {"name": "mmol/l", "units": [
+        {"kind": sbml.UNIT_KIND_MOLE, "scale": -3}, {"kind": sbml.UNIT_KIND_LITRE, "exponent": -1}]})
+    s = enzymeml.add(enzml.key.MAIN_SPECIES, {"name": "pyruvate", "compartment": c, "init_conc": 1.0, "units": u})
+    p = enzymeml.add(enzml.key.MAIN_SPECIES, {"name": "lactate", "compartment": c, "init_conc": 0.0, "units": u})
+    enzyme = enzymeml.add(enzml.key.MAIN_SPECIES, {"name": "enzyme", "compartment": c, "init_conc": 1.0,
+                                                   "type": enzml.ontology.SBO_ENZYME})
+    r = enzymeml.add(enzml.key.MAIN_REACTION, {"name": "r", "reactants": [{"id": s, "stochiometry": 1}],
+                                               "products": [{"id": p, "stochiometry": 1}],
+                                               "modifier": [{"id": enzyme}]})
+    enzymeml.add(enzml.key.MAIN_REACTION_CONDITION, {"ph": 7.0, "temperature": (300.0, "kelvin")}, r)
+
+    for i, s0 in enumerate(initial):
+        form = enzml.EnzymeMLFormat()
+        enzymeml.add(enzml.key.MAIN_DATA_FORMAT, form)
+        csv = enzml.EnzymeMLCSV(form, name="D%i" % i)
+        enzymeml.add_csv(csv)
+        fid = enzymeml.add(enzml.key.MAIN_DATA_FILE, {"file": csv.location, "format": form.sid})
+        form.add_column(enzml.create_column(enzml.COLUMN_TYPE_TIME, "second"))
+        csv.add_column(list(time))
+        m = enzymeml.add(enzml.key.MAIN_DATA_MEASUREMENTS, {"file": fid, "start": 0, "stop": -1, "name": "m%i" % i})
+        v = rate(s0)
+        for _ in range(replicas):
+            col = enzml.create_column(enzml.COLUMN_TYPE_CONCENTRATION, s, u)
+            form.add_column(col)
+            csv.add_column(list(s0 - v * time * (1 + noise * rng.standard_normal())))
+            enzymeml.add(enzml.key.MAIN_REACTION_REPLICAS, enzml.EnzymeMLReplica(m, col.replica), r)
+
+    return enzymeml, r, s
+
+
+@pytest.fixture
+def document():
+    return build_document
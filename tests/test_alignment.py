@@ -0,0 +1,23 @@
+import numpy as np
+import enzymeml.alignment as alignment
+
+
+def test_interpolate_linear():
+    out = alignment.interpolate(np.array([0.0, 1.0, 2.0]), np.array([[0.0, 10.0], [1.0, 20.0], [2.0, 30.0]]),
+                                np.array([-1.0, 0.5, 1.5, 3.0]))
+    assert np.isnan(out[0]).all() and np.isnan(out[3]).all()
+    assert np.allclose(out[1:3], [[0.5, 15.0], [1.5, 25.0]])
+
+
+def test_interpolate_missing_cell():
+    out = alignment.interpolate(np.array([0.0, 1.0, 2.0]), np.array([[0.0, 0.0], [np.nan, 1.0], [2.0, 2.0]]),
+                                np.array([0.0, 0.5, 1.0, 1.5, 2.0]))
+    # the column with the missing cell is interpolated over its finite values only
+    assert np.allclose(out[:, 0], [0.0, 0.5, 1.0, 1.5, 2.0])
+    assert np.allclose(out[:, 1], [0.0, 0.5, 1.0, 1.5, 2.0])
+
+
+def test_interpolate_nearest_missing_cell():
+    out = alignment.interpolate(np.array([0.0, 1.0, 2.0]), np.array([[0.0], [np.nan], [2.0]]),
+                                np.array([0.0, 0.9, 1.1, 2.0]), alignment.INTERPOLATION_NEAREST)
+    assert np.allclose(out[:, 0], [0.0, 0.0, 2.0, 2.0])
@@ -0,0 +1,38 @@
+import pytest
+
+pytest.importorskip("flask")
+pytest.importorskip("pandas")
+pytest.importorskip("seaborn")
+
+import enzymeml.ontologymanager as ontology
+from benchmarks.loadtest import load_app
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    location = str(tmp_path / "onto.db")
+    store = ontology.SqliteOntologyStore(location)
+    store.add_many("chebi", [("Pyruvic acid", {"identifier": 15361, "synonyms": "pyruvate"})])
+    store.close()
+    monkeypatch.setenv("ENZYMEML_ONTOLOGY_DB", location)
+    return load_app()
+
+
+def test_ontology_search(app):
+    client = app.test_client()
+    response = client.get("/ontology/chebi/search?q=pyru&mode=prefix&limit=5")
+    assert response.status_code == 200
+    assert [m["name"] for m in response.get_json()] == ["Pyruvic acid"]
+
+    response = client.get("/ontology/chebi/search?q=pyruvat&mode=fuzzy")
+    assert response.get_json()[0]["uri"] is not None
+
+
+@pytest.mark.parametrize("query", ["q=pyru&mode=regex", "q=pyru&limit=ten", "q=pyru&limit=0"])
+def test_ontology_search_bad_request(app, query):
+    assert app.test_client().get("/ontology/chebi/search?" + query).status_code == 400
+
+
+def test_ontology_search_without_database(tmp_path, monkeypatch):
+    monkeypatch.delenv("ENZYMEML_ONTOLOGY_DB", raising=False)
+    assert load_app().test_client().get("/ontology/chebi/search?q=pyru").status_code == 503
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+import enzymeml.bootstrap as bootstrap
+import enzymeml.fitting as fitting
+
+S = np.repeat([0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0], 3)
+NOISE = 1 + 0.05 * np.random.default_rng(0).standard_normal(len(S))
+V = fitting.MICHAELIS_MENTEN.func(S, np.array([2.0, 0.5])) * NOISE
+
+
+@pytest.mark.parametrize("method", [bootstrap.METHOD_REPLICAS, bootstrap.METHOD_RESIDUALS])
+def test_bootstrap_independent_of_processes(method):
+    serial = bootstrap.bootstrap(S, V, method=method, samples=150, seed=7)
+    parallel = bootstrap.bootstrap(S, V, method=method, samples=150, seed=7, processes=2)
+    assert serial.samples.shape == (150, 2)
+    assert np.array_equal(serial.samples, parallel.samples, equal_nan=True)
+    assert np.array_equal(serial.stdev, parallel.stdev)
+    assert np.all(serial.lower <= serial.estimate) and np.all(serial.estimate <= serial.upper)
+
+
+def test_jackknife():
+    result = bootstrap.bootstrap(S, V, method=bootstrap.METHOD_JACKKNIFE)
+    assert result.samples.shape == (len(S), 2)
+    assert result.failed() == 0
+    assert np.all(result.stdev > 0)
+
+
+def test_bootstrap_model_reaction_writes_uncertainties(document):
+    enzymeml, reaction, _ = document(noise=0.05)
+    model, reac, _ = fitting.fit_reaction(enzymeml, reaction)
+    result = bootstrap.bootstrap_model_reaction(enzymeml, model, reac, samples=50, seed=1)
+
+    kl = model.get_model().getReaction(0).getKineticLaw()
+    for i, name in enumerate(fitting.MICHAELIS_MENTEN.parameters):
+        unc = kl.getLocalParameter(name).getPlugin("distrib").getUncertainty(0)
+        assert np.isclose(unc.getUncertParameter(0).getValue(), result.stdev[i])
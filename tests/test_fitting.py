@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+import enzymeml.enzymeml as enzml
+import enzymeml.fitting as fitting
+
+S = np.array([0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0])
+
+
+@pytest.mark.parametrize("law, values", [
+    (fitting.MICHAELIS_MENTEN, [2.0, 0.5]),
+    (fitting.SUBSTRATE_INHIBITION, [2.0, 0.5, 5.0]),
+    (fitting.HILL, [2.0, 0.8, 2.5]),
+])
+def test_fit_recovers_parameters(law, values):
+    v = law.func(S, np.array(values))
+    result = fitting.fit(S, v, law)
+    assert result.success
+    assert np.allclose(result.values, values, rtol=1e-5)
+
+
+def test_fit_needs_enough_points():
+    with pytest.raises(ValueError):
+        fitting.fit([1.0, 2.0], [1.0, 1.5], fitting.HILL)
+
+
+def test_used_data_points(document):
+    enzymeml, reaction, substrate = document()
+    model, reac = fitting.create_model_reaction(enzymeml, reaction, "mm")
+    s, v, sub, conc_unit, time_unit = fitting.used_data_points(enzymeml, model, reac)
+    assert sub == enzml._get_id(substrate)
+    assert len(s) == 14
+    assert np.allclose(np.sort(np.unique(s)), [0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0])
+    assert np.allclose(v, 2.0 * s / (0.5 + s))
+
+
+def test_fit_reaction_writes_parameters(document):
+    enzymeml, reaction, _ = document()
+    model, reac, result = fitting.fit_reaction(enzymeml, reaction)
+    assert np.allclose(result.values, [2.0, 0.5], rtol=1e-5)
+
+    kl = model.get_model().getReaction(enzml._get_id(reac)).getKineticLaw()
+    assert np.isclose(kl.getLocalParameter("vmax").getValue(), 2.0, rtol=1e-5)
+    assert np.isclose(kl.getLocalParameter("km").getValue(), 0.5, rtol=1e-5)
+    assert "km" in kl.getFormula()
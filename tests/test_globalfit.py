@@ -0,0 +1,44 @@
+import os
+import numpy as np
+import enzymeml.enzymeml as enzml
+import enzymeml.globalfit as globalfit
+
+
+def _documents(document):
+    return [document(rate=lambda s, vmax=vmax: vmax * s / (0.5 + s), name="d%i" % i)[0]
+            for i, vmax in enumerate((1.0, 3.0))]
+
+
+def test_global_fit_shared_km(document):
+    documents = _documents(document)
+    result = globalfit.global_fit(documents, shared=("km",))
+    assert result.success
+    assert np.allclose(result.values, [[1.0, 0.5], [3.0, 0.5]], rtol=1e-4)
+    for enzymeml in documents:
+        assert [m.name for m in enzymeml.models] == ["Michaelis-Menten (global, r0)"]
+
+
+def test_global_fit_without_write(document):
+    documents = _documents(document)
+    for _ in range(2):
+        result = globalfit.global_fit(documents, write=False)
+        assert np.allclose(result.values[:, 1], 0.5, rtol=1e-4)
+    assert all(len(enzymeml.models) == 0 for enzymeml in documents)
+
+
+def test_fit_archives(document, tmp_path):
+    locations = list()
+    for enzymeml in _documents(document):
+        location = str(tmp_path / ("%s.omex" % enzymeml.name))
+        enzymeml.create_omex().write(location)
+        locations.append(location)
+
+    cwd = os.getcwd()
+    directory = str(tmp_path / "fitted")
+    result = globalfit.fit_archives(locations, directory=directory)
+    assert os.getcwd() == cwd
+    assert np.allclose(result.values[:, 1], 0.5, rtol=1e-4)
+
+    loaded = enzml.EnzymeML("d0")
+    loaded.load_from_file(os.path.join(directory, "d0.omex"))
+    assert [m.name for m in loaded.models] == ["Michaelis-Menten (global, r0)"]
@@ -0,0 +1,58 @@
+import libsbml as sbml
+import enzymeml.kineticlaw as kineticlaw
+
+
+class _Document:
+    def __init__(self, model):
+        self.model = model
+
+    def get_model(self):
+        return self.model
+
+
+def _model(formula, size=None, concentration=None):
+    doc = sbml.SBMLDocument(3, 2)
+    model = doc.createModel()
+    c = model.createCompartment()
+    c.setId("c")
+    if size is not None:
+        c.setSize(size)
+    s = model.createSpecies()
+    s.setId("S")
+    s.setCompartment("c")
+    if concentration is not None:
+        s.setInitialConcentration(concentration)
+    r = model.createReaction()
+    r.setId("r")
+    p = model.createParameter()
+    p.setId("k")
+    p.setValue(3.0)
+    r.createKineticLaw().setMath(sbml.parseL3Formula(formula))
+    return doc, model
+
+
+def test_species_default_changed():
+    doc, model = _model("k * S", 1.0, 2.0)
+    document = _Document(model)
+    assert kineticlaw.compile_reaction(document, "r")() == 6.0
+    model.getSpecies("S").setInitialConcentration(5.0)
+    assert kineticlaw.compile_reaction(document, "r")() == 15.0
+
+
+def test_unset_values_are_cached():
+    doc, model = _model("k * S")
+    document = _Document(model)
+    law = kineticlaw.compile_reaction(document, "r")
+    assert kineticlaw.compile_reaction(document, "r") is law
+    assert law(S=2.0) == 6.0
+
+
+def test_function_body_changed():
+    doc, model = _model("f(S)", 1.0, 2.0)
+    fd = model.createFunctionDefinition()
+    fd.setId("f")
+    fd.setMath(sbml.parseL3Formula("lambda(x, 2 * x)"))
+    document = _Document(model)
+    assert kineticlaw.compile_reaction(document, "r")() == 4.0
+    fd.setMath(sbml.parseL3Formula("lambda(x, 3 * x)"))
+    assert kineticlaw.compile_reaction(document, "r")() == 6.0
@@ -0,0 +1,72 @@
+import os
+import zipfile
+import pytest
+import enzymeml.enzymeml as enzml
+import enzymeml.omex as omex
+
+
+def _archive(n):
+    archive = omex.Archive()
+    archive.add_string("<sbml/>", "./experiment.xml", omex.FORMAT_SBML, master=True)
+    for i in range(n):
+        archive.add_string("time,s\n" + "".join("%i,%i\n" % (j, i * j) for j in range(100)),
+                           "./data/%i.csv" % i, omex.FORMAT_CSV, level=0 if i % 3 == 0 else None)
+    return archive
+
+
+def test_write_parallel(tmp_path):
+    path = str(tmp_path / "a.omex")
+    _archive(20).write(path, threads=3)
+    with zipfile.ZipFile(path) as zf:
+        assert zf.testzip() is None
+        assert zf.read("data/7.csv").decode().splitlines()[2] == "1,7"
+        assert len(zf.namelist()) == 23
+    assert os.listdir(str(tmp_path)) == ["a.omex"]
+
+
+def test_write_parallel_error_keeps_target(tmp_path):
+    path = str(tmp_path / "a.omex")
+    with open(path, "wb") as f:
+        f.write(b"old")
+
+    archive = _archive(5)
+    archive.add_file(str(tmp_path / "missing.csv"), "./data/missing.csv", omex.FORMAT_CSV)
+    with pytest.raises(OSError):
+        archive.write(path, threads=2)
+
+    with open(path, "rb") as f:
+        assert f.read() == b"old"
+    assert os.listdir(str(tmp_path)) == ["a.omex"]
+
+
+def test_write_error_keeps_target(tmp_path):
+    path = str(tmp_path / "a.omex")
+    with open(path, "wb") as f:
+        f.write(b"old")
+
+    archive = _archive(5)
+    archive.add_file(str(tmp_path / "missing.csv"), "./data/missing.csv", omex.FORMAT_CSV)
+    with pytest.raises(OSError):
+        archive.write(path)
+
+    with open(path, "rb") as f:
+        assert f.read() == b"old"
+    assert os.listdir(str(tmp_path)) == ["a.omex"]
+
+
+def test_create_archive_failure_keeps_archive(document, tmp_path, monkeypatch):
+    enzymeml = document(initial=(1.0,), replicas=1)[0]
+    monkeypatch.chdir(tmp_path)
+    enzymeml.create_archive(delete=True, backend=enzml.BACKEND_ZIPFILE)
+    with open("mm.omex", "rb") as f:
+        before = f.read()
+
+    def fail(metadata):
+        raise RuntimeError("failed")
+
+    # fails after the entries are written
+    monkeypatch.setattr(omex, "_write_metadata", fail)
+    with pytest.raises(RuntimeError):
+        enzymeml.create_archive(delete=True, backend=enzml.BACKEND_ZIPFILE)
+    with open("mm.omex", "rb") as f:
+        assert f.read() == before
@@ -0,0 +1,116 @@
+import os
+import pytest
+import libsbml as sbml
+import enzymeml.ontologymanager as ontology
+
+
+def _workbook(path, names):
+    xlwt = pytest.importorskip("xlwt")
+    wb = xlwt.Workbook()
+    sheet = wb.add_sheet("chebi")
+    for j, header in enumerate(["Name", "Identifier", "Synonyms"]):
+        sheet.write(0, j, header)
+    for i, (name, synonym) in enumerate(names, 1):
+        sheet.write(i, 0, name)
+        sheet.write(i, 1, i)
+        sheet.write(i, 2, synonym)
+    wb.save(path)
+
+
+def test_cache_per_workbook(tmp_path):
+    a = str(tmp_path / "a.xls")
+    b = str(tmp_path / "b.xls")
+    _workbook(a, [("Pyruvic acid", "pyruvate")])
+    _workbook(b, [("Glucose", "dextrose")])
+    cache = str(tmp_path / "cache")
+
+    for _ in range(2):
+        ma = ontology.OntologyManager(ontology.ExcelOntologyLoader(cache_location=cache), a)
+        mb = ontology.OntologyManager(ontology.ExcelOntologyLoader(cache_location=cache), b)
+        assert ma.resolve("chebi", "pyruvate") == "Pyruvic acid"
+        assert mb.resolve("chebi", "dextrose") == "Glucose"
+        assert ma.resolve("chebi", "dextrose") is None
+    assert len(os.listdir(cache)) == 2
+
+
+def test_unreadable_cache_is_rebuilt(tmp_path):
+    a = str(tmp_path / "a.xls")
+    _workbook(a, [("Pyruvic acid", "pyruvate")])
+    with open(a + ".cache", "wb") as f:
+        f.write(b"\x80\x04not json")
+
+    manager = ontology.OntologyManager(ontology.ExcelOntologyLoader(), a)
+    assert manager.resolve("chebi", "pyruvate") == "Pyruvic acid"
+    manager = ontology.OntologyManager(ontology.ExcelOntologyLoader(), a)
+    assert manager.resolve("chebi", "pyruvate") == "Pyruvic acid"
+
+
+def _store(path):
+    store = ontology.SqliteOntologyStore(path)
+    store.add_many("chebi", [
+        ("Pyruvic acid", {"identifier": 15361, "synonyms": "pyruvate; 2-oxopropanoic acid"}),
+        ("Lactic acid", {"identifier": 422, "synonyms": "lactate"}),
+        ("Acetolactate", {"identifier": 15686}),
+    ] + [("Compound %i" % i, {"identifier": 100000 + i}) for i in range(200)])
+    return store
+
+
+def test_sqlite_store_exact(tmp_path):
+    store = _store(str(tmp_path / "onto.db"))
+    assert store.exact("chebi", "  PYRUVATE ").name == "Pyruvic acid"
+    assert store.exact("chebi", "Pyruvic  acid").code["identifier"] == 15361
+    assert store.exact("chebi", "pyruv") is None
+    assert store.exact("uniprot", "pyruvate") is None
+    assert set(store.exact_many("chebi", ["lactate", "nothing"])) == {"lactate"}
+
+
+def test_sqlite_store_prefix(tmp_path):
+    store = _store(str(tmp_path / "onto.db"))
+    assert [m.name for m in store.search("chebi", "lact", "prefix")] == ["Lactic acid"]
+    assert {m.name for m in store.search("chebi", "ac", "prefix")} == {"Acetolactate"}
+    matches = store.search("chebi", "compound 1", "prefix", 5)
+    assert len(matches) == 5
+    assert all(m.name.startswith("Compound 1") and m.score == 1.0 for m in matches)
+
+
+def test_sqlite_store_fuzzy(tmp_path):
+    store = _store(str(tmp_path / "onto.db"))
+    matches = store.search("chebi", "pyruvik acid", "fuzzy")
+    assert matches[0].name == "Pyruvic acid"
+    assert 0.3 <= matches[0].score < 1.0
+    # a one-character typo
+    assert store.search("chebi", "acetolactat", "fuzzy")[0].name == "Acetolactate"
+    assert store.search("chebi", "lactatr", "fuzzy")[0].name == "Lactic acid"
+    assert store.search("chebi", "xyz", "fuzzy") == []
+
+
+def test_sqlite_store_unknown_mode(tmp_path):
+    store = _store(str(tmp_path / "onto.db"))
+    with pytest.raises(ValueError):
+        store.search("chebi", "pyruvate", "regex")
+
+
+def test_manager_search_with_store(tmp_path):
+    location = str(tmp_path / "onto.db")
+    _store(location).close()
+    manager = ontology.OntologyManager(ontology.SqliteOntologyLoader(), location)
+    assert manager.resolve("chebi", "lactate") == "Lactic acid"
+    assert [m.name for m in manager.search("chebi", "pyruv", "prefix")] == ["Pyruvic acid"]
+
+
+def test_annotate_is_idempotent(tmp_path, document):
+    location = str(tmp_path / "onto.db")
+    _store(location).close()
+    manager = ontology.OntologyManager(ontology.SqliteOntologyLoader(), location)
+    enzymeml, _, _ = document(initial=(0.1, 8.0))
+
+    annotated = manager.annotate(enzymeml)
+    chebi = ontology.ontology_list[ontology.IDENTIFIER_CHEMICAL_ENTITIES]
+    assert annotated == {"s0": chebi.to_uri(15361), "s1": chebi.to_uri(422)}
+    for sid, uri in annotated.items():
+        terms = [cvt for cvt in enzymeml.get_model().getSpecies(sid).getCVTerms()
+                 if cvt.getBiologicalQualifierType() == sbml.BQB_IS]
+        assert [cvt.getResourceURI(0) for cvt in terms] == [uri]
+
+    # the annotated species are filtered by ListFilter
+    assert manager.annotate(enzymeml) == {}
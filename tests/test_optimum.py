@@ -0,0 +1,25 @@
+import numpy as np
+import enzymeml.optimum as optimum
+
+
+def test_gaussian_optimum():
+    ph = np.linspace(4, 10, 13)
+    activity = optimum.GAUSSIAN.func(ph, np.array([3.0, 7.2, 1.1]))
+    result = optimum.fit_optimum(ph, activity, "gaussian")
+    assert result.success
+    assert np.allclose(result.values, [3.0, 7.2, 1.1], rtol=1e-5)
+    assert np.isclose(result.optimum, 7.2, rtol=1e-5)
+
+
+def test_arrhenius_optimum():
+    t = np.linspace(283.15, 343.15, 25)
+    reference = np.mean(t)
+    values = np.array([1.5, 55e3, 250e3, 325.0, reference])
+    activity = optimum.ARRHENIUS.func(t, values)
+
+    result = optimum.fit_optimum(t, activity, optimum.ARRHENIUS)
+    assert np.allclose(result.values, values, rtol=1e-3)
+
+    grid = np.linspace(t.min(), t.max(), 2001)
+    expected = grid[np.argmax(optimum.ARRHENIUS.func(grid, values))]
+    assert abs(result.optimum - expected) < 0.1
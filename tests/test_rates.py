@@ -0,0 +1,23 @@
+import numpy as np
+import enzymeml.rates as rates
+
+
+def test_initial_rates_linear(document):
+    time = np.linspace(2.0, 3.0, 6)
+    enzymeml = document(rate=lambda s0: 0.5 * s0, initial=(1.0, 4.0), replicas=1, time=time)[0]
+
+    result = rates.initial_rates(enzymeml)
+    assert np.allclose(result.rates, [-0.5, -2.0])
+    # the concentration at the first time point, not at t=0
+    assert np.allclose(result.intercepts, [1.0 - 0.5 * 2.0, 4.0 - 2.0 * 2.0])
+    assert np.allclose(result.r2, 1.0)
+    assert list(result.points) == [6, 6]
+
+
+def test_window_regressions():
+    time = np.array([[1.0, np.nan], [2.0, 0.0], [3.0, 1.0], [4.0, 2.0]])
+    values = np.array([[5.0, np.nan], [7.0, 1.0], [9.0, 4.0], [11.0, 7.0]])
+    n, slope, intercept, stderr, r2 = rates.window_regressions(time, values)
+    assert list(n[-1]) == [4.0, 3.0]
+    assert np.allclose(slope[-1], [2.0, 3.0])
+    assert np.allclose(intercept[-1], [5.0, 1.0])
@@ -0,0 +1,38 @@
+import numpy as np
+import scipy.special
+import enzymeml.fitting as fitting
+import enzymeml.simulation as simulation
+
+
+# The closed form of the Michaelis-Menten progress curve: S(t) = km * W(S0 / km * exp((S0 - vmax * t) / km))
+def _progress(s0, t, vmax, km):
+    return km * np.real(scipy.special.lambertw(s0 / km * np.exp((s0 - vmax * t) / km)))
+
+
+def test_michaelis_menten_progress_curve(document):
+    enzymeml, reaction, _ = document()
+    model, reac, result = fitting.fit_reaction(enzymeml, reaction)
+    vmax, km = result.values
+
+    substrate = "S0"
+    assert model.get_model().getSpecies(substrate).getName() == "pyruvate"
+
+    t = np.linspace(0, 3, 31)
+    s0 = np.array([0.5, 2.0, 5.0])
+    sim = simulation.simulate(model, {substrate: s0}, t, rtol=1e-9, atol=1e-12)
+    assert sim.success
+    assert sim.values.shape == (3, len(sim.species), len(t))
+    for b in range(len(s0)):
+        assert np.allclose(sim.get(substrate)[b], _progress(s0[b], t, vmax, km), rtol=1e-5, atol=1e-8)
+        # the product is formed from the substrate
+        assert np.allclose(sim.get("S1")[b] + sim.get(substrate)[b], s0[b] + sim.get("S1")[b, 0], rtol=1e-6)
+
+
+def test_simulate_measurements(document):
+    enzymeml, reaction, substrate = document()
+    model, _, _ = fitting.fit_reaction(enzymeml, reaction)
+    simulated = simulation.simulate_measurements(enzymeml, model)
+    assert len(simulated) == 7
+    for t, series in simulated.values():
+        assert len(series[substrate[0]]) == len(t)
+        assert np.all(np.diff(series[substrate[0]]) < 0)
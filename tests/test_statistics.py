@@ -0,0 +1,24 @@
+import numpy as np
+import enzymeml.statistics as statistics
+
+
+def test_replica_statistics(document):
+    time = np.linspace(0, 1, 5)
+    enzymeml, reaction, substrate = document(initial=(2.0,), replicas=3, noise=0.1, time=time)
+    stats = statistics.replica_statistics(enzymeml, substrate)
+    assert stats.nreplicas() == 3
+    assert np.allclose(stats.time, time)
+    assert np.allclose(stats.mean, np.nanmean(stats.values, axis=1))
+    assert np.allclose(stats.std, np.nanstd(stats.values, axis=1, ddof=1))
+    assert not stats.mean.flags.writeable
+    assert statistics.replica_statistics(enzymeml, substrate) is stats
+
+
+def test_explicit_grid_stays_writeable(document):
+    enzymeml, _, substrate = document(initial=(2.0,), replicas=2)
+    grid = np.linspace(0, 0.1, 4)
+    stats = statistics.replica_statistics(enzymeml, substrate, grid=grid)
+    assert grid.flags.writeable
+    assert not stats.time.flags.writeable
+    grid[0] = -1.0
+    assert stats.time[0] == 0.0
@@ -0,0 +1,48 @@
+import numpy as np
+import enzymeml.fitting as fitting
+import enzymeml.simulation as simulation
+import enzymeml.sweep as sweep
+
+
+def _model(document):
+    enzymeml, reaction, _ = document()
+    model, reac, result = fitting.fit_reaction(enzymeml, reaction)
+    return model, result.values
+
+
+def test_sweep_evaluate(document):
+    model, values = _model(document)
+    assert sweep.enzymes(model) == ["S2"]
+
+    s = np.linspace(0.1, 10, 7)
+    e = np.array([0.5, 1.0, 2.0])
+    result = sweep.sweep(model, [("S0", s), ("S2", e)], mode=sweep.MODE_EVALUATE, dtype=np.float64, chunk_size=5)
+    assert result.shape() == (7, 3)
+    assert result.values.shape == (7, 3, 1)
+    expected = fitting.MICHAELIS_MENTEN.func(s, values)[:, None] * e[None, :]
+    assert np.allclose(result.get(result.outputs[0]), expected)
+
+
+def test_sweep_simulate(document, tmp_path):
+    model, _ = _model(document)
+    s = np.linspace(0.5, 4, 4)
+    km = np.array([0.2, 0.5, 1.0])
+    t = np.linspace(0, 1, 6)
+    location = str(tmp_path / "sweep.npy")
+
+    result = sweep.sweep(model, {"S0": s, "km": km}, t, location=location, chunk_size=5, dtype=np.float64)
+    assert result.values.shape == (4, 3, 2, 6)
+    assert isinstance(result.values, np.memmap)
+
+    one = simulation.simulate(model, {"S0": s[2]}, t, {"km": km[1]}).get("S0")[0]
+    assert np.allclose(result.get("S0")[2, 1], one, rtol=1e-4)
+
+    loaded = sweep.load(location)
+    assert loaded.shape() == (4, 3)
+    assert loaded.outputs == result.outputs
+    assert np.allclose(loaded.times, t)
+    assert np.allclose(loaded.axes[0][1], s) and loaded.axes[1][0] == "km"
+    assert np.array_equal(loaded.values, result.values)
+
+    in_memory = sweep.sweep(model, {"S0": s, "km": km}, t, chunk_size=5, dtype=np.float64)
+    assert np.allclose(in_memory.values, loaded.values)
@@ -0,0 +1,12 @@
+import numpy as np
+from enzymeml.tables import ColumnDependentTable
+
+
+def test_zero_capacity():
+    table = ColumnDependentTable("time", capacity=0)
+    table.init_column("s")
+    for t in (2.0, 0.0, 1.0):
+        table.add(t, "s", t * 10)
+    table.add_many([3.0, 4.0], "s", [30.0, 40.0])
+    assert table.nrows() == 5
+    assert np.allclose(table.as_columns()[1], [0.0, 10.0, 20.0, 30.0, 40.0])
@@ -0,0 +1,78 @@
+import numpy as np
+import libsbml as sbml
+import pytest
+import enzymeml.enzymeml as enzml
+import enzymeml.units as units
+import enzymeml.data as data
+
+
+def test_parse_unit():
+    assert units.parse_unit("mM") == ((sbml.UNIT_KIND_MOLE, 1, -3, 1.0), (sbml.UNIT_KIND_LITRE, -1, 0, 1.0))
+    assert units.unit_key(units.parse_unit("mmol/l")) == units.unit_key(units.parse_unit("mM"))
+    assert units.unit_key(units.parse_unit("umol/(l*s)")) == units.unit_key(units.parse_unit("umol/l/s"))
+    with pytest.raises(units.UnitParseError):
+        units.parse_unit("furlong")
+
+
+def test_registry_reuses_units():
+    enzymeml = enzml.EnzymeML("u")
+    unit = units.get_unit(enzymeml, "mmol/l")
+    assert units.get_unit(enzymeml, "mM") == unit
+    assert units.get_unit(enzymeml, "mmol / l") == unit
+    assert units.get_unit(enzymeml, "s") == sbml.UNIT_KIND_SECOND
+    assert enzymeml.get_model().getNumUnitDefinitions() == 1
+
+
+def test_conversion_factor():
+    model = enzml.EnzymeML("u")
+    assert units.conversion_factor(model, "mM", "umol/l") == 1000.0
+    assert units.conversion_factor(model, "min", "s") == 60.0
+    assert units.conversion_factor(model, "umol/(l*s)", "mM/min") == 0.06
+    with pytest.raises(ValueError):
+        units.conversion_factor(model, "mM", "s")
+
+
+def _measurement(enzymeml):
+    return next(iter(enzymeml.get_reaction_data().listOfMeasurements.measurements))
+
+
+def test_convert_column(document):
+    enzymeml = document(initial=(1.0,), replicas=1)[0]
+    csv = enzymeml.csvs[0]
+    before = data.column_array(csv, 1).copy()
+
+    values = units.convert_column(enzymeml, csv, 1, "umol/l")
+    assert np.allclose(values, before * 1000)
+    assert np.allclose(data.column_array(csv, 1), before)
+
+    values = units.convert_column(enzymeml, csv, 1, "umol/l", inplace=True)
+    assert np.allclose(data.column_array(csv, 1), before * 1000)
+    assert units.conversion_factor(enzymeml, data.get_format(enzymeml, csv).columns[1].unit, "mM") == 0.001
+    assert np.allclose(units.convert_column(enzymeml, csv, 1, "mmol/l"), before)
+
+
+def test_convert_column_shared_format(document):
+    enzymeml = document(initial=(1.0,), replicas=1)[0]
+    csv = enzymeml.csvs[0]
+    form = data.get_format(enzymeml, csv)
+    other = enzml.EnzymeMLCSV(form, name="other")
+    enzymeml.add_csv(other)
+    enzymeml.add(enzml.key.MAIN_DATA_FILE, {"file": other.location, "format": form.sid})
+    before = data.column_array(csv, 1).copy()
+
+    with pytest.raises(ValueError):
+        units.convert_column(enzymeml, csv, 1, "umol/l", inplace=True)
+    assert np.allclose(data.column_array(csv, 1), before)
+    assert np.allclose(units.convert_column(enzymeml, csv, 1, "umol/l"), before * 1000)
+
+
+def test_convert_measurement(document):
+    enzymeml = document(initial=(1.0,), replicas=2)[0]
+    sid = _measurement(enzymeml)
+    before = data.get_measurement(enzymeml, sid).values.copy()
+
+    assert np.allclose(units.convert_measurement(enzymeml, sid, "umol/l").values, before * 1000)
+    assert np.allclose(data.get_measurement(enzymeml, sid).values, before)
+
+    units.convert_measurement(enzymeml, sid, "umol/l", inplace=True)
+    assert np.allclose(data.get_measurement(enzymeml, sid).values, before * 1000)